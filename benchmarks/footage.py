@@ -0,0 +1,93 @@
+"""
+zxx 性能测试：合成测试素材
+    用 ffmpeg 的 lavfi 虚拟设备在本地生成测试视频和背景音乐，不需要下载任何素材。
+    生成的文件按参数命名，保存在工作文件夹中，再次运行时直接复用。
+"""
+
+
+# 常用分辨率的画面尺寸
+SIZES = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+# 画面内容：彩条（编码后很小、解码很快）或噪点（接近真实比赛录像的码率和解码开销）
+PATTERNS = {
+    "bars": "smptehdbars=size={w}x{h}:rate={fps}",
+    "noise": "testsrc2=size={w}x{h}:rate={fps},noise=alls=30:allf=t",
+}
+
+
+def make_video(folder: str, resolution: str = "720p", duration: float = 60, fps: float = 30,
+               gop: int = 60, pattern: str = "noise") -> str:
+    """
+    生成一段带声音（正弦波）的 H.264 测试视频，返回文件路径。
+
+    参数说明：
+        folder：存放测试素材的文件夹。
+        resolution：分辨率，"720p"、"1080p" 或 "4k"，也可以写成 "640x360" 这样的形式。
+        duration：时长（秒），默认为 60。
+        fps：帧率，默认为 30。
+        gop：关键帧间隔（帧），默认为 60。运动相机的比赛录像通常是 1 至 2 秒一个关键帧。
+        pattern：画面内容，"bars"（彩条）或 "noise"（噪点），默认为 "noise"。
+    """
+    from os import makedirs, replace
+    from os.path import isfile, join
+    from zxx.probe import run_ffmpeg
+
+    width, height = _size(resolution)
+    path = join(folder, "source_%dx%d_%gs_%gfps_g%d_%s.mp4" % (width, height, duration, fps, gop, pattern))
+    if isfile(path):
+        return path
+    makedirs(folder, exist_ok=True)
+    print("正在生成测试视频：%s" % path)
+    temp_path = path + ".part.mp4"
+    run_ffmpeg([
+        "-f", "lavfi", "-i", PATTERNS[pattern].format(w=width, h=height, fps=fps),
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", str(duration), "-c:v", "libx264", "-preset", "veryfast", "-g", str(gop), "-keyint_min", str(gop),
+        "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "128k", "-y", temp_path,
+    ], error = "生成测试视频失败")
+    replace(temp_path, path)
+    return path
+
+
+def make_music(folder: str, duration: float = 10) -> str:
+    """
+    生成一段测试用的背景音乐（和弦的正弦波，MP3 格式），返回文件路径。
+
+    参数说明：
+        folder：存放测试素材的文件夹。
+        duration：时长（秒），默认为 10。比集锦短时可以用来测试循环播放。
+    """
+    from os import makedirs, replace
+    from os.path import isfile, join
+    from zxx.probe import run_ffmpeg
+
+    path = join(folder, "music_%gs.mp3" % duration)
+    if isfile(path):
+        return path
+    makedirs(folder, exist_ok=True)
+    temp_path = path + ".part.mp3"
+    run_ffmpeg([
+        "-f", "lavfi", "-i", "sine=frequency=262:sample_rate=44100:duration=%g" % duration,
+        "-f", "lavfi", "-i", "sine=frequency=330:sample_rate=44100:duration=%g" % duration,
+        "-filter_complex", "amix=inputs=2,aformat=channel_layouts=stereo",
+        "-c:a", "libmp3lame", "-b:a", "192k", "-y", temp_path,
+    ], error = "生成测试音乐失败")
+    replace(temp_path, path)
+    return path
+
+
+def _size(resolution: str) -> tuple:
+    """
+    把分辨率的名称转换成画面尺寸 (宽, 高)。
+    """
+    if resolution.lower() in SIZES:
+        return SIZES[resolution.lower()]
+    try:
+        width, height = resolution.lower().split("x")
+        return int(width), int(height)
+    except ValueError:
+        raise Exception("无法识别分辨率 %s，可以写成 %s，或者 \"640x360\" 这样的形式" % (resolution, "、".join(SIZES)))
@@ -0,0 +1,204 @@
+"""
+zxx 性能测试
+    在合成的测试素材上，测量制作和导出集锦的几种典型场景的耗时，结果保存为 JSON 文件，便于比较不同版本。
+    测试的是本仓库 src 文件夹中的 zxx（当前检出的代码），而不是已经安装的 zxx。
+
+用法：
+    python benchmarks/run.py [--resolutions 720p,1080p] [--gop 60] [--takes 8] [--repeat 3] [--output 结果.json]
+    python benchmarks/run.py --compare 旧结果.json 新结果.json
+
+测试场景：
+    takes：从同一个源文件截取 N 个片段；
+    captions：截取 N 个片段，每个片段都有字幕和比分牌，比分不断变化；
+    replays：截取 N 个片段，每个片段之后接一段 0.5 倍速的慢动作回放（与原片段的时间范围重叠）；
+    bgm：截取 N 个片段，再加一段比集锦短、循环播放的背景音乐；
+    export:<导出模式>：与 captions 相同的集锦，按各个导出模式导出。
+    除 export 外，各场景都分别测量制作集锦（build）和按 --mode（默认为 preview）导出（export）的耗时。
+
+每个场景先运行 --warmup 次（不计时，例如第一次运行时要建立关键帧索引），再运行 --repeat 次，记录每次的耗时、
+中位数和最小值。每次运行前清空读取器池和解码帧缓存。
+"""
+
+
+import sys
+from os.path import abspath, dirname, join
+
+ROOT = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, join(ROOT, "src"))
+
+SCENARIOS = ("takes", "captions", "replays", "bgm", "export")
+
+
+def build(scenario: str, source: str, music: str, n_takes: int, take_length: float):
+    """
+    按场景制作集锦，返回 zxx.Highlight。各片段在源文件中均匀分布。
+    """
+    from zxx import Highlight
+    from zxx.probe import probe
+    from zxx.tools import sec2str
+
+    duration = probe(source)["duration"]
+    step = (duration - take_length) / max(n_takes, 1)
+    highlight = Highlight().use(source, "")
+    if scenario in ("captions", "export"):
+        highlight.show_score()
+    for i in range(n_takes):
+        begin = i * step
+        span = [sec2str(begin), sec2str(begin + take_length)]
+        if scenario in ("captions", "export"):
+            highlight.set_score(i // 2, i // 3).take(span + ["第 %d 个片段" % (i + 1)])
+        elif scenario == "replays":
+            replay = [sec2str(begin + take_length / 3), sec2str(begin + take_length)]
+            highlight.take(span, replay + [{"speed": 0.5}])
+        else:
+            highlight.take(span)
+    if scenario == "bgm":
+        highlight.add_bgm(music, "", repeat=None)
+    return highlight
+
+
+def run(args) -> dict:
+    """
+    运行所有场景，返回测试结果。
+    """
+    from os import remove
+    from os.path import isfile
+    from statistics import median
+    from time import perf_counter
+    from tempfile import gettempdir
+    from zxx.FrameCache import reset_frame_cache
+    from zxx.options import EXPORT_MODES, SetCaptionStyle, SetPath, SetScoreBoardStyle
+    from zxx.ReaderPool import shared_pool
+    from zxx.tools import str2sec
+    from footage import make_music, make_video
+
+    workdir = args.workdir or join(gettempdir(), "zxx_benchmarks")
+    examples = join(ROOT, "zxx_example_code")
+    SetPath(workdir)
+    SetCaptionStyle(font=join(examples, "SmileySans-Oblique.ttf"), fontsize=60)
+    SetScoreBoardStyle(image=join(examples, "scoreboard.png"), font_file=join(examples, "SmileySans-Oblique.ttf"))
+    music = make_music(workdir, duration=10)
+    modes = args.modes.split(",") if args.modes else list(EXPORT_MODES)
+    results = {}
+    for resolution in args.resolutions.split(","):
+        source = make_video(workdir, resolution, args.duration, args.fps, args.gop, args.pattern)
+        for scenario in args.scenarios.split(","):
+            for mode in (modes if scenario == "export" else [args.mode]):
+                name = "%s@%s" % (scenario if scenario != "export" else "export:" + mode, resolution)
+                output = join(workdir, "output" + (".avi" if mode == "lossless" else ".mp4"))
+                times = {"build": [], "export": []}
+                for i in range(args.warmup + args.repeat):
+                    shared_pool().clear()
+                    reset_frame_cache()
+                    tic = perf_counter()
+                    highlight = build(scenario, source, music, args.takes, args.take_length)
+                    built = perf_counter()
+                    highlight.export(output, "", mode=mode)
+                    exported = perf_counter()
+                    if i >= args.warmup:
+                        times["build"].append(built - tic)
+                        times["export"].append(exported - built)
+                    frames = round(str2sec(highlight.duration()) * (EXPORT_MODES[mode].get("fps") or args.fps))
+                if isfile(output):
+                    remove(output)
+                results[name] = {
+                    metric: {"runs": runs, "median": median(runs), "min": min(runs)} for metric, runs in times.items()
+                }
+                results[name]["frames"] = frames
+                results[name]["fps"] = frames / results[name]["export"]["median"]
+                print("%-28s 制作 %7.3f 秒，导出 %7.3f 秒（%.1f 帧/秒）" % (
+                    name, results[name]["build"]["median"], results[name]["export"]["median"], results[name]["fps"]))
+    return results
+
+
+def environment() -> dict:
+    """
+    记录运行环境，便于判断两次结果能否直接比较。
+    """
+    import platform
+    import subprocess as sp
+    from os import cpu_count
+    import moviepy
+    import numpy
+
+    try:
+        commit = sp.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    with open(join(ROOT, "setup.cfg"), "r", encoding="utf8") as f:
+        version = [line.split("=")[1].strip() for line in f if line.startswith("version")]
+    return {
+        "zxx": version[0] if len(version) > 0 else None,
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "moviepy": moviepy.__version__,
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "cpu_count": cpu_count(),
+    }
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """
+    比较两次测试结果，打印各场景耗时中位数的变化。变慢超过 10% 的项标记为“变慢”。
+    """
+    import json
+
+    with open(old_path, "r", encoding="utf8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf8") as f:
+        new = json.load(f)
+    print("旧：%s（%s）" % (old_path, old["environment"].get("commit")))
+    print("新：%s（%s）" % (new_path, new["environment"].get("commit")))
+    if old["config"] != new["config"]:
+        print("注意：两次测试的参数不同，结果可能无法直接比较")
+    print("%-28s %-7s %10s %10s %9s" % ("场景", "阶段", "旧(秒)", "新(秒)", "变化"))
+    for name in new["results"]:
+        if name not in old["results"]:
+            continue
+        for metric in ("build", "export"):
+            a, b = old["results"][name][metric]["median"], new["results"][name][metric]["median"]
+            change = (b - a) / a * 100 if a > 0 else 0
+            print("%-28s %-7s %10.3f %10.3f %+8.1f%%%s" % (name, metric, a, b, change, "  变慢" if change > 10 else ""))
+
+
+def main(argv: list | None = None) -> int:
+    import argparse
+    import json
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(prog="python benchmarks/run.py", description="zxx 性能测试")
+    parser.add_argument("--resolutions", default="720p", help="测试视频的分辨率，用逗号分隔，例如 720p,1080p,4k")
+    parser.add_argument("--duration", type=float, default=60, help="测试视频的时长（秒），默认为 60")
+    parser.add_argument("--fps", type=float, default=30, help="测试视频的帧率，默认为 30")
+    parser.add_argument("--gop", type=int, default=60, help="测试视频的关键帧间隔（帧），默认为 60")
+    parser.add_argument("--pattern", default="noise", choices=["noise", "bars"], help="测试视频的画面内容，默认为 noise")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="要运行的场景，用逗号分隔")
+    parser.add_argument("--takes", type=int, default=8, help="每个集锦截取的片段数，默认为 8")
+    parser.add_argument("--take-length", type=float, default=3, help="每个片段的时长（秒），默认为 3")
+    parser.add_argument("--mode", default="preview", help="除 export 外各场景的导出模式，默认为 preview")
+    parser.add_argument("--modes", default=None, help="export 场景测试的导出模式，用逗号分隔，默认为全部导出模式")
+    parser.add_argument("--repeat", type=int, default=3, help="每个场景计时运行的次数，默认为 3")
+    parser.add_argument("--warmup", type=int, default=1, help="每个场景不计时的预热次数，默认为 1")
+    parser.add_argument("--workdir", default=None, help="存放测试素材和导出视频的文件夹，默认为系统临时文件夹下的 zxx_benchmarks")
+    parser.add_argument("--output", default=None, help="测试结果的 JSON 文件路径，默认为 benchmark_<时间>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="比较两次测试结果，不运行测试")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    if args.repeat < 1:
+        raise Exception("计时运行的次数至少为 1！")
+    config = {key: value for key, value in vars(args).items() if key not in ("workdir", "output", "compare")}
+    results = run(args)
+    output = args.output or "benchmark_%s.json" % datetime.now().strftime("%Y%m%d_%H%M%S")
+    with open(output, "w", encoding="utf8") as f:
+        json.dump({"version": 1, "environment": environment(), "config": config, "results": results},
+                  f, ensure_ascii=False, indent=2)
+    print("测试结果已保存至 %s" % output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,38 +9,114 @@ from moviepy import VideoClip, VideoFileClip
 
 
 class File:
-    def __init__(self, filename: str, folder: str = None) -> None:
+    def __init__(self, filename: str, folder: str = None,
+                 target_resolution: tuple | None = None, pixel_format: str | None = None) -> None:
         """
         zxx.File 文件类，针对外部的视频或音频文件进行基本操作。
+        同一源文件的 VideoFileClip 从全局读取器池（zxx.ReaderPool.shared_pool()）借用，多次使用同一文件不会重复打开 ffmpeg 进程。
 
         参数说明：
             filename：新建 zxx.File 类的一个实例时，必须指定文件名。文件名是相对于 folder 的相对路径。
             folder：视频文件所在的文件夹绝对路径。如果未指定，则默认为工作目录（即 zxx.options.GetPath() 的返回值）。
+            target_resolution：解码后的画面尺寸 (宽, 高)。指定后由 ffmpeg 在解码时直接缩放，得到的每一帧已经是这个尺寸，
+                比解码出原始尺寸后再逐帧缩放快得多。如果未指定，则保持原始尺寸。
+            pixel_format：解码后的像素格式，例如 "rgb24"（moviepy 的默认值）或 "rgba"。如果未指定，则使用 moviepy 的默认值。
         """
         from os.path import join
         from .options import GetPath
+        from .ReaderPool import shared_pool
         
         self.__filename = filename
         self.__folder = folder
         if folder == None:
             self.__folder = GetPath()
         self.__path = join(self.__folder, self.__filename)
-        self.__contents = VideoFileClip(self.__path)
+        params = {}
+        if target_resolution != None:
+            params["target_resolution"] = tuple(target_resolution)
+        if pixel_format != None:
+            params["pixel_format"] = pixel_format
+        self.__contents = shared_pool().open(self.__path, **params)
 
     def contents(self) -> VideoFileClip:
         """
         获取文件内容。返回值类型是 moviepy 的 VideoFileClip 类。
+        注意该 VideoFileClip 由读取器池共享，请勿直接调用其 close() 方法。
         """
         return self.__contents
 
+    def path(self) -> str:
+        """
+        返回文件的绝对路径。
+        """
+        from os.path import abspath
+
+        return abspath(self.__path)
+
+    def proxy(self, height: int | None = None) -> str:
+        """
+        返回该视频的代理文件（画面缩小、便于快速解码的副本）的路径。代理文件不存在时先用 ffmpeg 生成，之后直接复用。
+        详见 zxx.File.make_proxy()。
+
+        参数说明：
+            height：代理文件的画面高度（像素）。如果未指定，则使用 zxx.options.GetProxy("height")。
+        """
+        return make_proxy(self.path(), height)
+
+    def index(self) -> "KeyframeIndex":
+        """
+        返回该视频的关键帧索引（zxx.KeyframeIndex），记录每一帧的时刻、大小和是否为关键帧。
+        索引不存在时先用 ffmpeg 建立（只读取数据包，不解码画面），并保存在索引缓存中，之后直接读取。
+        读取器跳转时会自动使用这个索引，不需要手动调用。
+        """
+        from .KeyframeIndex import keyframe_index
+
+        return keyframe_index(self.path())
+
+    def suggest_cut(self, begin: str, finish: str) -> tuple | None:
+        """
+        返回建议的剪辑点 (开始时间点, 结束时间点)，写法与 select() 的参数相同：即离 begin 和 finish 最近的关键帧。
+        按建议的剪辑点截取、且未经处理的片段，智能导出（Highlight.export(smart=True)）时整段直接复制码流，不需要重新编码。
+        片段比画面组（两个关键帧之间）还短时返回 None。
+
+        参数说明：
+            begin：开始时间点，可以写成 "1:03:13" 这样的形式。
+            finish：结束时间点，写法同上。
+        """
+        from .tools import sec2str, str2sec
+
+        cut = self.index().suggest_cut(str2sec(begin), str2sec(finish))
+        if cut == None:
+            return None
+        # sec2str 去尾，稍微往后一点，保证截取时正好从关键帧开始
+        return sec2str(cut[0] + 0.0005), sec2str(cut[1] + 0.0005)
+
+    def find_moments(self, count: int = 10, before: float = 8, after: float = 4,
+                     kinds: tuple = ("crowd", "whistle")) -> list:
+        """
+        找出视频中最可能的精彩时刻（欢呼和哨声），按得分从高到低排列，每个时刻的 "take" 可以直接传入 zxx.Highlight.take()。
+        只解码声音、不解码画面，分析结果按文件缓存，详见 zxx.moments.find_moments()。
+
+        参数说明：
+            count：最多返回几个时刻，默认为 10。
+            before：片段从时刻之前几秒开始，默认为 8。
+            after：片段到时刻之后几秒结束，默认为 4。
+            kinds：要查找的类型，"crowd"（欢呼）和/或 "whistle"（哨声），默认为两者都查找。
+        """
+        from .moments import find_moments
+
+        return find_moments(self.path(), count, before, after, kinds)
+
     def select(self, begin: str, finish: str) -> VideoClip:
         """
         截取视频文件中的一段，并根据这段内容生成 moviepy 的 VideoClip 类的一个实例。
+        与其他截取的片段时间范围重叠的画面，只解码一次，之后从全局帧缓存（zxx.FrameCache）中读取。
 
         参数说明：
             begin：开始时间点，可以写成 "1:03:13" 这样的形式。
             finish：结束时间点，写法同上。注意开始时刻必须早于结束时刻。
         """
+        from .FrameCache import shared_frame_cache
         from .tools import str2sec
         
         b = str2sec(begin)
@@ -48,10 +124,52 @@ class File:
         if b >= e:
             raise Exception("时间轴错误：开始时刻 %s 未能早于结束时刻 %s" % (begin, finish))
         else:
+            shared_frame_cache().add_range(self.path(), b, e)    # 与其他片段重叠的画面会被缓存
             clip = self.contents().subclipped(b, e)
         return clip
     
 
+def make_proxy(path: str, height: int | None = None) -> str:
+    """
+    返回视频文件的代理文件（画面缩小、便于快速解码的副本）的路径。代理文件不存在时先用 ffmpeg 生成，之后直接复用。
+    代理文件按（源文件路径、修改时间、大小、画面高度）命名，源文件改动后会重新生成。
+    如果源文件的画面高度不超过 height，则不需要代理，直接返回源文件路径。
+
+    参数说明：
+        path：视频文件路径。
+        height：代理文件的画面高度（像素）。如果未指定，则使用 zxx.options.GetProxy("height")。
+    """
+    from hashlib import sha1
+    from os import makedirs, replace, stat
+    from os.path import abspath, expanduser, isfile, join
+    from .options import GetProxy
+    from .probe import probe, run_ffmpeg
+
+    if height == None:
+        height = GetProxy("height")
+    path = abspath(path)
+    if probe(path)["video_size"][1] <= height:
+        return path
+    folder = GetProxy("path")
+    if folder == None:
+        folder = join(expanduser("~"), ".cache", "zxx", "proxy")
+    makedirs(folder, exist_ok=True)
+    info = stat(path)
+    digest = sha1(("%s|%s|%s" % (path, info.st_mtime, info.st_size)).encode("utf8")).hexdigest()[:16]
+    proxy_path = join(folder, "%s_%dp.mp4" % (digest, height))
+    if not isfile(proxy_path):
+        print("正在生成代理文件：%s" % path)
+        temp_path = proxy_path + ".part.mp4"
+        run_ffmpeg([
+            "-i", path, "-map", "0:v:0", "-map", "0:a?",
+            # 关键帧密一些，剪辑时定位更快；时间戳与源文件保持一致
+            "-vf", "scale=-2:%d" % height, "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+            "-g", "12", "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "128k", "-y", temp_path,
+        ], error = "生成代理文件失败")
+        replace(temp_path, proxy_path)
+    return proxy_path
+
+
 # if __name__ == "__main__":
 #     from moviepy import VideoFileClip
 #     path = "E:\\temp_video_import\\片尾.mp4"
@@ -0,0 +1,221 @@
+"""
+zxx.FrameCache
+解码帧缓存
+    在时间范围重叠的片段之间共享解码出的画面。例如先截取一个进球，再截取其中一段做慢动作回放时，
+    回放的画面直接从缓存中读取，不必往回跳转、重新解码。
+"""
+
+
+import numpy as np
+
+
+class FrameCache:
+    def __init__(self, max_size: int | None = None, backing: str | None = None, path: str | None = None) -> None:
+        """
+        zxx.FrameCache 解码帧缓存类，按（源文件及解码参数, 帧序号）缓存读取器解码出的画面。
+        一般不需要直接创建，读取器池中的视频读取器都使用全局的帧缓存（shared_frame_cache()）。
+
+        为了让有限的缓存空间都用在会被再次读取的画面上，只缓存被多个片段的时间范围覆盖的画面：
+        zxx.Highlight.take()、zxx.File.select() 等截取片段时，通过 add_range() 登记片段的时间范围，
+        只被一个片段用到的画面解码后直接丢弃，不占用缓存。同一文件中完全相同的时间范围只登记一次。
+
+        参数说明：
+            max_size：缓存的画面总大小上限（字节），超出时删除最久未使用的画面。
+                如果未指定，则使用 zxx.options.GetFrameCache("max_size")。设为 0 表示不缓存。
+            backing：画面保存在哪里，"ram"（内存）或 "memmap"（内存映射的临时文件）。
+                如果未指定，则使用 zxx.options.GetFrameCache("backing")。
+                memmap 模式下临时文件的大小就是 max_size，画面在其中循环写入，写满后覆盖最早写入的画面。
+            path：memmap 模式下临时文件所在的文件夹。如果未指定，则使用 zxx.options.GetFrameCache("path")。
+        """
+        from collections import OrderedDict
+        from threading import Lock
+        from .options import GetFrameCache
+
+        if max_size == None:
+            max_size = GetFrameCache("max_size")
+        if backing == None:
+            backing = GetFrameCache("backing")
+        if path == None:
+            path = GetFrameCache("path")
+        if backing not in ("ram", "memmap"):
+            raise Exception("帧缓存的 backing 只能是 \"ram\" 或 \"memmap\"")
+        self.__max_size = max_size
+        self.__backing = backing
+        self.__path = path
+        self.__ranges = {}    # 文件路径 -> 登记的时间范围 {(开始时刻, 结束时刻)}
+        self.__frames = OrderedDict()    # (源, 帧序号) -> 画面（ram）或 (偏移, 形状)（memmap），按最近使用的顺序排列
+        self.__bytes = 0
+        self.__memmap = None
+        self.__head = 0    # memmap 模式下一次写入的位置
+        self.__lock = Lock()
+        self.__stats = {"hits": 0, "misses": 0, "stored": 0, "skipped": 0, "evicted": 0}
+
+    def add_range(self, path: str, begin: float, end: float) -> None:
+        """
+        登记一个片段将要读取的时间范围。被两个及以上登记的范围覆盖的画面，解码后才会被缓存。
+
+        参数说明：
+            path：视频文件路径。
+            begin：开始时刻（秒）。
+            end：结束时刻（秒）。
+        """
+        with self.__lock:
+            self.__ranges.setdefault(_normalize(path), set()).add((begin, end))
+
+    def get(self, source: tuple, index: int) -> np.ndarray | None:
+        """
+        查找缓存的画面。命中时返回画面（只读的 numpy 数组），未命中时返回 None。
+
+        参数说明：
+            source：源，即 (文件路径, 解码参数) 组成的元组，解码参数不同（例如缩放到不同尺寸）的画面分别缓存。
+            index：帧序号。
+        """
+        key = (source, index)
+        if self.__max_size <= 0:
+            return None
+        with self.__lock:
+            entry = self.__frames.get(key)
+            if entry is None:
+                self.__stats["misses"] += 1
+                return None
+            self.__stats["hits"] += 1
+            if self.__backing == "ram":
+                self.__frames.move_to_end(key)
+                return entry
+            offset, shape = entry
+            frame = np.array(self.__memmap[offset:offset + int(np.prod(shape))]).reshape(shape)
+        frame.flags.writeable = False
+        return frame
+
+    def put(self, source: tuple, index: int, t: float, frame: np.ndarray) -> bool:
+        """
+        缓存一帧画面。只有时刻 t 被两个及以上登记的时间范围覆盖时才会缓存，返回是否缓存。
+
+        参数说明：
+            source：源，即 (文件路径, 解码参数) 组成的元组。
+            index：帧序号。
+            t：这一帧的时刻（秒）。
+            frame：画面，uint8 类型的 numpy 数组。
+        """
+        key = (source, index)
+        size = frame.nbytes
+        with self.__lock:
+            if key in self.__frames:
+                return True
+            if size > self.__max_size or frame.dtype != np.uint8 or not self.__wanted(source[0], t):
+                self.__stats["skipped"] += 1
+                return False
+            if self.__backing == "ram":
+                while self.__bytes + size > self.__max_size:
+                    self.__drop(next(iter(self.__frames)))
+                frame = np.asarray(frame)
+                frame.flags.writeable = False    # 缓存的画面会被多个片段共用，不能被修改
+                self.__frames[key] = frame
+            else:
+                offset = self.__allocate(size)
+                self.__memmap[offset:offset + size] = frame.reshape(-1)
+                self.__frames[key] = (offset, frame.shape)
+            self.__bytes += size
+            self.__stats["stored"] += 1
+        return True
+
+    def clear(self) -> None:
+        """
+        清空缓存的画面和登记的时间范围，关闭 memmap 模式下的临时文件。
+        """
+        with self.__lock:
+            self.__ranges = {}
+            self.__frames.clear()
+            self.__bytes = 0
+            self.__memmap = None
+            self.__head = 0
+
+    def stats(self) -> dict:
+        """
+        返回帧缓存的统计信息：
+            backing：画面保存在哪里（"ram" 或 "memmap"）；
+            frames：缓存的画面数；
+            size / max_size：缓存的画面总大小 / 大小上限（字节）；
+            hits / misses：查找时命中 / 未命中的次数；
+            stored：缓存的画面数（累计）；
+            skipped：因为只被一个片段用到（或者比上限还大）而没有缓存的画面数；
+            evicted：因为超出上限而被删除的画面数。
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["backing"] = self.__backing
+            stats["frames"] = len(self.__frames)
+            stats["size"] = self.__bytes
+            stats["max_size"] = self.__max_size
+        return stats
+
+    def __wanted(self, path: str, t: float) -> bool:
+        """
+        时刻 t 是否被该文件两个及以上登记的时间范围覆盖。
+        """
+        count = 0
+        for begin, end in self.__ranges.get(path, ()):
+            if begin - 1e-6 <= t < end + 1e-6:
+                count += 1
+                if count >= 2:
+                    return True
+        return False
+
+    def __drop(self, key: tuple) -> None:
+        """
+        删除一帧缓存的画面。
+        """
+        entry = self.__frames.pop(key)
+        self.__bytes -= entry.nbytes if self.__backing == "ram" else int(np.prod(entry[1]))
+        self.__stats["evicted"] += 1
+
+    def __allocate(self, size: int) -> int:
+        """
+        memmap 模式下，在临时文件中分配 size 字节，返回偏移。写到文件末尾时回到开头，覆盖最早写入的画面。
+        """
+        from tempfile import TemporaryFile
+
+        if self.__memmap is None:
+            # 临时文件关闭后自动删除；各画面按写入顺序循环存放
+            self.__memmap = np.memmap(TemporaryFile(dir=self.__path), dtype=np.uint8, mode="w+",
+                                      shape=(self.__max_size,))
+        if self.__head + size > self.__max_size:
+            self.__head = 0
+        start, end = self.__head, self.__head + size
+        for key, (offset, shape) in list(self.__frames.items()):
+            if offset < end and start < offset + int(np.prod(shape)):
+                self.__drop(key)
+        self.__head = end
+        return start
+
+
+def _normalize(path: str) -> str:
+    """
+    统一文件路径的写法，与读取器池的键相同。
+    """
+    from os.path import abspath, normcase
+
+    return normcase(abspath(path))
+
+
+_SHARED_FRAME_CACHE = None
+
+
+def shared_frame_cache() -> FrameCache:
+    """
+    返回 zxx 默认使用的全局帧缓存。读取器池中的视频读取器都使用这个缓存，设置通过 zxx.options.SetFrameCache() 修改。
+    """
+    global _SHARED_FRAME_CACHE
+
+    if _SHARED_FRAME_CACHE == None:
+        _SHARED_FRAME_CACHE = FrameCache()
+    return _SHARED_FRAME_CACHE
+
+
+def reset_frame_cache() -> None:
+    """
+    丢弃全局帧缓存（下次使用时按当前设置重新创建）。修改帧缓存设置后、以及通过 fork 创建的子进程中调用。
+    """
+    global _SHARED_FRAME_CACHE
+
+    _SHARED_FRAME_CACHE = None
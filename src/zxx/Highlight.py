@@ -7,34 +7,59 @@ zxx.Highlight
 
 from moviepy import VideoClip
 from .File import File
+from .Timeline import Timeline
 
 
 class Highlight():
-    def __init__(self, contents: VideoClip = None):
+    def __init__(self, contents: VideoClip = None, style: "Style" = None, dry_run: bool = False):
         """
         zxx.Highlight 集锦类，由多个经过处理的视频片段组合形成集锦，并对集锦进行配置背景音乐、刷新比分等进一步操作。
 
         参数说明：
             contents：集锦的初始内容，类型是 moviepy.video 的 VideoClip 类。新建集锦实例时，建议不指定 contents。
+            style：集锦的样式（工作路径、比赛信息、字幕和比分牌样式），类型为 zxx.Style。
+                如果未指定，则一直使用 zxx.options 中的默认设置，直到调用 set_style()、change_match_info() 等方法为止。
+                在多个线程中同时制作集锦时，请为每个集锦指定样式（例如 zxx.options.GetStyle()），不要在途中修改全局设置。
+            dry_run：是否预演，默认为 False。预演时 use()、take()、add_bgm() 等方法只记录操作、不打开任何视频，
+                export() 也不导出，而是只读取媒体文件的元数据，检查所有片段并打印预演报告（参见 dry_run() 方法）。
+                适合在正式制作很长的集锦之前，几秒钟内发现时间写错、文件找不到等问题。
         """
-        self.__contents = contents
+        if dry_run and contents != None:
+            raise Exception("预演时不能指定集锦的初始内容")
+        self.__timeline = Timeline()
+        if contents != None:
+            self.__timeline.append(contents)
         self.__source_file = None
+        self.__proxy_file = None    # 代理模式下，正在使用的视频的代理文件
+        self.__proxy_height = None    # 代理文件的画面高度，None 表示不使用代理模式
+        self.__size = None    # 集锦的画面尺寸，由初始内容或第一次 use() 的视频决定
+        self.__style = style    # None 表示使用 zxx.options 中的默认设置
         self.__score = (0, 0)
         self.__show_score = False
+        # 操作记录，供 to_edl() 导出。有初始内容的集锦无法用 EDL 描述，记为 None
+        self.__events = [] if contents == None else None
+        self.__edl_style = None    # 操作记录中最近一次记录的样式
+        self.__export = None    # 最近一次 export() 的参数
+        self.__dry_run = dry_run
 
     def contents(self) -> VideoClip | None:
         """
         获取视频内容。
+        集锦内部以扁平的时间线保存各个片段，调用本方法时才一次性拼接（结果会被缓存，直到集锦再次改动）。
         """
-        return self.__contents
+        if len(self.__timeline) == 0:
+            return None
+        return self.__timeline.build()
 
     def duration(self) -> str:
         """
         获取视频时长。
         """
         from .tools import sec2str
-        
-        dur = sec2str(self.contents().duration)
+
+        if self.__dry_run:
+            return sec2str(self.plan(strict=False).summary()["duration"])
+        dur = sec2str(self.__timeline.duration())
         return dur
 
     def print_duration(self) -> "Highlight":
@@ -53,36 +78,54 @@ class Highlight():
         """
         return self.__source_file
 
+    def style(self) -> "Style":
+        """
+        返回集锦当前的样式，类型为 zxx.Style。集锦没有自己的样式时，返回 zxx.options 中的默认设置。
+        """
+        from .options import GetStyle
+
+        return self.__style if self.__style != None else GetStyle()
+
+    def set_style(self, style: "Style" = None, **kwargs) -> "Highlight":
+        """
+        设置集锦的样式，只影响之后截取的片段，不影响其他集锦，也不修改 zxx.options 中的全局设置。
+        返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
+
+        参数说明：
+            style：新的样式，类型为 zxx.Style。如果未指定，则在集锦当前的样式上修改。
+            **kwargs：要修改的设置，会传入 zxx.Style.replace()，可以是 path、match_info、caption_style、scoreboard_style，例如：
+                set_style(caption_style={"color": "yellow"}, scoreboard_style={"width_factor": 0.3})
+        """
+        if style == None:
+            style = self.style()
+        self.__style = style.replace(**kwargs)
+        return self
+
     def score(self) -> tuple:
         """
         返回当前比分（主队得分在前）。
         """
         return self.__score
 
-    def __add_video(self, clip: VideoClip) -> "Highlight":
+    def __add_video(self, clip: VideoClip, take: "Take" = None) -> "Highlight":
         """
         不应外部调用本方法！实际剪辑集锦时，应使用 zxx.Highlight.use() 代替。
 
         向集锦中追加一段视频片段。如果新追加视频画面尺寸不同，会自动将新视频统一成和已有集锦相同的尺寸。
+        片段只追加到扁平的时间线上，不会在每次追加时重新拼接整个集锦。
         返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
 
         参数说明：
             video：要追加的视频片段，类型是 moviepy 的 VideoClip 类。
+            take：该片段的描述，类型为 zxx.Take。用于导出时判断能否直接复制码流。
         """
-        from moviepy import concatenate_videoclips
-        from moviepy.video import fx as vfx
+        from .tools import fit_size
 
-        if self.contents() == None:
-            self.__contents = clip
-        else:
-            # 统一视频尺寸
-            hl_size = self.__contents.size
-            v_size = clip.size
-            if hl_size != v_size:
-                new_clip = clip.with_effects([vfx.Resize(hl_size)])
-            else:
-                new_clip = clip
-            self.__contents = concatenate_videoclips([self.contents(), new_clip])
+        # 统一视频尺寸
+        hl_size = self.__timeline.size()
+        if hl_size != None:
+            clip = fit_size(clip, hl_size)
+        self.__timeline.append(clip, take)
         return self
 
     def silence(self) -> "Highlight":
@@ -90,40 +133,42 @@ class Highlight():
         集锦整体消音。
         返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
         """
-        from moviepy.audio import fx as afx
-
-        clip = self.contents()
-        clip = clip.with_effects([afx.MultiplyVolume(factor=0)])
-        self.__contents = clip
+        self.__record("silence", True)
+        if not self.__dry_run:
+            self.__timeline.mute()
         return self
 
     def add_bgm(self, filename: str, folder: str = None, 
-                select: list = [], repeat: int = 1, mode = "cut") -> "Highlight":
+                select: list = [], repeat: int | None = 1, mode = "cut", crossfade: float = 0) -> "Highlight":
         """
         为集锦添加背景音乐。
         返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
 
         参数说明：
             filename：背景音乐的文件名。
-            folder：背景音乐文件所在的文件夹绝对路径。如果未指定，则默认为工作目录（即 zxx.options.GetPath() 的返回值）。
+            folder：背景音乐文件所在的文件夹绝对路径。如果未指定，则默认为集锦样式中的工作路径（即 self.style().path()）。
             select：选择截取音乐的时间范围。
                 写成 ["02:12", "03:06"] 这样的形式。注意开始时刻必须早于结束时刻。
                 开始 / 结束时刻如果是空字符串，默认是音乐的开始 / 结束处。
-            repeat：设置把截取的音乐片段重复几次（默认为 1，即不重复）
+            repeat：设置把截取的音乐片段重复几次（默认为 1，即不重复）。
+                在 "cut" 模式下可以设为 None，表示循环播放直到视频结束，适合用很短的音乐覆盖很长的集锦。
+                循环播放时，每个时刻直接映射回截取的音乐片段中的位置，不会复制音乐，内存占用与重复次数无关。
             mode：设置配乐的模式。具体有如下选择：
-                mode = "cut"：原速播放音乐，如果视频结束音乐仍未结束，则直接停止音乐。
+                mode = "cut"：原速播放音乐，如果视频结束音乐仍未结束，则直接停止音乐；如果音乐先结束，则之后没有背景音乐。
                 mode = "change_music_speed"：自动调整音乐速度，以匹配视频时长。可能导致音乐变调。
+            crossfade：重复播放时，接缝处交叉淡入淡出的时长（秒），默认为 0 即直接首尾相接。
         """
         from moviepy import AudioFileClip
-        from moviepy import concatenate_audioclips
         from moviepy.video import fx as vfx
         from os.path import join
-        from .options import GetPath
-        from .tools import str2sec
+        from .tools import str2sec, loop_audio
 
+        self.__record("add_bgm", {"filename": filename, "folder": folder, "select": select,
+                                  "repeat": "loop" if repeat == None else repeat, "mode": mode, "crossfade": crossfade})
+        if self.__dry_run:
+            return self
         if folder == None:
-            folder = GetPath()
-        video_clip = self.__contents
+            folder = self.style().path()
         audio_clip = AudioFileClip(join(folder, filename))
         if select != []:
             if select[0] == "":
@@ -138,33 +183,173 @@ class Highlight():
                 raise Exception("背景音乐剪辑错误：开始时间（%s）不早于结束时间（%s）" % (b, e))
             else:
                 audio_clip = audio_clip.subclipped(b, e)
-        if repeat > 1:
-            for i in range(repeat - 1):
-                audio_clip = concatenate_audioclips([audio_clip, audio_clip])
-        video_duration = video_clip.duration
+        video_duration = self.__timeline.duration()
+        if repeat == None:
+            if mode != "cut":
+                raise Exception("添加背景音乐失败，只有 \"cut\" 模式可以循环播放直到视频结束（repeat=None）")
+            audio_clip = loop_audio(audio_clip, video_duration, crossfade)
+        elif repeat > 1:
+            audio_clip = loop_audio(audio_clip, repeat * audio_clip.duration - (repeat - 1) * crossfade, crossfade)
         audio_duration = audio_clip.duration
         if mode == "cut":               # 视频结束停止音乐
-            audio_clip = audio_clip.subclipped(0, video_duration)
-            self.__contents = video_clip.with_audio(audio_clip)
+            audio_clip = audio_clip.subclipped(0, min(audio_duration, video_duration))
+            self.__timeline.set_audio(audio_clip)
         elif mode == "change_music_speed":    # 调整音乐速度，匹配视频时长
             speed = audio_duration / video_duration
             audio_clip = audio_clip.with_effects([vfx.MultiplySpeed(final_duration=video_duration)])
             print("为匹配视频长度，背景音乐速度已调整为原先的 %.2f 倍" % speed)
-            self.__contents = video_clip.with_audio(audio_clip)
+            self.__timeline.set_audio(audio_clip)
         else:
             raise Exception("添加背景音乐失败，请指定模式（\"cut\" 或 \"change_music_speed\"）")
         return self
 
+    def mix_bgm(self, filename: str, folder: str = None, select: list = [], span: list = [],
+                repeat: int | None = None, loudness: float | None = -20, gain: float = 0,
+                fadein: float = 0, fadeout: float = 0, duck: float = 0, duck_threshold: float = -40,
+                crossfade: float = 0) -> "Highlight":
+        """
+        在集锦的原声之上混入一段背景音乐。与 add_bgm() 不同，原声和已经混入的背景音乐都会保留，
+        因此可以多次调用，在集锦的不同时间范围混入不同的音乐。
+        每段音乐可以分别标准化响度、调整音量、淡入淡出，并在原声（解说、现场声音）响亮时自动降低音量（闪避）。
+        响度按流式分块测量（参见 zxx.probe.loudness()），结果按文件和截取范围缓存；
+        音量、淡入淡出和闪避都在导出时的同一次混音中逐块计算，不会把整段音乐读入内存，长达数小时的音乐也可以使用。
+        返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
+
+        参数说明：
+            filename：背景音乐的文件名。
+            folder：背景音乐文件所在的文件夹绝对路径。如果未指定，则默认为集锦样式中的工作路径（即 self.style().path()）。
+            select：选择截取音乐的时间范围，写法与 add_bgm() 相同，例如 ["02:12", "03:06"]。
+            span：音乐在集锦中播放的时间范围，写成 ["00:10", "01:30"] 这样的形式。
+                开始 / 结束时刻如果是空字符串（或不指定），默认是集锦的开始 / 目前的结束处。
+            repeat：把截取的音乐片段重复几次，默认为 None，即循环播放直到 span 结束。无论重复几次，都在 span 结束时停止。
+            loudness：把音乐的响度标准化为多少 dBFS，默认为 -20。为 None 时不标准化。
+                为避免削波，标准化后的采样峰值不会超过 -1 dBFS。
+            gain：在标准化之后再调整的音量（分贝），默认为 0。例如 -6 表示音量减半。
+            fadein：淡入的秒数，默认为 0。
+            fadeout：淡出的秒数，默认为 0。
+            duck：闪避时降低的音量（分贝），默认为 0 即不闪避。例如 12 表示原声响亮时音乐的音量降低 12 分贝。
+            duck_threshold：闪避的门限（dBFS），默认为 -40。原声的响度超过门限时音乐开始闪避。
+            crossfade：重复播放时，接缝处交叉淡入淡出的时长（秒），默认为 0 即直接首尾相接。
+        """
+        from moviepy import AudioFileClip
+        from moviepy.audio import fx as afx
+        from os.path import join
+        from .probe import loudness as measure_loudness
+        from .tools import str2sec, loop_audio
+
+        self.__record("mix_bgm", {"filename": filename, "folder": folder, "select": select, "span": span,
+                                  "repeat": "loop" if repeat == None else repeat, "loudness": loudness, "gain": gain,
+                                  "fadein": fadein, "fadeout": fadeout, "duck": duck, "duck_threshold": duck_threshold,
+                                  "crossfade": crossfade})
+        if self.__dry_run:
+            return self
+        if folder == None:
+            folder = self.style().path()
+        path = join(folder, filename)
+        audio_clip = AudioFileClip(path)
+        b, e = 0, audio_clip.duration
+        if select != []:
+            b = 0 if select[0] == "" else str2sec(select[0])
+            e = audio_clip.duration if select[1] == "" else str2sec(select[1])
+            if b >= e:
+                raise Exception("背景音乐剪辑错误：开始时间（%s）不早于结束时间（%s）" % (b, e))
+            audio_clip = audio_clip.subclipped(b, e)
+        start = 0 if len(span) == 0 or span[0] == "" else str2sec(span[0])
+        end = self.__timeline.duration() if len(span) < 2 or span[1] == "" else str2sec(span[1])
+        if start >= end:
+            raise Exception("混入背景音乐失败：播放范围的开始时刻（%s）不早于结束时刻（%s）" % (start, end))
+        if repeat == None:
+            audio_clip = loop_audio(audio_clip, end - start, crossfade)
+        elif repeat > 1:
+            audio_clip = loop_audio(audio_clip, repeat * audio_clip.duration - (repeat - 1) * crossfade, crossfade)
+        audio_clip = audio_clip.subclipped(0, min(audio_clip.duration, end - start))
+
+        # 音量、淡入淡出都是逐块计算的变换，在导出混音时才执行
+        volume = gain
+        if loudness != None:
+            measured = measure_loudness(path, b, e)
+            if measured["loudness"] == None:
+                print("背景音乐 %s 在所选范围内是静音，不调整响度" % path)
+            else:
+                volume += loudness - measured["loudness"]
+                volume = min(volume, -1 - measured["peak"])
+        effects = []
+        if volume != 0:
+            effects.append(afx.MultiplyVolume(10 ** (volume / 20)))
+        if fadein > 0:
+            effects.append(afx.AudioFadeIn(fadein))
+        if fadeout > 0:
+            effects.append(afx.AudioFadeOut(fadeout))
+        if len(effects) > 0:
+            audio_clip = audio_clip.with_effects(effects)
+        self.__timeline.add_audio(audio_clip, start, (duck, duck_threshold) if duck > 0 else None)
+        return self
+
     def use(self, filename: str, folder: str = None) -> "Highlight":
         """
         指定集锦的下一段视频片段使用的视频源文件。
+        第一次调用时（且没有初始内容时），该视频的画面尺寸就是集锦的画面尺寸；之后尺寸不同的视频由 ffmpeg 在解码时直接缩放到集锦的尺寸。
         返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
         
         参数说明：
             filename：视频文件名。
-            folder：视频源文件所在的文件夹绝对路径。如果未指定，则默认为工作目录（即 zxx.options.GetPath() 的返回值）。
+            folder：视频源文件所在的文件夹绝对路径。如果未指定，则默认为集锦样式中的工作路径（即 self.style().path()）。
+        """
+        from os.path import abspath, join
+        from .File import make_proxy
+
+        self.__record("use", {"filename": filename, "folder": folder})
+        if self.__dry_run:
+            return self
+        if folder == None:
+            folder = self.style().path()
+        if self.__size == None:
+            self.__size = self.__timeline.size()
+        path = join(folder, filename)
+        self.__proxy_file = None
+        if self.__proxy_height != None:
+            proxy_path = make_proxy(path, self.__proxy_height)
+            if proxy_path != abspath(path):
+                self.__proxy_file = self.__open(proxy_path, "")
+        if self.__proxy_file == None:
+            self.__source_file = self.__open(filename, folder)
+        else:    # 代理模式下源文件只用于读取路径和时长，不需要缩放
+            self.__source_file = File(filename, folder)
+        return self
+
+    def __open(self, filename: str, folder: str) -> File:
+        """
+        打开视频文件。如果画面尺寸与集锦不同，则让 ffmpeg 在解码时直接缩放；集锦还没有尺寸时，以该视频的尺寸为准。
+        """
+        from os.path import join
+        from .probe import display_size
+
+        native = display_size(join(folder, filename))
+        if self.__size == None:
+            self.__size = native
+        if tuple(self.__size) == native:
+            return File(filename, folder)
+        return File(filename, folder, target_resolution=self.__size)
+
+    def proxy(self, enable: bool = True, height: int | None = None) -> "Highlight":
+        """
+        开启或关闭代理模式。代理模式下，use() 的视频会先生成（并缓存）画面缩小的代理文件，
+        之后 take() 截取的片段、字幕和比分牌都在代理文件的分辨率下排版，预览导出因此快得多。
+        导出时（preview 模式除外）会根据片段描述自动换回源文件，按原始分辨率重新生成各个片段。
+        请在 use() 之前调用。
+        返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
+
+        参数说明：
+            enable：是否开启代理模式，默认为 True。
+            height：代理文件的画面高度（像素）。如果未指定，则使用 zxx.options.GetProxy("height")。
         """
-        self.__source_file = File(filename, folder)
+        from .options import GetProxy
+
+        if not enable:
+            self.__proxy_height = None
+        else:
+            self.__proxy_height = height if height != None else GetProxy("height")
+        self.__record("proxy", {"enable": enable, "height": height})
         return self
 
     def show_score(self, show: bool = True) -> "Highlight":
@@ -173,6 +358,7 @@ class Highlight():
         返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
         """
         self.__show_score = show
+        self.__record("show_score", show)
         return self
 
     def set_score(self, home: int, away: int) -> "Highlight":
@@ -185,6 +371,7 @@ class Highlight():
             away：更新后的客队得分。
         """
         self.__score = (home, away)
+        self.__record("set_score", [home, away])
         return self
 
     def take(self, *args: list) -> "Highlight":
@@ -221,6 +408,7 @@ class Highlight():
                     contrast: float = 0, 
                     fadein: float = 0, 
                     fadeout: float = 0,
+                    stabilize: bool | float | dict = False,
                 具体意义：
                     speed：调整视频的速度倍数，不建议放慢太多，可能导致时间轴错误。
                     silence：是否消音。
@@ -228,117 +416,287 @@ class Highlight():
                     contrast：对比度要调整的值，大小没有限制，不过一般在 -1 至 1之间，可自行调试。
                     fadein：淡入效果持续的秒数。
                     fadeout：淡出效果持续的秒数。
+                    stabilize：画面增稳，适合手持拍摄的场边录像。True 表示使用默认设置；数字表示平滑窗口的半径（秒，默认为 1）；
+                        也可以写成 {"smoothing": 1, "zoom": 1.05}，zoom 是为遮住移出画面的边缘而放大的倍数。
+                        只分析片段前后一小段范围内的运动（参见 zxx.options.SetStabilize()），运动数据保存在磁盘上的缓存中，
+                        重新导出或截取重叠的片段（例如慢动作回放）时直接使用。参见 zxx.Stabilizer。
         """
 
-        from .tools import add_effects, add_caption, add_scoreboard
+        from .Take import Take, parse_take_info
 
         # 不传入任何参数的情况
         if len(args) == 0:
             args = [["", ""]]
-        # 分析参数
+        self.__record("take", [list(info) for info in args])
+        if self.__dry_run:
+            return self
         for info in args:
-            if len(info) >= 5:
-                raise Exception("*args 中某一项包含元素过多，必须是 1 至 4 个！")
-            if len(info) == 1:    # 处理只传入 1 个元素的情况
-                info = ["", "", info[0]]
-            elif len(info) == 2:    # 处理传入 2 个元素为字幕和特效的情况
-                if isinstance(info[1], dict):
-                    info = ["", "", info[0], info[1]]
-            begin = info[0]
-            end = info[1]
-            if begin == "":
-                begin = "0"
-            if end == "":
-                end = str(self.source_file().contents().duration)
-            # 截取视频片段
-            clip = self.source_file().select(begin, end)
-            if len(info) == 4:    # 添加特效和字幕，顺序是先加特效，再加字幕和比分牌
-                effects = info[3]
-                clip = add_effects(clip, **effects)
-                caption = info[2]
-                clip = add_caption(clip, caption)
-            elif len(info) == 3:    # 只添加特效或字幕
-                if isinstance(info[2], dict):
-                    effects = info[2]
-                    clip = add_effects(clip, **effects)
-                else:
-                    caption = info[2]
-                    clip = add_caption(clip, caption)
-            if self.__show_score:
-                home_score, away_score = self.score()
-                clip = add_scoreboard(clip, home_score, away_score)
-            self.__add_video(clip)
+            begin, end, caption, effects = parse_take_info(info, self.source_file().contents().duration)
+            score = self.score() if self.__show_score else None
+            # 记录片段描述，并据此截取视频片段、添加特效、字幕和比分牌
+            proxy_height = None if self.__proxy_file == None else self.__proxy_height
+            take = Take(self.source_file().path(), begin, end, caption, effects, score, self.style(), proxy_height)
+            clip = take.clip(self.source_file() if self.__proxy_file == None else self.__proxy_file)
+            self.__add_video(clip, take)
         return self
 
-    def export(self, filename: str, folder: str = None, mode: str = "hd", threads: int | None = None) -> "Highlight":
+    def export(self, filename: str, folder: str = None, mode: str = "hd", threads: int | None = None,
+               smart: bool = False, workers: int = 1, chunk_size: float = 20,
+               temp_dir: str | None = None, cache: "bool | RenderCache" = False,
+               proxy: bool | None = None, pipeline: bool = False,
+               profile: "bool | Profiler" = False) -> "Highlight":
         """
         将整个集锦导出成视频文件。
         返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
 
         参数说明：
             filename：导出的视频文件名。
-            folder：导出的视频文件所在的文件夹绝对路径。如果未指定，则默认为工作目录（即 zxx.options.GetPath() 的返回值）。
-            mode：导出模式。可设置以下模式：
+            folder：导出的视频文件所在的文件夹绝对路径。如果未指定，则默认为集锦样式中的工作路径（即 self.style().path()）。
+            mode：导出模式。可设置以下模式（也可以通过 zxx.options.SetExportMode() 新增或修改）：
                 mode = "preview"：用于导出快速预览，视频文件会很小，建议导出文件名选择 .mp4 后缀。
                 mode = "hd"：高清画质，视频压缩效果好，建议导出文件名选择 .mp4 后缀。
                 mode = "DJI Action 4"：匹配大疆 Action 4 画质，建议导出文件名选择 .mp4 后缀。
                 mode = "lossless"，无损画质，文件非常大，不推荐使用。建议导出文件名选择 .avi 后缀。
-            threads：导出时的线程数，默认为 None 即不使用多线程。不推荐使用，因为似乎没有什么用处。
+            threads：导出时编码器的线程数，默认为 None 即不使用多线程。它只对编码器有效，解码、特效和合成仍然只用一个 CPU 核，
+                想让导出速度随核数增长，请使用 workers。
+            smart：是否智能导出，默认为 False。智能导出时，未经任何后期处理（没有特效、字幕和比分牌）、
+                且编码参数与导出设置一致的片段（例如片尾）会直接复制码流，只有关键帧之前的几帧需要重新编码，
+                导出速度接近复制文件的速度。只对使用 libx264 编码的导出模式有效。
+            workers：同时编码的进程数，默认为 1。大于 1 时，集锦在片段边界处切成若干块，由多个进程同时解码、处理和编码，
+                再无损拼接。可以与 smart 同时使用。在 Windows 和 macOS 上使用时，导出代码必须放在 if __name__ == "__main__": 之下。
+            chunk_size：多进程导出时每块的目标时长（秒），默认为 20。块越小，各进程的负担越均匀，但每块都要重新打开源文件。
+            temp_dir：智能导出或多进程导出时存放中间文件的文件夹。如果未指定，则使用系统的临时文件夹。
+            cache：是否增量导出，默认为 False。增量导出时，每个片段单独编码，并按其内容（源文件、时间范围、特效、字幕、
+                比分牌及其样式、导出模式）保存在分段缓存中；再次导出时只重新编码改动过的片段，其余片段直接从缓存拼接。
+                缓存位置和大小上限通过 zxx.options.SetRenderCache() 设置，也可以直接传入一个 zxx.RenderCache 实例。
+                查看或清空缓存：python -m zxx cache info / python -m zxx cache purge
+            proxy：是否直接导出代理模式下的片段。默认为 None，即只有 preview 模式直接使用代理文件，
+                其余模式换回源文件，按原始分辨率重新生成各个片段。
+            pipeline：是否流水线导出，默认为 False。流水线导出时，解码、合成和编码分别在各自的线程中进行，
+                下一个片段在当前片段编码时就开始打开源文件和解码，导出结束后打印各级的利用率。导出的视频与普通导出完全相同。
+                只对不分段的导出有效，即 smart、workers、cache 都未开启时。参见 zxx.render.pipelined_render()。
+            profile：是否记录导出的性能数据，默认为 False。开启时记录每个片段、每一级处理（解码、特效、字幕、比分牌、缩放、
+                拼接、编码）的耗时和帧率，以及内存峰值和读写的字节数，导出结束后打印汇总表，并把 JSON 报告保存在导出的视频旁边
+                （文件名加上 .profile.json）。也可以传入一个 zxx.Profiler 实例，以指定报告路径或添加自定义的指标接收函数。
+                只有普通导出时才能区分各级处理，参见 zxx.Profiler。
         """
         from os.path import join
-        from .options import GetPath
-
+        from .options import GetExportMode
+        from .Profiler import Profiler
+        from .render import pipelined_render, profiled_render, segmented_render
+        from .RenderCache import RenderCache
+
+        self.__export = {"filename": filename, "folder": folder, "mode": mode, "threads": threads, "smart": smart,
+                         "workers": workers, "chunk_size": chunk_size, "temp_dir": temp_dir,
+                         "cache": cache is not False and cache != None, "proxy": proxy, "pipeline": pipeline,
+                         "profile": profile is not False and profile != None}
+        if self.__dry_run:
+            self.dry_run(mode)
+            return self
         if folder == None:
-            folder = GetPath()
+            folder = self.style().path()
         output_path = join(folder, filename)
-        # 快速导出
-        if mode == "preview":
-            self.__contents.write_videofile(
-                output_path,
-                fps = 24,
-                preset = "ultrafast",
-                bitrate = "1000k",
-                threads = threads,
-            )
-        # 高清画质
-        ## 视频质量通过 bitrate 参数调节，B 站推荐 4K 视频码率大于 20000kbps
-        elif mode == "hd":
-            self.__contents.write_videofile(
-                output_path,
-                codec = "libx264",
-                bitrate = "20000k",
-                threads = threads,
-            )
-        # 匹配大疆 Action 4 画质
-        elif mode == "DJI Action 4":
-            self.__contents.write_videofile(
-                output_path,
-                fps = 59.94,
-                codec="libx264",
-                bitrate="100000k",
-                threads = threads,
-            )
-        # 无损画质
-        elif mode == "lossless":
-            self.__contents.write_videofile(
-                output_path,
-                codec = "png",
-                bitrate = "20000k",
-                threads = threads,
-            )
+        params = GetExportMode(mode)
+        if proxy == None:
+            proxy = mode == "preview"
+        timeline = self.__timeline if proxy else self.__original_timeline()
+        if cache is True:
+            cache = RenderCache()
+        elif cache is False:
+            cache = None
+        if profile is True:
+            profile = Profiler()
+        elif profile is False:
+            profile = None
+        if profile != None:
+            profile.start(output_path, mode=mode)
+        if smart or workers > 1 or cache != None:
+            segmented_render(timeline, output_path, params, copy=smart, workers=workers,
+                             chunk_size=chunk_size, threads=threads, temp_dir=temp_dir, cache=cache)
+        elif pipeline:
+            stats = pipelined_render(timeline, output_path, params, threads=threads, temp_dir=temp_dir)
+            if profile != None:
+                profile.set_extra("pipeline", stats)
+        elif profile != None:
+            profiled_render(timeline, output_path, params, profile, threads=threads, temp_dir=temp_dir)
+        else:
+            timeline.build().write_videofile(output_path, threads=threads, **params)
         print("视频已导出至 %s" % output_path)
+        if profile != None:
+            # 只有普通导出时逐帧记录，其他导出方式按时长计算帧数
+            segmented = smart or workers > 1 or cache != None or pipeline
+            fps = params.get("fps") or timeline.build().fps
+            profile.finish(frames=int(timeline.duration() * fps) if segmented else None)
+            profile.print_summary()
+            print("性能分析报告已保存至 %s" % profile.save())
         return self
     
+    def export_many(self, outputs: list, folder: str = None, threads: int | None = None,
+                    temp_dir: str | None = None, proxy: bool | None = None) -> "Highlight":
+        """
+        一次导出多个版本（例如高清版、发到群里的预览版和匹配大疆 Action 4 画质的母版）。
+        每一帧只解码、合成一次，再同时交给各版本的编码器，总用时接近其中最慢的一个版本单独导出的用时，
+        而分别调用 export() 需要把整个集锦解码、合成好几遍。参见 zxx.render.multi_render()。
+        返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
+
+        参数说明：
+            outputs：各版本组成的列表，每个版本是一个 list，写成 [文件名, 导出模式] 或 [文件名, 导出模式, 画面高度] 的形式。
+                导出模式与 export() 的 mode 相同；画面高度（像素）用于导出较小的版本，宽度按比例换算，未指定时与集锦相同。例如：
+                    Highlight().use("素材.mp4").take(["00:06", "00:20"]).export_many([
+                        ["集锦.mp4", "hd"],
+                        ["预览.mp4", "preview", 540],
+                        ["母版.mp4", "DJI Action 4"],
+                    ])
+            folder：导出的视频文件所在的文件夹绝对路径。如果未指定，则默认为集锦样式中的工作路径（即 self.style().path()）。
+            threads：每个编码器的线程数，默认为 None 即不使用多线程。
+            temp_dir：存放声音临时文件的文件夹。如果未指定，则使用系统的临时文件夹。
+            proxy：是否直接导出代理模式下的片段。默认为 None，即只有所有版本都是 preview 模式时才直接使用代理文件。
+        """
+        from os.path import join
+        from .options import GetExportMode
+        from .render import multi_render
+
+        for output in outputs:
+            if not isinstance(output, (list, tuple)) or len(output) not in (2, 3):
+                raise Exception("导出版本的格式错误：%r，应写成 [文件名, 导出模式] 或 [文件名, 导出模式, 画面高度]" % (output,))
+        if len(set(output[0] for output in outputs)) != len(outputs):
+            raise Exception("各版本的文件名不能相同！")
+        if self.__dry_run:
+            for output in outputs:
+                self.dry_run(output[1])
+            return self
+        if folder == None:
+            folder = self.style().path()
+        if proxy == None:
+            proxy = all(output[1] == "preview" for output in outputs)
+        timeline = self.__timeline if proxy else self.__original_timeline()
+        if timeline.size() == None:
+            raise Exception("集锦中没有任何片段，无法导出！")
+        width, height = timeline.size()
+        renditions = []
+        for output in outputs:
+            size = None
+            if len(output) == 3 and output[2] != None:
+                # 宽高都取偶数，libx264 要求 yuv420p 画面的宽高是偶数
+                size = (max(round(width * output[2] / height / 2) * 2, 2), max(round(output[2] / 2) * 2, 2))
+            renditions.append((join(folder, output[0]), GetExportMode(output[1]), size))
+        multi_render(timeline, renditions, threads=threads, temp_dir=temp_dir)
+        for path, _, _ in renditions:
+            print("视频已导出至 %s" % path)
+        return self
+
+    def __original_timeline(self) -> Timeline:
+        """
+        返回把代理模式下的片段全部换回源文件后的时间线。
+        只要有片段使用了代理文件，所有片段都按源文件重新生成，并由 ffmpeg 在解码时统一缩放到第一个片段的尺寸。
+        """
+        from .tools import fit_size
+
+        takes = self.__timeline.takes()
+        if all(take == None or take.proxy_height == None for take in takes):
+            return self.__timeline
+        print("代理模式：按源文件重新生成 %d 个片段" % len([take for take in takes if take != None]))
+        size = []
+
+        def original(clip, take):
+            if take != None:
+                take = take.original()
+                clip = take.clip(size=size[0] if len(size) > 0 else None)
+            if len(size) == 0:    # 与 __add_video() 相同，以第一个片段的尺寸为准
+                size.append(tuple(clip.size))
+            return fit_size(clip, size[0]), take
+
+        return self.__timeline.map(original)
+
     def change_match_info(self, home: str = "", away: str = "") -> "Highlight":
         """
         中途修改比赛信息（主客队信息），用于制作多场比赛的集锦。
+        只修改本集锦的样式（之后截取的片段使用新的队名），不修改 zxx.options 中的全局设置。
         """
-        from .options import SetMatchInfo
+        match_info = {}
+        if home != "":
+            match_info["home"] = home
+        if away != "":
+            match_info["away"] = away
+        return self.set_style(match_info=match_info)
 
-        if home != "" and away != "":
-            SetMatchInfo(home=home, away=away)
-        elif home != "":
-            SetMatchInfo(home=home)
-        elif away != "":
-            SetMatchInfo(away=away)
-        return self
+    # 以下是与 EDL（剪辑决策表）相关的方法，EDL 的格式参见 zxx.edl
+
+    def __record(self, name: str, value) -> None:
+        """
+        不应外部调用本方法！
+
+        在操作记录中追加一步操作，供 to_edl() 导出。集锦的样式与上一次记录时不同时，先记录新的样式。
+        """
+        from copy import deepcopy
+        from .edl import style_to_dict
+
+        if self.__events == None:
+            return
+        style = self.style()
+        if style != self.__edl_style:
+            self.__events.append({"style": style_to_dict(style)})
+            self.__edl_style = style
+        self.__events.append({name: deepcopy(value)})
+
+    def to_edl(self, path: str | None = None) -> dict:
+        """
+        把制作集锦的全部操作（使用的视频、截取的片段、字幕、特效、比分、背景音乐、样式）以及最近一次导出的设置
+        导出成 EDL（剪辑决策表），返回值是 dict。用 zxx.Highlight.from_edl() 可以由 EDL 重新制作出同样的集锦。
+        有初始内容（contents）的集锦无法导出 EDL。
+
+        参数说明：
+            path：EDL 文件路径，后缀名为 .json 或 .toml。如果未指定，则不保存文件。
+        """
+        from copy import deepcopy
+        from .edl import EDL_VERSION, save_edl
+
+        if self.__events == None:
+            raise Exception("导出 EDL 失败：集锦有初始内容，无法用 EDL 描述")
+        edl = {"version": EDL_VERSION, "events": deepcopy(self.__events)}
+        if self.__export != None:
+            edl["export"] = dict(self.__export)
+        if path != None:
+            save_edl(edl, path)
+        return edl
+
+    @staticmethod
+    def from_edl(edl: "dict | str", optimize: bool = True) -> "Highlight":
+        """
+        由 EDL（剪辑决策表）制作集锦，返回值是新的 zxx.Highlight 实例。EDL 的格式参见 zxx.edl。
+
+        参数说明：
+            edl：EDL，可以是 dict，也可以是 .json 或 .toml 文件的路径。
+            optimize：是否先把 EDL 编译成优化后的渲染计划（zxx.RenderPlan）再制作，默认为 True。
+                优化时，同一视频中首尾相接、处理方式相同的片段会合并成一个片段，集锦的画面与不优化时相同。
+        """
+        from .edl import load_edl, compile_edl, replay_edl
+
+        if isinstance(edl, str):
+            edl = load_edl(edl)
+        if optimize:
+            return compile_edl(edl).highlight()
+        return replay_edl(edl)
+
+    def plan(self, strict: bool = True) -> "RenderPlan":
+        """
+        把集锦的操作记录（即 to_edl() 的返回值）编译成渲染计划，类型为 zxx.RenderPlan。只读取元数据，不解码画面。
+
+        参数说明：
+            strict：遇到错误时是否立即抛出异常，默认为 True。为 False 时记录所有错误，参见 zxx.RenderPlan.errors()。
+        """
+        from .edl import compile_edl
+
+        return compile_edl(self.to_edl(), strict)
+
+    def dry_run(self, mode: str | None = None) -> dict:
+        """
+        预演：只读取媒体文件的元数据（时长、画面尺寸、帧率、编码、有没有声音，多个文件并行读取并缓存），
+        检查每个片段的时间范围、特效和背景音乐，计算集锦时长，估计导出的开销（需要解码、编码的帧数，预计文件大小），
+        并打印报告。不解码任何画面。返回值是预演报告，参见 zxx.RenderPlan.report()。
+        可以在任何时候调用；创建集锦时指定 dry_run=True，则整个制作过程都只是预演。
+
+        参数说明：
+            mode：导出模式。如果未指定，则使用最近一次 export() 的导出模式，仍未指定时为 "hd"。
+        """
+        return self.plan(strict=False).print_report(mode)
@@ -0,0 +1,228 @@
+"""
+zxx.KeyframeIndex
+关键帧索引
+    记录视频文件中每个数据包（一帧画面）的时刻、大小和是否为关键帧，并保存在磁盘上的索引缓存中。
+    读取器据此决定往前读还是重新定位，智能导出据此找出可以直接复制码流的范围。
+"""
+
+
+import numpy as np
+from functools import lru_cache
+
+
+INDEX_VERSION = 1
+
+
+class KeyframeIndex:
+    def __init__(self, path: str, folder: str | None = None) -> None:
+        """
+        zxx.KeyframeIndex 关键帧索引类。一般通过 keyframe_index() 或 zxx.File.index() 获取，不需要直接创建。
+
+        建立索引时，ffmpeg 只读取视频的数据包（-c copy），不解码任何画面，长达一两个小时的比赛录像也只需几秒到几十秒。
+        索引按（源文件路径、修改时间、大小）保存在索引缓存文件夹中，之后直接读取；源文件改动后会重新建立。
+
+        参数说明：
+            path：视频文件路径。
+            folder：索引缓存文件夹。如果未指定，则使用 zxx.options.GetKeyframeIndex("path")，
+                仍为 None 时使用用户目录下的 .cache/zxx/index 文件夹。
+        """
+        from os.path import abspath, expanduser, isfile, join
+        from .options import GetKeyframeIndex
+
+        self.__path = abspath(path)
+        if folder == None:
+            folder = GetKeyframeIndex("path")
+        if folder == None:
+            folder = join(expanduser("~"), ".cache", "zxx", "index")
+        self.__cache_path = join(folder, "%s.npz" % _digest(self.__path))
+        packets = _load(self.__cache_path) if isfile(self.__cache_path) else None
+        if packets == None:
+            packets = _scan(self.__path)
+            _save(self.__cache_path, packets)
+        self.__pts, self.__size, self.__key = packets
+        self.__keyframes = np.unique(self.__pts[self.__key])
+
+    def path(self) -> str:
+        """
+        返回视频文件的绝对路径。
+        """
+        return self.__path
+
+    def keyframes(self) -> list:
+        """
+        返回所有关键帧的时刻（秒，相对于视频开头，与 moviepy 的时刻一致）组成的列表，按时间顺序排列。
+        """
+        return self.__keyframes.tolist()
+
+    def packets(self) -> dict:
+        """
+        返回按时刻排序的数据包信息，值都是 numpy 数组：
+            pts：显示时刻（秒）；
+            size：数据包大小（字节）；
+            key：是否为关键帧。
+        """
+        order = np.argsort(self.__pts, kind="stable")
+        return {"pts": self.__pts[order], "size": self.__size[order], "key": self.__key[order]}
+
+    def before(self, t: float) -> float | None:
+        """
+        返回不晚于时刻 t 的最后一个关键帧的时刻，即从这里开始解码就能得到 t 的画面。没有时返回 None。
+        """
+        i = np.searchsorted(self.__keyframes, t + 1e-6, side="right") - 1
+        return float(self.__keyframes[i]) if i >= 0 else None
+
+    def after(self, t: float) -> float | None:
+        """
+        返回不早于时刻 t 的第一个关键帧的时刻。没有时返回 None。
+        """
+        i = np.searchsorted(self.__keyframes, t - 1e-6, side="left")
+        return float(self.__keyframes[i]) if i < len(self.__keyframes) else None
+
+    def nearest(self, t: float) -> float | None:
+        """
+        返回离时刻 t 最近的关键帧的时刻。没有关键帧时返回 None。
+        """
+        candidates = [kf for kf in (self.before(t), self.after(t)) if kf != None]
+        if len(candidates) == 0:
+            return None
+        return min(candidates, key=lambda kf: abs(kf - t))
+
+    def should_seek(self, current: float, target: float, margin: float = 0.5) -> bool:
+        """
+        读取器当前解码到 current，下一帧要读 target（晚于 current）时，判断重新定位是否比往前读更快：
+        只有 target 之前最近的关键帧比 current 晚 margin 秒以上时，从该关键帧开始解码才更省事。
+        两者之间没有关键帧时，重新定位仍要从 current 之前的关键帧解码，不如直接往前读。
+
+        参数说明：
+            current：读取器当前解码到的时刻（秒）。
+            target：下一帧的时刻（秒）。
+            margin：重新定位（启动新的 ffmpeg 进程）的开销，折合成解码的时长（秒），默认为 0.5。
+        """
+        kf = self.before(target)
+        return kf != None and kf > current + margin
+
+    def copy_range(self, begin: float, end: float, tolerance: float = 0) -> tuple | None:
+        """
+        返回片段 [begin, end] 中可以直接复制码流的范围 (第一个关键帧, 最后一个关键帧)，即其中完整的画面组（GOP）。
+        片段内没有完整的画面组时返回 None。
+
+        参数说明：
+            begin：片段开始时刻（秒）。
+            end：片段结束时刻（秒）。
+            tolerance：允许关键帧超出片段首尾的误差（秒），一般取半帧。
+        """
+        i = np.searchsorted(self.__keyframes, begin - tolerance, side="left")
+        j = np.searchsorted(self.__keyframes, end + tolerance, side="right") - 1
+        if i >= j:
+            return None
+        return float(self.__keyframes[i]), float(self.__keyframes[j])
+
+    def suggest_cut(self, begin: float, end: float) -> tuple | None:
+        """
+        建议的剪辑点：把片段首尾分别移到最近的关键帧，返回 (开始时刻, 结束时刻)。
+        按建议的剪辑点截取的片段如果未经处理，智能导出时整个片段都可以直接复制码流，首尾不需要重新编码。
+        首尾移到同一个关键帧（片段比画面组还短）时返回 None。
+
+        参数说明：
+            begin：片段开始时刻（秒）。
+            end：片段结束时刻（秒）。
+        """
+        a, b = self.nearest(begin), self.nearest(end)
+        if a == None or b == None or b <= a:
+            return None
+        return a, b
+
+
+def keyframe_index(path: str) -> KeyframeIndex:
+    """
+    返回视频文件的关键帧索引。结果按（路径、修改时间、文件大小）缓存在内存中，同时保存在磁盘上的索引缓存中。
+
+    参数说明：
+        path：视频文件路径。
+    """
+    from os import stat
+    from os.path import abspath
+    from .options import GetKeyframeIndex
+
+    path = abspath(path)
+    info = stat(path)
+    return _keyframe_index(path, info.st_mtime, info.st_size, GetKeyframeIndex("path"))
+
+
+@lru_cache(maxsize=256)
+def _keyframe_index(path: str, mtime: float, size: int, folder: str | None) -> KeyframeIndex:
+    """
+    keyframe_index() 的缓存实现。mtime 和 size 只用于在文件被修改后使缓存失效。
+    """
+    return KeyframeIndex(path, folder)
+
+
+def _digest(path: str) -> str:
+    """
+    索引缓存的文件名：由源文件路径、修改时间和大小计算，源文件改动后文件名随之改变。
+    """
+    from hashlib import sha1
+    from os import stat
+
+    info = stat(path)
+    return sha1(("%s|%s|%s" % (path, info.st_mtime, info.st_size)).encode("utf8")).hexdigest()[:16]
+
+
+def _scan(path: str) -> tuple:
+    """
+    用 ffmpeg 读取视频第一个画面流的所有数据包（不解码），返回 (显示时刻, 大小, 是否为关键帧) 三个 numpy 数组。
+    ffmpeg 输出的时间戳已经减去了文件的开始时刻，与 moviepy 的时刻一致。
+    """
+    import subprocess as sp
+    from moviepy.config import FFMPEG_BINARY
+
+    proc = sp.run([FFMPEG_BINARY, "-hide_banner", "-nostdin", "-v", "error", "-i", path,
+                   "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"], stdout=sp.PIPE, stderr=sp.PIPE)
+    if proc.returncode != 0:
+        raise Exception("建立关键帧索引失败：%s" % proc.stderr.decode("utf8", errors="ignore").strip()[-1000:])
+    timebase = None
+    pts, size, key = [], [], []
+    # 每行是：流序号, dts, pts, 时长, 大小, 校验和[, F=标志]，关键帧不输出标志
+    for line in proc.stdout.decode("utf8", errors="ignore").splitlines():
+        if line.startswith("#tb 0:"):
+            num, den = line.split(":")[1].strip().split("/")
+            timebase = int(num) / int(den)
+            continue
+        if line.startswith("#") or line.strip() == "":
+            continue
+        fields = [field.strip() for field in line.split(",")]
+        flags = fields[6] if len(fields) > 6 else "F=0x1"
+        pts.append(int(fields[2]))
+        size.append(int(fields[4]))
+        key.append(int(flags[2:], 16) & 1 == 1)
+    if timebase == None or len(pts) == 0:
+        raise Exception("建立关键帧索引失败：%s 中没有视频数据" % path)
+    return np.array(pts, dtype=np.float64) * timebase, np.array(size, dtype=np.int64), np.array(key, dtype=bool)
+
+
+def _load(cache_path: str) -> tuple | None:
+    """
+    读取索引缓存。文件损坏或版本不同时返回 None，之后会重新建立索引。
+    """
+    try:
+        with np.load(cache_path) as data:
+            if int(data["version"]) != INDEX_VERSION:
+                return None
+            return data["pts"], data["size"], data["key"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save(cache_path: str, packets: tuple) -> None:
+    """
+    保存索引缓存。先写入临时文件再改名，中途中断也不会留下不完整的文件。
+    """
+    from os import makedirs, replace
+    from os.path import dirname
+
+    makedirs(dirname(cache_path), exist_ok=True)
+    pts, size, key = packets
+    temp_path = cache_path + ".part"
+    with open(temp_path, "wb") as f:
+        np.savez_compressed(f, version=INDEX_VERSION, pts=pts, size=size, key=key)
+    replace(temp_path, cache_path)
@@ -0,0 +1,107 @@
+"""
+zxx.Overlay
+静态叠加层类
+    把字幕、比分牌等静态图片只混合到画面中它所覆盖的区域，代替整帧合成的 CompositeVideoClip。
+"""
+
+
+from moviepy import VideoClip
+
+
+class Overlay:
+    def __init__(self, image, frame_size: tuple, position = (0, 0), relative: bool = False) -> None:
+        """
+        zxx.Overlay 静态叠加层类。创建时一次性算好叠加区域（边界框）和预乘透明度，
+        之后每一帧只需对这一小块区域做一次向量化的整数混合。
+
+        参数说明：
+            image：叠加的图片，RGBA 格式的 numpy 数组（uint8）。也可以是 RGB 格式，此时视为完全不透明。
+            frame_size：视频画面尺寸 (宽, 高)。
+            position 和 relative：叠加位置，写法与 moviepy 的 VideoClip.with_position() 相同，但不能是函数。
+        """
+        import numpy as np
+        from moviepy.tools import compute_position
+
+        if callable(position):
+            raise Exception("静态叠加层的位置不能随时间变化！")
+        image = np.asarray(image)
+        if image.shape[2] == 3:
+            alpha = np.full(image.shape[:2] + (1,), 255, dtype=np.uint8)
+            image = np.concatenate([image, alpha], axis=2)
+        width, height = frame_size
+        x, y = compute_position(image.shape[1::-1], frame_size, position, relative)
+        x, y = int(x), int(y)
+
+        # 去掉完全透明的边缘，并裁剪掉画面以外的部分，得到真正需要混合的边界框
+        rows = np.flatnonzero(image[:, :, 3].any(axis=1))
+        cols = np.flatnonzero(image[:, :, 3].any(axis=0))
+        self.__box = None
+        if len(rows) == 0:
+            return
+        top, bottom = max(rows[0], -y), min(rows[-1] + 1, height - y)
+        left, right = max(cols[0], -x), min(cols[-1] + 1, width - x)
+        if top >= bottom or left >= right:
+            return
+        self.__box = (y + top, y + bottom, x + left, x + right)
+        image = image[top:bottom, left:right].astype(np.uint16)
+
+        # 预乘透明度：结果 = (原画面 × (255 - α) + 图片 × α + 127) // 255
+        alpha = image[:, :, 3:]
+        self.__premultiplied = image[:, :, :3] * alpha + 127
+        self.__inverse_alpha = 255 - alpha
+
+    def box(self) -> tuple | None:
+        """
+        返回叠加区域在画面中的边界框 (上, 下, 左, 右)。叠加层完全透明或在画面以外时返回 None。
+        """
+        return self.__box
+
+    def is_empty(self) -> bool:
+        """
+        叠加层是否完全不可见（完全透明或在画面以外）。
+        """
+        return self.__box == None
+
+    def apply(self, frame):
+        """
+        把叠加层直接混合进 frame 的对应区域（原地修改），并返回 frame。frame 必须是可写的 uint8 数组。
+        """
+        if self.__box == None:
+            return frame
+        y0, y1, x0, x1 = self.__box
+        region = frame[y0:y1, x0:x1, :3]
+        blended = region * self.__inverse_alpha
+        blended += self.__premultiplied
+        blended //= 255
+        region[...] = blended
+        return frame
+
+
+def add_overlays(clip: VideoClip, overlays: list) -> VideoClip:
+    """
+    给视频片段加上若干静态叠加层，返回新的 VideoClip。
+
+    解码得到的画面是只读的，因此每帧先复制一次，再把所有叠加层依次原地混合进各自的区域。
+    如果 clip 本身就是 add_overlays() 的结果，新的叠加层会并入同一次变换，而不会再嵌套一层。
+
+    参数说明：
+        clip：要处理的视频片段。类型是 moviepy 的 VideoClip 类。
+        overlays：zxx.Overlay 组成的列表，按从下到上的顺序叠加。
+    """
+    import numpy as np
+
+    base, previous = clip, []
+    info = getattr(clip, "_zxx_overlays", None)
+    if info != None and info[2] == id(clip):
+        base, previous = info[0], info[1]
+    overlays = previous + [overlay for overlay in overlays if not overlay.is_empty()]
+
+    def image_func(frame):
+        frame = np.array(frame, dtype=np.uint8)
+        for overlay in overlays:
+            overlay.apply(frame)
+        return frame
+
+    new_clip = base.image_transform(image_func) if overlays else base.copy()
+    new_clip._zxx_overlays = (base, overlays, id(new_clip))
+    return new_clip
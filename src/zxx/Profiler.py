@@ -0,0 +1,352 @@
+"""
+zxx.Profiler
+导出性能分析
+    记录导出时每个片段、每一级处理（解码、特效、字幕、比分牌、缩放、拼接、编码）的耗时和帧率，
+    以及内存峰值和读写的字节数，生成 JSON 报告和汇总表，也可以把各项指标发送给自定义的指标接收函数。
+"""
+
+
+# 各级处理的名称，按处理顺序排列
+STAGES = ("decode", "effects", "caption", "scoreboard", "resize", "composite", "encode", "audio")
+
+STAGE_NAMES = {
+    "decode": "解码",
+    "effects": "特效",
+    "caption": "字幕",
+    "scoreboard": "比分牌",
+    "resize": "缩放",
+    "composite": "拼接",
+    "encode": "编码",
+    "audio": "声音",
+}
+
+
+class Profiler:
+    def __init__(self, path: str | None = None, sinks: list | None = None) -> None:
+        """
+        zxx.Profiler 导出性能分析类。传给 zxx.Highlight.export(profile=...) 使用，也可以直接传 profile=True。
+
+        每一级处理的耗时都是“独占”的，即不包括它调用的内层处理：例如字幕一级只包括把字幕叠加到画面上的时间，
+        不包括解码画面的时间。不是由 take() 生成的片段（例如集锦的初始内容）无法区分各层，整体计入解码。
+        只有普通导出（不开启 smart、workers、cache、pipeline）时才记录各级的耗时，其他导出方式只记录总耗时、
+        内存和读写的字节数（流水线导出另外记录各级利用率）。
+
+        参数说明：
+            path：JSON 报告的保存路径。如果未指定，则保存为导出的视频文件名加上 .profile.json。
+            sinks：指标接收函数组成的列表，参见 add_sink()。
+        """
+        from threading import Lock, local
+
+        self.__path = path
+        self.__sinks = list(sinks or [])
+        self.__lock = Lock()
+        self.__local = local()    # 每个线程的调用栈和当前片段
+        self.__info = {}
+        self.__extra = {}
+        self.__segments = []
+        self.__stages = {}
+        self.__frames = 0
+        self.__start = None
+        self.__report = None
+
+    def add_sink(self, sink) -> "Profiler":
+        """
+        添加一个指标接收函数，导出结束时对每一项指标调用一次 sink(名称, 数值, 标签)，
+        例如 sink("stage.seconds", 3.2, {"stage": "decode"})，可以据此写入 StatsD、Prometheus 等监控系统。
+        指标包括：export.seconds、export.frames、export.fps、stage.seconds（标签 stage）、
+        segment.seconds 和 segment.fps（标签 segment、source）、memory.peak_rss、io.read_bytes、io.write_bytes。
+        返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
+        """
+        self.__sinks.append(sink)
+        return self
+
+    def path(self) -> str | None:
+        """
+        返回 JSON 报告的保存路径，未指定时返回 None。
+        """
+        return self.__path
+
+    def start(self, output_path: str | None = None, **info) -> None:
+        """
+        开始记录。由 zxx.Highlight.export() 调用。
+
+        参数说明：
+            output_path：导出的视频文件路径。
+            **info：记录在报告中的其他信息，例如导出模式。
+        """
+        from time import perf_counter
+
+        self.__info = dict(info, output=output_path)
+        self.__extra = {}
+        self.__segments = []
+        self.__stages = {}
+        self.__frames = 0
+        self.__report = None
+        self.__io = _io_counters()
+        self.__start = perf_counter()
+
+    def add_segment(self, take: "Take", start: float, duration: float) -> int:
+        """
+        登记时间线上的一个片段，返回片段序号，供 wrap() 使用。
+
+        参数说明：
+            take：片段描述，类型为 zxx.Take，可以是 None。
+            start：片段在集锦中的开始时刻（秒）。
+            duration：片段的时长（秒）。
+        """
+        self.__segments.append({
+            "source": take.path if take != None else None,
+            "begin": take.begin if take != None else None,
+            "end": take.end if take != None else None,
+            "start": start,
+            "duration": duration,
+            "frames": 0,
+            "stages": {},
+        })
+        return len(self.__segments) - 1
+
+    def wrap(self, clip: "VideoClip", stage: str, segment: int | None = None) -> "VideoClip":
+        """
+        返回读帧时记录耗时的新片段：读取每一帧画面的时间减去内层处理的时间，计入 stage 一级。
+        指定 segment 时，这一层是该片段的最外层，它读取的每一帧都计入该片段，内层处理的耗时也计入该片段。
+
+        参数说明：
+            clip：视频片段，类型是 moviepy 的 VideoClip 类。
+            stage：处理的名称，参见 STAGES。
+            segment：片段序号，即 add_segment() 的返回值。
+        """
+        return clip.transform(lambda get_frame, t: self.__call(get_frame, t, stage, segment))
+
+    def add(self, stage: str, seconds: float, segment: int | None = None, frames: int = 0) -> None:
+        """
+        直接记录一段耗时，例如编码一帧或编码声音的时间。
+
+        参数说明：
+            stage：处理的名称，参见 STAGES。
+            seconds：耗时（秒）。
+            segment：计入哪个片段，None 表示不计入任何片段。
+            frames：同时记录的帧数（计入导出的总帧数）。
+        """
+        with self.__lock:
+            self.__stages[stage] = self.__stages.get(stage, 0) + seconds
+            self.__frames += frames
+            if segment != None:
+                stages = self.__segments[segment]["stages"]
+                stages[stage] = stages.get(stage, 0) + seconds
+
+    def set_extra(self, name: str, value) -> None:
+        """
+        在报告中记录其他信息，例如流水线导出的各级利用率。
+        """
+        self.__extra[name] = value
+
+    def finish(self, frames: int | None = None) -> dict:
+        """
+        结束记录，生成报告并发送给各个指标接收函数，返回报告。由 zxx.Highlight.export() 调用。
+
+        参数说明：
+            frames：导出的帧数。如果未指定，则使用 add() 记录的帧数（分段导出等没有逐帧记录时需要指定）。
+        """
+        from os.path import getsize, isfile
+        from time import perf_counter
+
+        seconds = perf_counter() - self.__start
+        if frames != None:
+            self.__frames = frames
+        output = self.__info.get("output")
+        io = _io_counters()
+        segments = []
+        for i, segment in enumerate(self.__segments):
+            busy = sum(segment["stages"].values())
+            segments.append(dict(
+                segment, index=i, seconds=busy,
+                fps=segment["frames"] / busy if busy > 0 else None,
+                stages={stage: segment["stages"][stage] for stage in _ordered(segment["stages"])},
+            ))
+        self.__report = {
+            "version": 1,
+            "info": self.__info,
+            "seconds": seconds,
+            "frames": self.__frames,
+            "fps": self.__frames / seconds if seconds > 0 else None,
+            "stages": {stage: self.__stages[stage] for stage in _ordered(self.__stages)},
+            "segments": segments,
+            "memory": {"peak_rss": _peak_rss()},
+            "io": {
+                "read_bytes": io[0] - self.__io[0] if io != None and self.__io != None else None,
+                "write_bytes": io[1] - self.__io[1] if io != None and self.__io != None else None,
+                "output_bytes": getsize(output) if output != None and isfile(output) else None,
+            },
+            "extra": self.__extra,
+        }
+        self.__emit(self.__report)
+        return self.__report
+
+    def report(self) -> dict | None:
+        """
+        返回最近一次导出的报告，尚未结束时返回 None。报告的各项：
+            info：导出信息（导出的文件、导出模式、导出方式）；
+            seconds / frames / fps：总耗时（秒）/ 导出的帧数 / 平均每秒导出的帧数；
+            stages：各级处理的耗时（秒）；
+            segments：各个片段的源文件、时间范围、帧数、耗时、帧率和各级处理的耗时；
+            memory：peak_rss，进程（包括已结束的 ffmpeg 子进程中最大的一个）运行以来的内存峰值（字节）；
+            io：read_bytes / write_bytes，导出期间本进程读写的字节数（包括从解码器读取、向编码器写入的画面），
+                output_bytes，导出的视频文件大小。无法获取的项为 None；
+            extra：其他信息。
+        """
+        return self.__report
+
+    def save(self, path: str | None = None) -> str:
+        """
+        把报告保存成 JSON 文件，返回文件路径。
+
+        参数说明：
+            path：文件路径。如果未指定，则使用创建时指定的路径，仍为 None 时保存为导出的视频文件名加上 .profile.json。
+        """
+        import json
+
+        if self.__report == None:
+            raise Exception("还没有性能分析报告，请先导出视频！")
+        if path == None:
+            path = self.__path or self.__info.get("output") + ".profile.json"
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(self.__report, f, ensure_ascii=False, indent=2)
+        return path
+
+    def print_summary(self) -> None:
+        """
+        打印汇总表：各级处理的耗时和占比，以及耗时最多的几个片段。
+        """
+        report = self.__report
+        if report == None:
+            raise Exception("还没有性能分析报告，请先导出视频！")
+        print("性能分析：共 %d 帧，用时 %.1f 秒（%.1f 帧/秒），内存峰值 %s，读取 %s，写入 %s" % (
+            report["frames"], report["seconds"], report["fps"] or 0, _format_bytes(report["memory"]["peak_rss"]),
+            _format_bytes(report["io"]["read_bytes"]), _format_bytes(report["io"]["write_bytes"])))
+        if len(report["stages"]) > 0:
+            print("  %-8s %10s %8s" % ("处理", "耗时(秒)", "占比"))
+            for stage, seconds in report["stages"].items():
+                print("  %-8s %10.2f %7.1f%%" % (STAGE_NAMES.get(stage, stage), seconds,
+                                                  100 * seconds / max(report["seconds"], 1e-9)))
+        segments = sorted(report["segments"], key=lambda segment: segment["seconds"], reverse=True)[:5]
+        segments = [segment for segment in segments if segment["seconds"] > 0]
+        if len(segments) > 0:
+            print("  耗时最多的片段：")
+            for segment in segments:
+                slowest = max(segment["stages"], key=segment["stages"].get)
+                print("  %3d. %s [%s, %s]  %.2f 秒，%.1f 帧/秒，主要耗时：%s" % (
+                    segment["index"] + 1, segment["source"], segment["begin"], segment["end"],
+                    segment["seconds"], segment["fps"] or 0, STAGE_NAMES.get(slowest, slowest)))
+
+    def __call(self, get_frame, t: float, stage: str, segment: int | None):
+        """
+        读取一帧画面并记录耗时。每个线程维护一个调用栈，内层处理的耗时从外层扣除。
+        """
+        from time import perf_counter
+
+        local = self.__local
+        if not hasattr(local, "stack"):
+            local.stack = []
+            local.segment = None
+        if segment != None:
+            outer, local.segment = local.segment, segment
+        local.stack.append(0.0)
+        tic = perf_counter()
+        try:
+            return get_frame(t)
+        finally:
+            elapsed = perf_counter() - tic
+            inner = local.stack.pop()
+            if len(local.stack) > 0:
+                local.stack[-1] += elapsed
+            self.add(stage, elapsed - inner, local.segment)
+            if segment != None:
+                with self.__lock:
+                    self.__segments[segment]["frames"] += 1
+                local.segment = outer
+
+    def __emit(self, report: dict) -> None:
+        """
+        把报告中的各项指标发送给指标接收函数。
+        """
+        if len(self.__sinks) == 0:
+            return
+        metrics = [
+            ("export.seconds", report["seconds"], {}),
+            ("export.frames", report["frames"], {}),
+            ("export.fps", report["fps"], {}),
+            ("memory.peak_rss", report["memory"]["peak_rss"], {}),
+            ("io.read_bytes", report["io"]["read_bytes"], {}),
+            ("io.write_bytes", report["io"]["write_bytes"], {}),
+        ]
+        for stage, seconds in report["stages"].items():
+            metrics.append(("stage.seconds", seconds, {"stage": stage}))
+        for segment in report["segments"]:
+            tags = {"segment": segment["index"], "source": segment["source"]}
+            metrics.append(("segment.seconds", segment["seconds"], tags))
+            metrics.append(("segment.fps", segment["fps"], tags))
+        common = {"mode": self.__info["mode"]} if "mode" in self.__info else {}
+        for name, value, tags in metrics:
+            if value != None:
+                for sink in self.__sinks:
+                    sink(name, value, dict(common, **tags))
+
+
+def _ordered(stages: dict) -> list:
+    """
+    按处理顺序排列各级处理的名称，不在 STAGES 中的排在最后。
+    """
+    return sorted(stages, key=lambda stage: STAGES.index(stage) if stage in STAGES else len(STAGES))
+
+
+def _peak_rss() -> int | None:
+    """
+    返回本进程和已结束的子进程中内存峰值较大者（字节）。Windows 上需要安装 psutil，否则返回 None。
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset
+    from sys import platform
+
+    unit = 1 if platform == "darwin" else 1024    # macOS 上以字节为单位，Linux 上以 KB 为单位
+    return unit * max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def _io_counters() -> tuple | None:
+    """
+    返回本进程累计读写的字节数 (读取, 写入)，包括管道。Linux 上读取 /proc/self/io，其他系统需要安装 psutil，否则返回 None。
+    """
+    try:
+        with open("/proc/self/io", "r") as f:
+            counters = dict(line.split(":") for line in f.read().splitlines() if ":" in line)
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        counters = psutil.Process().io_counters()
+    except (AttributeError, psutil.Error):    # macOS 上没有 io_counters()
+        return None
+    return getattr(counters, "read_chars", counters.read_bytes), getattr(counters, "write_chars", counters.write_bytes)
+
+
+def _format_bytes(n: int | None) -> str:
+    """
+    把字节数写成便于阅读的形式，例如 "1.5 GB"。
+    """
+    if n == None:
+        return "未知"
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return "%.1f %s" % (n, unit)
+        n /= 1024
+    return "%.1f TB" % n
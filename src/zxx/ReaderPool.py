@@ -0,0 +1,334 @@
+"""
+zxx.ReaderPool
+读取器池
+    在多个 zxx.File 实例之间共享 moviepy 的 VideoFileClip，并限制同时运行的 ffmpeg 读取进程数量。
+"""
+
+
+from moviepy import VideoFileClip
+
+
+class ReaderPool:
+    def __init__(self, max_open: int = 8) -> None:
+        """
+        zxx.ReaderPool 读取器池，按“绝对路径 + 解码参数”共享 VideoFileClip。
+
+        同一个线程中，同一个源文件（且解码参数相同）无论被 use() 多少次，都只打开一个 VideoFileClip。
+        不同线程各自打开自己的读取器，因此可以在多个线程中同时制作集锦；每个读取器读帧时加锁，不会在读取途中被关闭。
+        同时保持打开的读取器（每个读取器包括画面和声音两个 ffmpeg 进程）不超过 max_open 个，
+        超出时关闭最久未使用的读取器的进程。被关闭的读取器在下次读取时会自动在原位置重新打开，
+        因此已经截取的片段仍然可以正常使用。
+
+        参数说明：
+            max_open：同时保持打开的读取器数量上限，默认为 8。
+        """
+        from collections import OrderedDict
+        from threading import RLock
+
+        if max_open < 1:
+            raise Exception("读取器池的容量至少为 1！")
+        self.__max_open = max_open
+        self.__clips = {}               # 键 -> VideoFileClip
+        self.__open = OrderedDict()     # 当前打开的读取器的键，按最近使用的顺序排列
+        self.__locks = {}               # 键 -> 读帧时持有的锁（画面和声音读取器共用）
+        self.__lock = RLock()
+        self.__stats = {"hits": 0, "misses": 0, "opened": 0, "closed": 0, "reopened": 0}
+
+    def open(self, path: str, **params) -> VideoFileClip:
+        """
+        借用一个 VideoFileClip。同一路径、同一组解码参数只会真正打开一次。
+
+        参数说明：
+            path：视频文件路径。
+            **params：传给 moviepy 的 VideoFileClip 的解码参数，例如 target_resolution、pixel_format。
+        """
+        from threading import RLock
+
+        key = self.key(path, **params)
+        with self.__lock:
+            if key in self.__clips:
+                self.__stats["hits"] += 1
+                return self.__clips[key]
+            self.__stats["misses"] += 1
+            clip = VideoFileClip(path, **params)
+            lock = RLock()
+            clip.reader = _PooledReader(self, key, clip.reader, lock, cache_frames=True)
+            if clip.audio is not None:
+                clip.audio.reader = _PooledReader(self, key, clip.audio.reader, lock)
+            self.__locks[key] = lock
+            self.__clips[key] = clip
+            self.__open[key] = True
+            self.__stats["opened"] += 1
+            self.__evict()
+            return clip
+
+    def key(self, path: str, **params) -> tuple:
+        """
+        返回当前线程中，路径和解码参数对应的键。
+        """
+        from os.path import abspath, normcase
+        from threading import get_ident
+
+        return (normcase(abspath(path)), tuple(sorted(params.items())), get_ident())
+
+    def touch(self, key: tuple) -> None:
+        """
+        读取器读帧前（已持有该读取器的锁时）调用，把该读取器标记为最近使用；如果它已被关闭，则重新打开。
+        """
+        with self.__lock:
+            if key in self.__open:
+                self.__open.move_to_end(key)
+                return
+            _resume(self.__clips[key])
+            self.__open[key] = True
+            self.__stats["opened"] += 1
+            self.__stats["reopened"] += 1
+            self.__evict(keep=key)
+
+    def discard(self, clip: VideoFileClip) -> None:
+        """
+        关闭借出的某个 VideoFileClip 的读取器，并把它移出读取器池。用于只在某个线程中临时使用的读取器，
+        例如流水线导出时各个解码线程打开的读取器。之后再借用同一文件会重新打开新的 VideoFileClip。
+
+        参数说明：
+            clip：由 open() 借出的 VideoFileClip。
+        """
+        with self.__lock:
+            keys = [key for key, pooled in self.__clips.items() if pooled is clip]
+            if len(keys) == 0:
+                return
+            key = keys[0]
+            with self.__locks[key]:
+                if key in self.__open:
+                    clip.reader.close()
+                    if clip.audio is not None:
+                        clip.audio.reader.close()
+                    del self.__open[key]
+                    self.__stats["closed"] += 1
+            del self.__clips[key]
+            del self.__locks[key]
+
+    def set_max_open(self, max_open: int) -> None:
+        """
+        修改同时保持打开的读取器数量上限。
+        """
+        if max_open < 1:
+            raise Exception("读取器池的容量至少为 1！")
+        with self.__lock:
+            self.__max_open = max_open
+            self.__evict()
+
+    def close(self) -> None:
+        """
+        关闭池中所有读取器的进程（正在读帧的读取器除外）。已借出的 VideoFileClip 仍可使用，读取时会自动重新打开。
+        """
+        with self.__lock:
+            for key in list(self.__open):
+                self.__suspend(key)
+
+    def clear(self) -> None:
+        """
+        关闭所有读取器并清空读取器池。之后再借用同一文件会重新打开新的 VideoFileClip。
+        """
+        with self.__lock:
+            self.close()
+            self.__clips = {key: clip for key, clip in self.__clips.items() if key in self.__open}
+            self.__locks = {key: lock for key, lock in self.__locks.items() if key in self.__open}
+
+    def stats(self) -> dict:
+        """
+        返回读取器池的统计信息：
+            open：当前打开的读取器数量；
+            pooled：池中共享的 VideoFileClip 数量；
+            max_open：同时打开的读取器数量上限；
+            hits / misses：借用时命中 / 未命中的次数；
+            opened / closed：读取器被打开 / 关闭的累计次数；
+            reopened：被关闭的读取器重新打开的次数。
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["open"] = len(self.__open)
+            stats["pooled"] = len(self.__clips)
+            stats["max_open"] = self.__max_open
+        return stats
+
+    def __evict(self, keep: tuple | None = None) -> None:
+        """
+        关闭最久未使用的读取器，直到打开的数量不超过上限。正在读帧的读取器和 keep 对应的读取器会被跳过。
+        """
+        for key in list(self.__open):
+            if len(self.__open) <= self.__max_open:
+                break
+            if key != keep:
+                self.__suspend(key)
+
+    def __suspend(self, key: tuple) -> bool:
+        """
+        关闭某个读取器的 ffmpeg 进程，但保留读取位置，以便之后重新打开。如果它正在其他线程中读帧，则不关闭，返回 False。
+        """
+        # 读帧时先持有读取器的锁、再持有池的锁，这里反过来，因此只能尝试加锁，避免死锁
+        lock = self.__locks[key]
+        if not lock.acquire(blocking=False):
+            return False
+        try:
+            clip = self.__clips[key]
+            clip.reader.close(delete_lastread=False)
+            if clip.audio is not None:
+                clip.audio.reader.close()
+        finally:
+            lock.release()
+        del self.__open[key]
+        self.__stats["closed"] += 1
+        return True
+
+
+class _PooledReader:
+    """
+    包装 moviepy 的 FFMPEG_VideoReader / FFMPEG_AudioReader，每次读帧时持有读取器的锁，并先向读取器池登记。
+    视频读取器（cache_frames=True）先在全局帧缓存（zxx.FrameCache）中查找画面，命中时不必解码，也不会移动读取位置；
+    未命中时根据源文件的关键帧索引（zxx.KeyframeIndex）决定往前读还是重新定位，参见 _read()。
+    其他属性直接转发给被包装的读取器。
+    """
+    def __init__(self, pool: ReaderPool, key: tuple, reader, lock, cache_frames: bool = False) -> None:
+        self._pool = pool
+        self._key = key
+        self._reader = reader
+        self._lock = lock
+        self._cache_frames = cache_frames
+        self._index = None    # 关键帧索引，第一次跳转时才建立；建立失败时为 False
+
+    def get_frame(self, t):
+        from .FrameCache import shared_frame_cache
+
+        cache_frames = self._cache_frames
+        cache = shared_frame_cache() if cache_frames else None
+        if cache != None:
+            source = self._key[:2]    # 各线程的读取器共用缓存的画面
+            index = self._reader.get_frame_number(t)
+            frame = cache.get(source, index)
+            if frame is not None:
+                return frame
+        with self._lock:
+            self._pool.touch(self._key)
+            if cache_frames:
+                frame = _read(self._reader, t, self._keyframe_index)
+            else:
+                frame = self._reader.get_frame(t)
+        if cache != None:
+            cache.put(source, index, t, frame)
+        return frame
+
+    def _keyframe_index(self):
+        """
+        返回源文件的关键帧索引。关闭了按索引定位（zxx.options.SetKeyframeIndex(seek=False)）或无法建立索引时返回 None。
+        """
+        from .KeyframeIndex import keyframe_index
+        from .options import GetKeyframeIndex
+
+        if not GetKeyframeIndex("seek"):
+            return None
+        if self._index == None:
+            try:
+                self._index = keyframe_index(self._reader.filename)
+            except Exception:    # 例如无法识别的容器格式，退回 moviepy 的默认行为
+                self._index = False
+        return self._index if self._index is not False else None
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._reader, name)
+
+
+def _read(reader, t: float, keyframe_index) -> "np.ndarray":
+    """
+    用视频读取器读取时刻 t 的画面。moviepy 往前跳转不超过 100 帧时逐帧往前读（每一帧都要转换成 RGB 并通过管道传输），
+    超过 100 帧或往回跳转时重新定位，且总是从 t 之前 1 秒处开始解码。这里再根据关键帧索引判断：
+    往前跳转不超过 100 帧、但 t 之前最近的关键帧在当前读取位置之后时，也重新定位，由 ffmpeg 直接从该关键帧开始解码，
+    中间的画面只解码、不转换也不传输。重新定位时 -ss 全部放在输入文件之前，参见 _seek()。
+    得到的画面与 moviepy 读取的完全相同。
+
+    参数说明：
+        reader：moviepy 的 FFMPEG_VideoReader。
+        t：时刻（秒）。
+        keyframe_index：返回关键帧索引（或 None）的函数，只在需要跳转时调用。
+    """
+    pos = reader.get_frame_number(t) + 1
+    if not reader.proc or pos == reader.pos or pos == reader.pos + 1:
+        return reader.get_frame(t)
+    index = keyframe_index()
+    if index == None:
+        return reader.get_frame(t)
+    if pos < reader.pos or pos > reader.pos + 100 or index.should_seek((reader.pos - 1) / reader.fps, t):
+        _seek(reader, t)
+        return reader.last_read
+    reader.skip_frames(pos - reader.pos - 1)
+    return reader.read_frame()
+
+
+def _seek(reader, t: float) -> None:
+    """
+    在时刻 t 重新打开视频读取器的 ffmpeg 进程。与 moviepy 的 initialize() 相同，只是把 -ss 全部放在输入文件之前：
+    ffmpeg 直接定位到 t 之前最近的关键帧，再精确解码到 t，而不是从 t 之前 1 秒处的关键帧开始。
+    """
+    import subprocess as sp
+    from moviepy.config import FFMPEG_BINARY
+    from moviepy.tools import cross_platform_popen_params, ffmpeg_escape_filename
+
+    reader.close(delete_lastread=False)
+    reader.pos = reader.get_frame_number(t)
+    # 与 moviepy 一样减去一个很小的量，使定位到的正好是第 pos 帧
+    i_arg = ["-i", ffmpeg_escape_filename(reader.filename)]
+    if reader.pos != 0:
+        i_arg = ["-ss", "%.06f" % (reader.pos / reader.fps - 0.00001)] + i_arg
+    if reader.depth == 4:
+        codec_name = reader.infos.get("video_codec_name")
+        if codec_name == "vp9":
+            i_arg = ["-c:v", "libvpx-vp9"] + i_arg
+        elif codec_name == "vp8":
+            i_arg = ["-c:v", "libvpx"] + i_arg
+    cmd = [FFMPEG_BINARY] + i_arg + [
+        "-loglevel", "error", "-f", "image2pipe", "-vf", "scale=%d:%d" % tuple(reader.size),
+        "-sws_flags", reader.resize_algo, "-pix_fmt", reader.pixel_format, "-vcodec", "rawvideo", "-",
+    ]
+    reader.proc = sp.Popen(cmd, **cross_platform_popen_params(
+        {"bufsize": reader.bufsize, "stdout": sp.PIPE, "stderr": sp.PIPE, "stdin": sp.DEVNULL}))
+    reader.last_read = reader.read_frame()
+
+
+def _resume(clip: VideoFileClip) -> None:
+    """
+    在关闭前的读取位置重新打开 VideoFileClip 的 ffmpeg 进程。
+    """
+    video = clip.reader._reader
+    # 视频读取器的 pos 是下一帧的序号，last_read 是上一帧；从上一帧重新打开即可恢复原状
+    _seek(video, max(video.pos - 1, 0) / video.fps)
+    if clip.audio is not None:
+        audio = clip.audio.reader._reader
+        audio.initialize(audio.pos / audio.fps)
+
+
+_SHARED_POOL = ReaderPool()
+
+
+def shared_pool() -> ReaderPool:
+    """
+    返回 zxx 默认使用的全局读取器池。zxx.File 都从这个池中借用读取器。
+    """
+    return _SHARED_POOL
+
+
+def reset_shared_pool() -> ReaderPool:
+    """
+    丢弃当前的全局读取器池，换成一个新的空池，并返回新池。旧池中的 ffmpeg 进程不会被关闭。
+    用于通过 fork 创建的子进程：子进程继承了父进程的读取器，但这些进程属于父进程，子进程既不能读取也不能关闭它们。
+    全局帧缓存（zxx.FrameCache）同样会被丢弃，以免子进程写入与父进程共享的内存映射文件。
+    """
+    from .FrameCache import reset_frame_cache
+
+    global _SHARED_POOL
+
+    reset_frame_cache()
+
+    _SHARED_POOL = ReaderPool(_SHARED_POOL.stats()["max_open"])
+    return _SHARED_POOL
@@ -0,0 +1,160 @@
+"""
+zxx.RenderCache
+分段缓存类
+    把导出时编码好的分段保存在磁盘上，再次导出时只重新编码有改动的分段。
+"""
+
+
+class RenderCache:
+    def __init__(self, path: str | None = None, max_size: int | None = None) -> None:
+        """
+        zxx.RenderCache 分段缓存类。每个分段以“缓存键 + 后缀名”为文件名保存在缓存文件夹中，
+        缓存键是分段内容（源文件、时间范围、特效、字幕、比分牌及其样式、导出模式等）的哈希值，
+        内容有任何改动都会得到不同的键，因此缓存永远不会过期，只会因为超出大小上限而被删除。
+        文件的修改时间记录最近一次使用的时间，超出上限时按最久未使用的顺序删除（LRU）。
+
+        参数说明：
+            path：缓存文件夹的绝对路径。如果未指定，则使用 zxx.options.GetRenderCache("path")，
+                仍为 None 时使用用户目录下的 .cache/zxx 文件夹。
+            max_size：缓存总大小上限（字节）。如果未指定，则使用 zxx.options.GetRenderCache("max_size")。
+        """
+        from os import makedirs
+        from os.path import expanduser, join
+        from .options import GetRenderCache
+
+        if path == None:
+            path = GetRenderCache("path")
+        if path == None:
+            path = join(expanduser("~"), ".cache", "zxx")
+        if max_size == None:
+            max_size = GetRenderCache("max_size")
+        makedirs(path, exist_ok=True)
+        self.__path = path
+        self.__max_size = max_size
+        self.__stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    def path(self) -> str:
+        """
+        返回缓存文件夹的路径。
+        """
+        return self.__path
+
+    def key(self, *items) -> str:
+        """
+        根据任意多个描述分段内容的对象计算缓存键（SHA-256 的十六进制字符串）。
+        对象会被序列化成 JSON，无法序列化的部分（例如 lambda 函数）使用其 repr()，此时通常每次运行都得到不同的键。
+        """
+        import json
+        from hashlib import sha256
+
+        text = json.dumps(items, sort_keys=True, ensure_ascii=False, default=repr)
+        return sha256(text.encode("utf8")).hexdigest()
+
+    def get(self, key: str, ext: str) -> str | None:
+        """
+        查找缓存的分段。命中时更新其使用时间并返回文件路径，未命中时返回 None。
+
+        参数说明：
+            key：缓存键，即 key() 的返回值。
+            ext：分段文件的后缀名，例如 ".mp4"。
+        """
+        from os import utime
+        from os.path import isfile, join
+
+        path = join(self.__path, key + ext)
+        if not isfile(path):
+            self.__stats["misses"] += 1
+            return None
+        utime(path)
+        self.__stats["hits"] += 1
+        return path
+
+    def put(self, key: str, file_path: str) -> str:
+        """
+        把编码好的分段文件移入缓存，返回它在缓存中的路径。这里不做淘汰，以免删除本次导出还要用到的分段，请在导出结束后调用 evict()。
+
+        参数说明：
+            key：缓存键，即 key() 的返回值。
+            file_path：分段文件路径，文件会被移动（而不是复制）到缓存文件夹中。
+        """
+        from os import replace, utime
+        from os.path import join, splitext
+        from shutil import move
+
+        path = join(self.__path, key + splitext(file_path)[1])
+        temp_path = path + ".part"
+        move(file_path, temp_path)    # 先移到临时文件名，再原子地改名，避免留下不完整的缓存文件
+        replace(temp_path, path)
+        utime(path)
+        self.__stats["stored"] += 1
+        return path
+
+    def entries(self) -> list:
+        """
+        返回缓存中所有分段组成的列表，每一项是 (文件路径, 大小, 最近使用时间)，按最近使用时间从早到晚排列。
+        """
+        from os import scandir
+
+        entries = []
+        for entry in scandir(self.__path):
+            if entry.is_file() and not entry.name.endswith(".part"):
+                info = entry.stat()
+                entries.append((entry.path, info.st_size, info.st_mtime))
+        return sorted(entries, key=lambda item: item[2])
+
+    def size(self) -> int:
+        """
+        返回缓存的总大小（字节）。
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_size: int | None = None) -> int:
+        """
+        按最久未使用的顺序删除分段，直到缓存总大小不超过上限。返回删除的分段数量。
+
+        参数说明：
+            max_size：缓存总大小上限（字节）。如果未指定，则使用创建缓存时的上限。
+        """
+        from os import remove
+
+        if max_size == None:
+            max_size = self.__max_size
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= max_size:
+                break
+            try:
+                remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self.__stats["evicted"] += removed
+        return removed
+
+    def purge(self) -> int:
+        """
+        清空缓存，返回删除的分段数量。
+        """
+        return self.evict(0)
+
+    def info(self) -> dict:
+        """
+        返回缓存的统计信息：
+            path：缓存文件夹；
+            entries：分段数量；
+            size / max_size：总大小 / 大小上限（字节）；
+            hits / misses：本实例查找时命中 / 未命中的次数；
+            stored / evicted：本实例存入 / 删除的分段数量。
+        """
+        entries = self.entries()
+        info = {
+            "path": self.__path,
+            "entries": len(entries),
+            "size": sum(size for _, size, _ in entries),
+            "max_size": self.__max_size,
+        }
+        info.update(self.__stats)
+        return info
@@ -0,0 +1,589 @@
+"""
+zxx.RenderPlan
+渲染计划类
+    由 EDL（剪辑决策表）编译得到的渲染计划：集锦由哪些片段组成、哪些片段可以合并、有多少种不同的字幕和比分牌、
+    哪些片段可以直接复制码流。编译时只读取视频文件的元数据，不解码画面。
+"""
+
+
+class RenderPlan:
+    def __init__(self, edl: dict, strict: bool = True) -> None:
+        """
+        zxx.RenderPlan 渲染计划类。一般通过 zxx.edl.compile_edl() 创建。
+
+        编译时按顺序模拟 EDL 中的操作，得到每个片段的描述（zxx.Take），并做以下优化：
+            1. 合并相邻片段：同一视频中首尾相接、字幕、比分、样式和特效都相同的相邻片段合并成一个片段，
+                减少打开视频、生成字幕和拼接的次数。带淡入淡出或指定时长（duration）的片段不合并，因为合并会改变画面；
+                消音和背景音乐会改变此前所有片段的声音，因此不跨越这两种操作合并。
+            2. 统计叠加层：字幕和比分牌按（文字 / 比分、样式）去重，得到实际需要渲染的叠加层。
+            3. 标记可以直接复制码流的片段：未经任何处理、编码参数与导出设置一致的片段，
+                智能导出（export(smart=True)）时可以直接复制码流，参见 zxx.render.can_copy()。
+        用到的所有媒体文件先并行读取元数据（zxx.probe.probe_all()），之后的检查都使用缓存的元数据。
+
+        参数说明：
+            edl：EDL，类型为 dict，格式参见 zxx.edl。
+            strict：遇到错误（例如片段超出视频时长、找不到文件）时是否立即抛出异常，默认为 True。
+                为 False 时，出错的操作会被跳过，所有错误记录在 errors() 中，用于预演（参见 report()）。
+        """
+        from copy import deepcopy
+        from os.path import abspath, isfile, join
+        from .edl import EVENTS
+        from .options import GetExportMode, GetProxy, GetStyle
+        from .probe import display_size, probe, probe_all
+        from .Take import Take, parse_take_info
+
+        self.__edl = deepcopy(edl)
+        self.__errors = []
+        probe_all(_media_paths(edl))
+        style = GetStyle()
+        path = None
+        show_score, score = False, (0, 0)
+        proxy_mode = None    # 代理模式下代理文件的画面高度，None 表示不使用代理模式
+        units = []    # 每一项是 [片段描述, 代理模式, 合并的片段数] 或者音频操作（dict）
+        for i, event in enumerate(edl["events"]):
+            name, value = next(iter(event.items()))
+            try:
+                if name not in EVENTS:
+                    raise Exception("操作无法识别")
+                if name == "style":
+                    style = style.replace(**value)
+                elif name == "change_match_info":
+                    style = style.replace(match_info={key: item for key, item in value.items() if item != ""})
+                elif name == "use":
+                    folder = value.get("folder")
+                    path = abspath(join(style.path() if folder == None else folder, value["filename"]))
+                    if not isfile(path):
+                        raise Exception("找不到视频文件 %s" % path)
+                    if not probe(path).get("video_found"):
+                        raise Exception("文件 %s 中没有视频" % path)
+                elif name == "proxy":
+                    enable, height = value.get("enable", True), value.get("height")
+                    proxy_mode = (height if height != None else GetProxy("height")) if enable else None
+                elif name == "show_score":
+                    show_score = value
+                elif name == "set_score":
+                    score = tuple(value)
+                elif name == "take":
+                    if path == None:
+                        raise Exception("截取片段之前没有指定视频（use）")
+                    if not isfile(path):    # use 时已经报告过错误
+                        continue
+                    for j, info in enumerate(value if len(value) > 0 else [["", ""]]):
+                        try:
+                            begin, end, caption, effects = parse_take_info(info, _duration(path))
+                            _check_effects(effects)
+                            proxy_height = proxy_mode if proxy_mode != None and probe(path)["video_size"][1] > proxy_mode else None
+                            take = Take(path, begin, end, caption, effects, score if show_score else None, style, proxy_height)
+                            if take.score != None:
+                                _check_scoreboard(style)
+                        except Exception as error:
+                            if strict:
+                                raise
+                            self.__errors.append("第 %d 项操作（take）的第 %d 个片段 %r：%s" % (i + 1, j + 1, info, error))
+                            continue
+                        units.append([take, proxy_mode, 1])
+                elif name in ("silence", "add_bgm", "mix_bgm"):
+                    event = deepcopy(event)
+                    if name in ("add_bgm", "mix_bgm"):
+                        if event[name].get("folder") == None:
+                            event[name]["folder"] = style.path()    # 按当时的样式确定背景音乐所在的文件夹
+                        _check_bgm(event[name])
+                    units.append(event)
+            except Exception as error:
+                if strict:
+                    raise
+                self.__errors.append("第 %d 项操作（%s）：%s" % (i + 1, name, error))
+        self.__n_takes = len([unit for unit in units if isinstance(unit, list)])
+        self.__final = {"style": style, "path": path, "show_score": show_score, "score": score, "proxy": proxy_mode}
+
+        # 合并相邻片段
+        merged = []
+        for unit in units:
+            if isinstance(unit, list) and len(merged) > 0 and isinstance(merged[-1], list) and _mergeable(merged[-1], unit):
+                last = merged[-1][0]
+                merged[-1] = [Take(last.path, last.begin, unit[0].end, last.caption, last.effects, last.score,
+                                   last.style, last.proxy_height), unit[1], merged[-1][2] + 1]
+            else:
+                merged.append(unit)
+        self.__units = merged
+
+        # 画面尺寸和帧率
+        takes = self.takes()
+        self.__size = None if len(takes) == 0 else display_size(takes[0].path)
+        try:
+            fps = GetExportMode(self.export_settings().get("mode", "hd")).get("fps")
+        except Exception as error:
+            if strict:
+                raise
+            self.__errors.append("导出设置：%s" % error)
+            fps = None
+        if fps == None:
+            fps = max([probe(take.path).get("video_fps", 0) for take in takes], default=0)
+        self.__fps = fps
+
+    def errors(self) -> list:
+        """
+        返回编译时发现的错误组成的列表（只有 strict=False 时才可能不为空）。
+        """
+        return list(self.__errors)
+
+    def edl(self) -> dict:
+        """
+        返回编译时使用的 EDL（副本）。
+        """
+        from copy import deepcopy
+
+        return deepcopy(self.__edl)
+
+    def export_settings(self) -> dict:
+        """
+        返回 EDL 中的导出设置（zxx.Highlight.export() 的关键字参数），没有导出设置时返回空 dict。
+        """
+        return dict(self.__edl.get("export", {}))
+
+    def takes(self) -> list:
+        """
+        返回合并后的片段描述（zxx.Take）组成的列表，按时间顺序排列。
+        """
+        return [unit[0] for unit in self.__units if isinstance(unit, list)]
+
+    def size(self) -> tuple | None:
+        """
+        返回导出的画面尺寸 (宽, 高)，即第一个片段的源文件的画面尺寸。没有片段时返回 None。
+        """
+        return self.__size
+
+    def fps(self) -> float:
+        """
+        返回导出的帧率：导出模式指定了帧率时使用该帧率，否则使用各个源文件帧率的最大值。
+        """
+        return self.__fps
+
+    def segments(self) -> list:
+        """
+        返回合并后的各个片段，每一项是 dict：
+            take：片段描述，类型为 zxx.Take；
+            start：片段在集锦中的开始时刻（秒）；
+            duration：片段的时长（秒）；
+            takes：由 EDL 中的几个片段合并而成；
+            copy：智能导出时能否直接复制码流。
+        """
+        from .render import can_copy
+
+        segments = []
+        start = 0
+        for unit in self.__units:
+            if not isinstance(unit, list):
+                continue
+            take, _, n = unit
+            duration = _take_duration(take)
+            copy = self.__size != None and can_copy(take.original(), self.__size, self.__fps)
+            segments.append({"take": take, "start": start, "duration": duration, "takes": n, "copy": copy})
+            start += duration
+        return segments
+
+    def overlays(self) -> list:
+        """
+        返回去重后的叠加层组成的列表。每一项是 ("caption", 字幕文案, 字幕样式) 或 ("scoreboard", 比分, 比赛信息, 比分牌样式)，
+        内容相同的字幕或比分牌只算一次。空白字幕不计入。
+        """
+        overlays = []
+        for take in self.takes():
+            style = take.style
+            if take.caption != None and take.caption.strip() != "":
+                overlays.append(("caption", take.caption, style.caption_style()))
+            if take.score != None:
+                overlays.append(("scoreboard", take.score, style.match_info(), style.scoreboard_style()))
+        unique = []
+        for overlay in overlays:
+            if overlay not in unique:
+                unique.append(overlay)
+        return unique
+
+    def summary(self) -> dict:
+        """
+        返回渲染计划的统计信息：
+            takes：EDL 中的片段数；
+            segments：合并后的片段数；
+            overlays：字幕和比分牌的总数（按合并后的片段计）；
+            unique_overlays：去重后需要渲染的字幕和比分牌数；
+            copy_segments / copy_duration：智能导出时可以直接复制码流的片段数 / 总时长（秒）；
+            duration：集锦的时长（秒）；
+            size / fps：导出的画面尺寸和帧率；
+            sources：用到的视频文件数。
+        """
+        segments = self.segments()
+        n_overlays = 0
+        for take in self.takes():
+            n_overlays += (take.caption != None and take.caption.strip() != "") + (take.score != None)
+        return {
+            "takes": self.__n_takes,
+            "segments": len(segments),
+            "overlays": n_overlays,
+            "unique_overlays": len(self.overlays()),
+            "copy_segments": len([s for s in segments if s["copy"]]),
+            "copy_duration": sum(s["duration"] for s in segments if s["copy"]),
+            "duration": sum(s["duration"] for s in segments),
+            "size": self.__size,
+            "fps": self.__fps,
+            "sources": len(set(take.path for take in self.takes())),
+        }
+
+    def print_summary(self) -> "RenderPlan":
+        """
+        打印渲染计划的统计信息。
+        返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
+        """
+        from .tools import sec2str
+
+        info = self.summary()
+        print("渲染计划：%d 个片段合并为 %d 段，来自 %d 个视频，时长 %s" % (
+            info["takes"], info["segments"], info["sources"], sec2str(info["duration"])))
+        print("叠加层：共 %d 个，去重后 %d 个" % (info["overlays"], info["unique_overlays"]))
+        print("可直接复制码流：%d 段，共 %.1f 秒" % (info["copy_segments"], info["copy_duration"]))
+        return self
+
+    def report(self, mode: str | None = None, smart: bool | None = None) -> dict:
+        """
+        预演报告：只根据媒体文件的元数据检查集锦，并估计导出的开销，不解码任何画面。返回值是 dict：
+            errors：编译时发现的错误（strict=False 时）；
+            warnings：不会导致出错、但可能不是想要的结果的情况，例如视频需要缩放、帧率不同、没有声音、找不到字幕字体；
+            duration：集锦的时长（秒），与 zxx.Highlight.duration() 相同；
+            size / fps：导出的画面尺寸和帧率；
+            mode / proxy / smart：导出模式、是否使用代理文件、是否智能导出；
+            sources：用到的视频 {路径: {"size": 画面尺寸, "fps": 帧率, "codec": 视频编码, "duration": 时长, "audio": 是否有声音}}；
+            decode_frames / decode_pixels：需要解码的源视频帧数 / 像素数（代理模式下按代理文件的分辨率估计）；
+            encode_frames / encode_pixels：需要编码的帧数 / 像素数（不含直接复制码流的部分）；
+            copy_duration：智能导出时直接复制码流的时长（秒）。这里不读取关键帧位置，是上限估计；
+            estimated_size：按导出模式的视频码率估计的文件大小（字节），导出模式未指定码率时为 None。
+
+        参数说明：
+            mode：导出模式。如果未指定，则使用 EDL 中的导出设置，仍未指定时为 "hd"。
+            smart：是否智能导出。如果未指定，则使用 EDL 中的导出设置，仍未指定时为 False。
+        """
+        from os.path import isfile, join
+        from .options import GetExportMode
+        from .probe import display_size, probe
+        from .render import can_copy, output_codec
+
+        settings = self.export_settings()
+        mode = mode if mode != None else settings.get("mode", "hd")
+        smart = smart if smart != None else settings.get("smart", False)
+        proxy = settings.get("proxy")
+        if proxy == None:
+            proxy = mode == "preview"
+        errors = self.errors()
+        warnings = []
+        try:
+            params = GetExportMode(mode)
+        except Exception as error:
+            errors.append("导出设置：%s" % error)
+            params = {}
+        fps = params.get("fps") or self.__fps
+        codec = params.get("codec")
+        if codec == None and "filename" in settings:
+            try:
+                codec = output_codec(settings["filename"], params)
+            except Exception as error:
+                errors.append("导出设置：%s" % error)
+        smart = smart and codec == "libx264"
+
+        sources = {}
+        for take in self.takes():
+            if take.path in sources:
+                continue
+            infos = probe(take.path)
+            sources[take.path] = {
+                "size": display_size(take.path),
+                "fps": infos.get("video_fps"),
+                "codec": infos.get("video_codec_name"),
+                "duration": _duration(take.path),
+                "audio": bool(infos.get("audio_found")),
+            }
+            if self.__size != None and sources[take.path]["size"] != self.__size:
+                warnings.append("视频 %s 的画面尺寸 %dx%d 与集锦的 %dx%d 不同，解码时会缩放" % (
+                    (take.path,) + tuple(sources[take.path]["size"]) + tuple(self.__size)))
+            if sources[take.path]["fps"] != None and abs(sources[take.path]["fps"] - fps) >= 0.01:
+                warnings.append("视频 %s 的帧率 %s 与导出的帧率 %s 不同" % (take.path, sources[take.path]["fps"], fps))
+            if not sources[take.path]["audio"]:
+                warnings.append("视频 %s 中没有声音，相应片段将是静音" % take.path)
+        for overlay in self.overlays():
+            if overlay[0] == "caption":
+                font = overlay[2].get("font")
+                if not isinstance(font, str) or not isfile(font):
+                    warning = "找不到字幕字体 %s" % font
+                    if warning not in warnings:
+                        warnings.append(warning)
+
+        decode_frames = decode_pixels = encode_frames = encode_pixels = 0
+        copy_duration = 0
+        width, height = self.__size if self.__size != None else (0, 0)
+        takes = self.takes()
+        if proxy and len(takes) > 0 and takes[0].proxy_height != None:    # 直接导出代理文件的画面
+            width, height = int(width * takes[0].proxy_height / height) // 2 * 2, takes[0].proxy_height
+        for segment in self.segments():
+            take = segment["take"]
+            source = sources[take.path]
+            w, h = source["size"]
+            if proxy and take.proxy_height != None:    # 代理文件的画面高度固定，宽度按比例缩放
+                w, h = int(w * take.proxy_height / h) // 2 * 2, take.proxy_height
+            frames = (take.end - take.begin) * (source["fps"] or fps)
+            decode_frames += frames
+            decode_pixels += frames * w * h
+            if smart and can_copy(take.original(), self.__size, fps):
+                copy_duration += segment["duration"]
+                continue
+            encode_frames += segment["duration"] * fps
+            encode_pixels += segment["duration"] * fps * width * height
+        duration = sum(segment["duration"] for segment in self.segments())
+        bitrate = _bitrate(params.get("bitrate"))
+        return {
+            "errors": errors,
+            "warnings": warnings,
+            "duration": duration,
+            "size": (width, height) if self.__size != None else None,
+            "fps": fps,
+            "mode": mode,
+            "proxy": proxy,
+            "smart": smart,
+            "sources": sources,
+            "decode_frames": int(round(decode_frames)),
+            "decode_pixels": int(round(decode_pixels)),
+            "encode_frames": int(round(encode_frames)),
+            "encode_pixels": int(round(encode_pixels)),
+            "copy_duration": copy_duration,
+            "estimated_size": None if bitrate == None else int(bitrate * duration / 8),
+        }
+
+    def print_report(self, mode: str | None = None, smart: bool | None = None) -> dict:
+        """
+        打印预演报告，并返回 report() 的返回值。参数与 report() 相同。
+        """
+        from .tools import sec2str
+
+        info = self.report(mode, smart)
+        summary = self.summary()
+        print("渲染计划：%d 个片段合并为 %d 段，来自 %d 个视频" % (summary["takes"], summary["segments"], summary["sources"]))
+        print("叠加层：共 %d 个，去重后 %d 个" % (summary["overlays"], summary["unique_overlays"]))
+        print("预演：导出模式 %s，画面尺寸 %s，帧率 %s，时长 %s" % (
+            info["mode"], "x".join(str(x) for x in info["size"]) if info["size"] != None else "无",
+            info["fps"], sec2str(info["duration"])))
+        print("需要解码 %d 帧（%.1f 亿像素），编码 %d 帧（%.1f 亿像素），直接复制码流 %.1f 秒" % (
+            info["decode_frames"], info["decode_pixels"] / 1e8, info["encode_frames"], info["encode_pixels"] / 1e8,
+            info["copy_duration"]))
+        if info["estimated_size"] != None:
+            print("预计文件大小：%.1f MB" % (info["estimated_size"] / 1024 ** 2))
+        for warning in info["warnings"]:
+            print("警告：%s" % warning)
+        for error in info["errors"]:
+            print("错误：%s" % error)
+        if len(info["errors"]) == 0:
+            print("预演通过，没有发现错误")
+        else:
+            print("预演发现 %d 个错误" % len(info["errors"]))
+        return info
+
+    def events(self) -> list:
+        """
+        返回优化后的操作列表（EDL 的 events）。按顺序执行这些操作得到的集锦，与按原 EDL 制作的集锦画面相同。
+        """
+        from .edl import style_to_dict
+
+        events = []
+        state = {"style": None, "path": None, "show_score": False, "score": (0, 0), "proxy": None}
+
+        def move_to(style, path, show_score, score, proxy):
+            if style != state["style"]:
+                events.append({"style": style_to_dict(style)})
+            if proxy != state["proxy"]:    # 代理模式在 use() 时生效，切换后要重新 use()
+                events.append({"proxy": {"enable": proxy != None, "height": proxy}})
+                state["path"] = None
+            if path != state["path"] and path != None:
+                events.append({"use": {"filename": path, "folder": ""}})
+            if show_score != state["show_score"]:
+                events.append({"show_score": show_score})
+            if score != state["score"]:
+                events.append({"set_score": list(score)})
+            state.update(style=style, path=path, show_score=show_score, score=score, proxy=proxy)
+
+        for unit in self.__units:
+            if not isinstance(unit, list):
+                events.append(unit)
+                continue
+            take, proxy, _ = unit
+            show_score = take.score != None
+            move_to(take.style, take.path, show_score, take.score if show_score else state["score"], proxy)
+            info = [repr(take.begin), repr(take.end)]
+            if take.caption != None:
+                info.append(take.caption)
+            if len(take.effects) > 0:
+                info.append(dict(take.effects))
+            if len(events) > 0 and "take" in events[-1]:
+                events[-1]["take"].append(info)
+            else:
+                events.append({"take": [info]})
+        # 恢复 EDL 结束时的状态，之后在集锦上继续操作的结果也相同
+        final = self.__final
+        move_to(final["style"], final["path"], final["show_score"], final["score"], final["proxy"])
+        return events
+
+    def optimized_edl(self) -> dict:
+        """
+        返回优化后的 EDL，导出设置与原 EDL 相同。
+        """
+        from .edl import EDL_VERSION
+
+        edl = {"version": EDL_VERSION, "events": self.events()}
+        if "export" in self.__edl:
+            edl["export"] = self.export_settings()
+        return edl
+
+    def highlight(self) -> "Highlight":
+        """
+        按优化后的操作列表制作集锦，返回 zxx.Highlight 实例。
+        """
+        from .edl import replay_edl
+
+        return replay_edl(self.optimized_edl())
+
+    def export(self, **kwargs) -> "Highlight":
+        """
+        制作集锦并按 EDL 中的导出设置导出，返回制作好的集锦。
+        导出设置中没有指定 smart（也没有开启流水线导出 pipeline）时，只要有片段可以直接复制码流，就使用智能导出。
+
+        参数说明：
+            **kwargs：覆盖 EDL 中的导出设置，会传入 zxx.Highlight.export()，例如 mode="preview"。
+        """
+        settings = dict(self.export_settings(), **kwargs)
+        if "filename" not in settings:
+            raise Exception("导出失败：EDL 中没有指定导出的文件名（export.filename）")
+        if "smart" not in settings and not settings.get("pipeline"):
+            settings["smart"] = any(segment["copy"] for segment in self.segments())
+        return self.highlight().export(**settings)
+
+
+def _mergeable(a: list, b: list) -> bool:
+    """
+    判断两个相邻片段能否合并：同一视频、首尾相接，字幕、比分、样式、代理模式和特效都相同，
+    且特效中没有淡入淡出和指定时长（这些特效合并后画面会不同）。
+    """
+    x, y = a[0], b[0]
+    return (
+        x.path == y.path and abs(x.end - y.begin) < 1e-6
+        and x.caption == y.caption and x.score == y.score and x.style == y.style
+        and x.proxy_height == y.proxy_height and a[1] == b[1] and x.effects == y.effects
+        and not any(key in x.effects for key in ("fadein", "fadeout", "duration"))
+    )
+
+
+def _take_duration(take: "Take") -> float:
+    """
+    片段经过变速后的时长（秒）。
+    """
+    if take.effects.get("duration") != None:
+        return take.effects["duration"]
+    return (take.end - take.begin) / take.effects.get("speed", 1)
+
+
+def _duration(path: str) -> float:
+    """
+    视频的时长（秒），与 moviepy 的 VideoFileClip.duration 相同。
+    """
+    from .probe import probe
+
+    infos = probe(path)
+    return infos.get("video_duration") or infos["duration"]
+
+
+def _bitrate(bitrate: str | None) -> float | None:
+    """
+    把 ffmpeg 的码率写法（例如 "20000k"、"2M"）换算成每秒的比特数。
+    """
+    if bitrate == None:
+        return None
+    units = {"k": 1e3, "m": 1e6, "g": 1e9}
+    text = str(bitrate).strip().lower()
+    try:
+        if text[-1] in units:
+            return float(text[:-1]) * units[text[-1]]
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _media_paths(edl: dict) -> list:
+    """
+    EDL 中用到的所有视频和背景音乐文件的路径（按操作时的样式确定文件夹），用于预先并行读取元数据。
+    """
+    from os.path import abspath, join, isfile
+    from .options import GetStyle
+
+    style = GetStyle()
+    paths = []
+    for event in edl["events"]:
+        name, value = next(iter(event.items()))
+        try:
+            if name == "style":
+                style = style.replace(**value)
+            elif name in ("use", "add_bgm", "mix_bgm"):
+                folder = value.get("folder")
+                paths.append(abspath(join(style.path() if folder == None else folder, value["filename"])))
+        except Exception:    # 格式错误留到编译时报告
+            continue
+    return [path for path in paths if isfile(path)]
+
+
+def _check_effects(effects: dict | None) -> None:
+    """
+    检查特效字典，参数无效时抛出异常（与 zxx.tools.add_effects() 的要求相同）。
+    """
+    if effects == None:
+        return
+    unknown = set(effects) - {"speed", "duration", "silence", "lum", "contrast", "fadein", "fadeout", "stabilize"}
+    if len(unknown) > 0:
+        raise Exception("无法识别的特效：%s" % "、".join(sorted(unknown)))
+    if effects.get("speed", 1) != 1 and effects.get("duration") is not None:
+        raise Exception("只能同时指定`speed`和`duration`中的一个噢！")
+    if effects.get("speed", 1) <= 0 or (effects.get("duration") is not None and effects["duration"] <= 0):
+        raise Exception("变速后的速度和时长必须大于 0")
+
+
+def _check_scoreboard(style: "Style") -> None:
+    """
+    检查比分牌的图片和字体文件是否存在（路径与 zxx.tools.render_scoreboard() 相同）。
+    """
+    from os.path import isfile, join
+
+    for key in ("image", "font_file"):
+        path = join(style.path(), style.scoreboard_style(key))
+        if not isfile(path):
+            raise Exception("找不到比分牌的%s文件 %s" % ("图片" if key == "image" else "字体", path))
+
+
+def _check_bgm(value: dict) -> None:
+    """
+    检查背景音乐：文件是否存在、截取范围是否有效、模式是否正确（与 zxx.Highlight.add_bgm() 的要求相同）。
+    """
+    from os.path import isfile, join
+    from .probe import probe
+    from .tools import str2sec
+
+    path = join(value["folder"], value["filename"])
+    if not isfile(path):
+        raise Exception("找不到背景音乐文件 %s" % path)
+    infos = probe(path)
+    if not infos.get("audio_found"):
+        raise Exception("文件 %s 中没有声音" % path)
+    select = value.get("select", [])
+    if len(select) > 0:
+        b = 0 if select[0] == "" else str2sec(select[0])
+        e = infos["duration"] if select[1] == "" else str2sec(select[1])
+        if b >= e:
+            raise Exception("背景音乐剪辑错误：开始时间（%s）不早于结束时间（%s）" % (b, e))
+        if e > infos["duration"] + 1e-6:
+            raise Exception("背景音乐剪辑错误：结束时间（%s）超出了音乐时长（%s）" % (e, infos["duration"]))
+    mode = value.get("mode", "cut")
+    if mode not in ("cut", "change_music_speed"):
+        raise Exception("添加背景音乐失败，请指定模式（\"cut\" 或 \"change_music_speed\"）")
+    if value.get("repeat", 1) in (None, "loop") and mode != "cut":
+        raise Exception("添加背景音乐失败，只有 \"cut\" 模式可以循环播放直到视频结束（repeat=None）")
@@ -0,0 +1,286 @@
+"""
+zxx.Stabilizer
+画面增稳
+    分析视频中相邻两帧之间的运动（平移和旋转），平滑运动轨迹，再逐帧把画面移回平滑后的位置。
+    运动数据按源文件和时间范围保存在磁盘上的缓存中，重新导出或截取重叠的片段（例如慢动作回放）时直接读取。
+"""
+
+
+import numpy as np
+from functools import lru_cache
+
+
+STABILIZE_VERSION = 1
+
+
+class Stabilizer:
+    def __init__(self, path: str, begin: float, end: float, folder: str | None = None) -> None:
+        """
+        zxx.Stabilizer 画面增稳类。一般通过 stabilizer() 获取，或在 zxx.Highlight.take() 的特效中写 {"stabilize": True}，
+        不需要直接创建。
+
+        运动分析只在 [begin - margin, end + margin] 范围内进行，而不是整个源文件：ffmpeg 从 begin - margin 开始解码，
+        缩小成灰度画面后交给 OpenCV 跟踪特征点（cv2.calcOpticalFlowPyrLK），估计相邻两帧之间的相似变换。
+        缓存中已有覆盖这一范围的运动数据时直接读取，不再分析。margin 和分析时的画面高度通过 zxx.options.SetStabilize() 设置。
+
+        参数说明：
+            path：视频文件路径。
+            begin：片段开始时刻（秒）。
+            end：片段结束时刻（秒）。
+            folder：运动数据缓存文件夹。如果未指定，则使用 zxx.options.GetStabilize("path")，
+                仍为 None 时使用用户目录下的 .cache/zxx/stabilize 文件夹。
+        """
+        from os.path import abspath, expanduser, join
+        from .options import GetStabilize
+        from .probe import probe
+
+        if begin >= end:
+            raise Exception("画面增稳失败：开始时刻 %s 未能早于结束时刻 %s" % (begin, end))
+        self.__path = abspath(path)
+        if folder == None:
+            folder = GetStabilize("path")
+        if folder == None:
+            folder = join(expanduser("~"), ".cache", "zxx", "stabilize")
+        infos = probe(self.__path)
+        self.__fps = infos["video_fps"]
+        margin = GetStabilize("margin")
+        begin, end = max(begin - margin, 0), min(end + margin, infos["duration"])
+        data = _find(folder, self.__path, begin, end)
+        if data == None:
+            print("正在分析画面抖动：%s [%.2f, %.2f]" % (self.__path, begin, end))
+            data = _analyse(self.__path, begin, end, self.__fps, GetStabilize("height"))
+            _save(join(folder, "%s_%d_%d.npz" % (_digest(self.__path), round(begin * 1000), round(end * 1000))), data)
+        self.__times, self.__motions = data
+
+    def path(self) -> str:
+        """
+        返回视频文件的绝对路径。
+        """
+        return self.__path
+
+    def times(self):
+        """
+        返回分析过的各帧的时刻（秒），是 numpy 数组。
+        """
+        return self.__times
+
+    def motions(self):
+        """
+        返回各帧相对于上一帧的运动，是形状为 (帧数, 3) 的 numpy 数组，每行是 (水平平移, 竖直平移, 旋转角)。
+        平移以画面高度为单位，旋转角以弧度为单位；第一帧的运动为 0。
+        """
+        return self.__motions
+
+    def corrections(self, smoothing: float = 1):
+        """
+        返回各帧的校正量（平滑后的运动轨迹减去原轨迹），形状与 motions() 相同，单位也相同。
+
+        参数说明：
+            smoothing：平滑窗口的半径（秒），默认为 1。越大画面越稳，但镜头跟随主动运镜也越慢，画面边缘需要放大得越多。
+        """
+        trajectory = np.cumsum(self.__motions, axis=0)
+        radius = max(int(round(smoothing * self.__fps)), 1)
+        padded = np.pad(trajectory, ((radius, radius), (0, 0)), mode="edge")
+        kernel = np.ones(2 * radius + 1) / (2 * radius + 1)
+        smoothed = np.stack([np.convolve(padded[:, k], kernel, mode="same")[radius:-radius] for k in range(3)], axis=1)
+        return smoothed - trajectory
+
+    def apply(self, clip, begin: float, smoothing: float = 1, zoom: float = 1.05):
+        """
+        对从源文件 begin 时刻开始截取的视频片段逐帧增稳，返回新的 moviepy VideoClip。
+        画面按校正量平移、旋转后，再以画面中心放大 zoom 倍，遮住移出画面的边缘（剩余的空白用边缘像素填充）。
+
+        参数说明：
+            clip：视频片段，类型是 moviepy 的 VideoClip 类，其 0 时刻对应源文件的 begin 时刻。
+            begin：片段在源文件中的开始时刻（秒）。
+            smoothing：平滑窗口的半径（秒），默认为 1。
+            zoom：放大倍数，默认为 1.05。
+        """
+        import cv2
+
+        corrections = self.corrections(smoothing)
+        times = self.__times
+
+        def kernel(get_frame, t):
+            frame = get_frame(t)
+            height, width = frame.shape[:2]
+            dx, dy, angle = (np.interp(begin + t, times, corrections[:, k]) for k in range(3))
+            cos, sin = np.cos(angle), np.sin(angle)
+            matrix = np.array([[cos, -sin, dx * height], [sin, cos, dy * height]]) * zoom
+            matrix[:, 2] += (1 - zoom) * np.array([width / 2, height / 2])
+            return cv2.warpAffine(frame, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                                  borderMode=cv2.BORDER_REPLICATE)
+
+        return clip.transform(kernel)
+
+
+def stabilizer(path: str, begin: float, end: float) -> Stabilizer:
+    """
+    返回视频文件某一范围的画面增稳器。结果按（路径、修改时间、文件大小、时间范围）缓存在内存中，
+    运动数据同时保存在磁盘上的缓存中。
+
+    参数说明：
+        path：视频文件路径。
+        begin：片段开始时刻（秒）。
+        end：片段结束时刻（秒）。
+    """
+    from os import stat
+    from os.path import abspath
+    from .options import GetStabilize
+
+    path = abspath(path)
+    info = stat(path)
+    return _stabilizer(path, info.st_mtime, info.st_size, float(begin), float(end),
+                       GetStabilize("path"), GetStabilize("margin"), GetStabilize("height"))
+
+
+@lru_cache(maxsize=64)
+def _stabilizer(path: str, mtime: float, size: int, begin: float, end: float,
+                folder: str | None, margin: float, height: int) -> Stabilizer:
+    """
+    stabilizer() 的缓存实现。mtime、size、margin 和 height 只用于在文件或设置改动后使缓存失效。
+    """
+    return Stabilizer(path, begin, end, folder)
+
+
+def stabilize(clip, path: str, begin: float, end: float, settings) -> "VideoClip":
+    """
+    按 zxx.Highlight.take() 特效中 stabilize 的值，对从源文件截取的片段 [begin, end] 增稳。
+
+    参数说明：
+        clip：视频片段，类型是 moviepy 的 VideoClip 类。
+        path：视频源文件路径。
+        begin：片段开始时刻（秒）。
+        end：片段结束时刻（秒）。
+        settings：stabilize 的值。True 表示使用默认设置；数字表示平滑窗口的半径（秒）；
+            也可以是 dict，例如 {"smoothing": 2, "zoom": 1.1}，参见 Stabilizer.apply()。
+    """
+    if settings is True:
+        settings = {}
+    elif isinstance(settings, (int, float)):
+        settings = {"smoothing": settings}
+    if not isinstance(settings, dict) or len(set(settings) - {"smoothing", "zoom"}) > 0:
+        raise Exception("画面增稳的设置无效：%r，可以写成 True、平滑半径（秒）或 {\"smoothing\": 1, \"zoom\": 1.05}" % (settings,))
+    return stabilizer(path, begin, end).apply(clip, begin, **settings)
+
+
+def _digest(path: str) -> str:
+    """
+    缓存文件名的前缀：由源文件路径、修改时间和大小计算，源文件改动后随之改变。
+    """
+    from hashlib import sha1
+    from os import stat
+
+    info = stat(path)
+    return sha1(("%s|%s|%s" % (path, info.st_mtime, info.st_size)).encode("utf8")).hexdigest()[:16]
+
+
+def _find(folder: str, path: str, begin: float, end: float) -> tuple | None:
+    """
+    在缓存文件夹中查找同一源文件、覆盖 [begin, end] 的运动数据，返回其中 [begin, end] 的部分。没有时返回 None。
+    """
+    from glob import glob
+    from os.path import basename, join
+
+    prefix = _digest(path)
+    for cache_path in glob(join(folder, prefix + "_*.npz")):
+        try:
+            a, b = (int(x) / 1000 for x in basename(cache_path)[len(prefix) + 1:-4].split("_"))
+        except ValueError:
+            continue
+        if a <= begin + 1e-3 and b >= end - 1e-3:
+            data = _load(cache_path)
+            if data != None:
+                times, motions = data
+                part = (times >= begin - 1e-3) & (times <= end + 1e-3)
+                if part.any():
+                    motions = motions[part].copy()
+                    motions[0] = 0    # 第一帧之前的运动不属于这一范围
+                    return times[part], motions
+    return None
+
+
+def _analyse(path: str, begin: float, end: float, fps: float, height: int) -> tuple:
+    """
+    用 ffmpeg 解码 [begin, end] 范围内缩小后的灰度画面，逐帧估计相对于上一帧的相似变换，
+    返回 (各帧时刻, 各帧运动) 两个 numpy 数组。一次只保存相邻两帧，内存占用与时长无关。
+    """
+    import cv2
+    import subprocess as sp
+    from math import ceil
+    from moviepy.config import FFMPEG_BINARY
+    from .probe import display_size
+
+    source_width, source_height = display_size(path)
+    height = min(height, source_height)
+    width = max(round(source_width * height / source_height / 2) * 2, 2)
+    proc = sp.Popen([FFMPEG_BINARY, "-hide_banner", "-nostdin", "-v", "error", "-ss", "%.6f" % begin,
+                     "-t", "%.6f" % (end - begin), "-i", path, "-an", "-vf", "scale=%d:%d" % (width, height),
+                     "-pix_fmt", "gray", "-f", "rawvideo", "-"], stdout=sp.PIPE, stderr=sp.PIPE)
+    motions = []
+    previous = None
+    try:
+        while True:
+            data = proc.stdout.read(width * height)
+            if len(data) < width * height:
+                break
+            frame = np.frombuffer(data, dtype=np.uint8).reshape(height, width)
+            motions.append((0.0, 0.0, 0.0) if previous is None else _motion(previous, frame, cv2))
+            previous = frame
+        stderr = proc.stderr.read().decode("utf8", errors="ignore")
+    finally:
+        proc.stdout.close()
+        proc.stderr.close()
+        proc.wait()
+    if proc.returncode != 0 or len(motions) == 0:
+        raise Exception("画面增稳失败，无法解码 %s：%s" % (path, stderr.strip()[-1000:]))
+    motions = np.array(motions)
+    motions[:, :2] /= height    # 平移换算成以画面高度为单位，与导出时的分辨率无关
+    times = (ceil(begin * fps - 1e-6) + np.arange(len(motions))) / fps
+    return times, motions
+
+
+def _motion(previous, frame, cv2) -> tuple:
+    """
+    估计 frame 相对于 previous 的相似变换，返回 (水平平移, 竖直平移, 旋转角)，平移以像素为单位。
+    特征点太少或估计失败（例如画面切换、整体模糊）时视为没有运动。
+    """
+    points = cv2.goodFeaturesToTrack(previous, maxCorners=200, qualityLevel=0.01, minDistance=30, blockSize=3)
+    if points is None or len(points) < 8:
+        return 0.0, 0.0, 0.0
+    moved, status, _ = cv2.calcOpticalFlowPyrLK(previous, frame, points, None)
+    found = status.ravel() == 1
+    if found.sum() < 8:
+        return 0.0, 0.0, 0.0
+    matrix, _ = cv2.estimateAffinePartial2D(points[found], moved[found])
+    if matrix is None:
+        return 0.0, 0.0, 0.0
+    return float(matrix[0, 2]), float(matrix[1, 2]), float(np.arctan2(matrix[1, 0], matrix[0, 0]))
+
+
+def _load(cache_path: str) -> tuple | None:
+    """
+    读取运动数据缓存。文件损坏或版本不同时返回 None，之后会重新分析。
+    """
+    try:
+        with np.load(cache_path) as data:
+            if int(data["version"]) != STABILIZE_VERSION:
+                return None
+            return data["times"], data["motions"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save(cache_path: str, data: tuple) -> None:
+    """
+    保存运动数据缓存。先写入临时文件再改名，中途中断也不会留下不完整的文件。
+    """
+    from os import makedirs, replace
+    from os.path import dirname
+
+    makedirs(dirname(cache_path), exist_ok=True)
+    times, motions = data
+    temp_path = cache_path + ".part"
+    with open(temp_path, "wb") as f:
+        np.savez_compressed(f, version=STABILIZE_VERSION, times=times, motions=motions)
+    replace(temp_path, cache_path)
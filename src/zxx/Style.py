@@ -0,0 +1,104 @@
+"""
+zxx.Style
+样式类
+    一组不可变、可哈希的设置（工作路径、比赛信息、字幕样式、比分牌样式），代替直接读取 zxx.options 中的全局变量。
+"""
+
+
+class Style:
+    def __init__(self, path: str, match_info: dict, caption_style: dict, scoreboard_style: dict) -> None:
+        """
+        zxx.Style 样式类。创建后不能修改，只能通过 replace() 得到修改了部分设置的新实例，
+        因此可以在多个线程之间共享，也可以作为缓存键。
+
+        每个 zxx.Highlight 持有自己的样式，每个片段（zxx.Take）记录截取时的样式。
+        zxx.options 中的 SetPath()、SetMatchInfo()、SetCaptionStyle()、SetScoreBoardStyle() 设置的是默认样式，
+        即 zxx.options.GetStyle() 的返回值。
+
+        参数说明：
+            path：工作路径。
+            match_info：比赛信息，参见 zxx.options.SetMatchInfo()。
+            caption_style：字幕样式，参见 zxx.options.SetCaptionStyle()。
+            scoreboard_style：比分牌样式，参见 zxx.options.SetScoreBoardStyle()。
+        """
+        self.__path = path
+        self.__match_info = _freeze(match_info)
+        self.__caption_style = _freeze(caption_style)
+        self.__scoreboard_style = _freeze(scoreboard_style)
+
+    def path(self) -> str:
+        """
+        返回工作路径。
+        """
+        return self.__path
+
+    def match_info(self, para: str = None) -> dict | str:
+        """
+        返回比赛信息。
+        如果具体指定需要某个参数，则返回该参数的值；如果未指定，返回所有比赛信息（副本）。
+        """
+        return _lookup(self.__match_info, para)
+
+    def caption_style(self, para: str = None):
+        """
+        返回字幕样式。
+        如果具体指定需要某个参数，则返回该参数的值；如果未指定，返回所有字幕样式（副本）。
+        """
+        return _lookup(self.__caption_style, para)
+
+    def scoreboard_style(self, para: str = None):
+        """
+        返回比分牌样式。
+        如果具体指定需要某个参数，则返回该参数的值；如果未指定，返回所有比分牌样式（副本）。
+        """
+        return _lookup(self.__scoreboard_style, para)
+
+    def replace(self, path: str | None = None, match_info: dict | None = None,
+                caption_style: dict | None = None, scoreboard_style: dict | None = None) -> "Style":
+        """
+        返回修改了部分设置的新样式，原样式不变。各 dict 参数只需包含要修改的项，其余项保持原值。
+
+        例如：style.replace(match_info={"away": "光华"}, caption_style={"color": "yellow"})
+        """
+        return Style(
+            self.__path if path == None else path,
+            dict(self.__match_info, **(match_info or {})),
+            dict(self.__caption_style, **(caption_style or {})),
+            dict(self.__scoreboard_style, **(scoreboard_style or {})),
+        )
+
+    def __key(self) -> tuple:
+        return (self.__path, self.__match_info, self.__caption_style, self.__scoreboard_style)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Style) and self.__key() == other.__key()
+
+    def __hash__(self) -> int:
+        return hash(self.__key())
+
+    def __repr__(self) -> str:
+        return "Style(path=%r, match_info=%r, caption_style=%r, scoreboard_style=%r)" % (
+            self.__path, dict(self.__match_info), dict(self.__caption_style), dict(self.__scoreboard_style))
+
+
+def _freeze(value):
+    """
+    把 dict / list 递归地转换成可哈希的元组。dict 转换成按键排序的 (键, 值) 元组。
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _lookup(items: tuple, para: str | None):
+    """
+    从 _freeze() 得到的 (键, 值) 元组中读取某一项；para 为 None 时返回全部项组成的 dict。
+    """
+    if para == None:
+        return dict(items)
+    for key, value in items:
+        if key == para:
+            return value
+    raise KeyError(para)
@@ -0,0 +1,164 @@
+"""
+zxx.Take
+片段描述类
+    记录集锦中一个片段的来源和后期处理信息，可以据此（重新）生成视频片段。
+"""
+
+
+from moviepy import VideoClip
+
+
+class Take:
+    def __init__(self, path: str, begin: float, end: float, caption: str | None = None,
+                 effects: dict | None = None, score: tuple | None = None, style: "Style" = None,
+                 proxy_height: int | None = None) -> None:
+        """
+        zxx.Take 片段描述类，记录 zxx.Highlight.take() 中每个片段“从哪里来、做了什么处理”。
+        它只保存文件路径、时间范围和处理参数，不持有任何 moviepy 对象，因此可以在导出时据此判断能否直接复制码流，
+        也可以在其他进程中重新生成同样的视频片段。
+
+        参数说明：
+            path：视频源文件的绝对路径。
+            begin：开始时刻（秒）。
+            end：结束时刻（秒）。
+            caption：字幕文案，None 表示不加字幕。
+            effects：特效字典，会传递到 zxx.tools.add_effects() 方法作为参数（stabilize 除外，它由 zxx.Stabilizer 处理）。
+                None 表示不加特效。
+            score：比分牌上显示的比分 (主队得分, 客队得分)，None 表示不显示比分牌。
+            style：截取片段时的样式，类型为 zxx.Style，用于在之后或在其他进程中按同样的字幕、比分牌样式重新生成片段。
+                None 表示使用生成片段时的默认样式（zxx.options.GetStyle() 的返回值）。
+            proxy_height：代理模式下代理文件的画面高度（像素），生成片段时解码代理文件而不是源文件。None 表示使用源文件。
+        """
+        if begin >= end:
+            raise Exception("时间轴错误：开始时刻 %s 未能早于结束时刻 %s" % (begin, end))
+        self.path = path
+        self.begin = begin
+        self.end = end
+        self.caption = caption
+        self.effects = dict(effects) if effects else {}
+        self.score = score
+        self.style = style
+        self.proxy_height = proxy_height
+
+    def __repr__(self) -> str:
+        return "Take(%r, %r, %r, caption=%r, effects=%r, score=%r)" % (
+            self.path, self.begin, self.end, self.caption, self.effects, self.score)
+
+    def original(self) -> "Take":
+        """
+        返回使用源文件（而不是代理文件）的同一片段描述。
+        """
+        from copy import copy
+
+        take = copy(self)
+        take.proxy_height = None
+        return take
+
+    def untouched(self) -> bool:
+        """
+        片段是否未经任何后期处理（没有特效、没有可见的字幕、没有比分牌），即画面与源文件完全相同。
+        """
+        no_caption = self.caption == None or self.caption.strip() == ""
+        return no_caption and len(self.effects) == 0 and self.score == None
+
+    def open(self, size: tuple | None = None) -> "File":
+        """
+        打开生成片段所需的视频文件（从读取器池借用），返回 zxx.File。代理模式下打开代理文件。
+
+        参数说明：
+            size：画面尺寸 (宽, 高)。如果文件的尺寸与之不同，则由 ffmpeg 在解码时直接缩放到这个尺寸。
+        """
+        from .File import File, make_proxy
+        from .probe import display_size
+
+        path = self.path if self.proxy_height == None else make_proxy(self.path, self.proxy_height)
+        if size != None and tuple(size) == display_size(path):
+            size = None
+        return File(path, "", target_resolution=size)
+
+    def clip(self, file: "File" = None, size: tuple | None = None, profiler: "Profiler" = None) -> VideoClip:
+        """
+        根据片段描述生成视频片段，类型是 moviepy 的 VideoClip 类。
+        处理顺序是先加特效，再加字幕和比分牌。字幕和比分牌使用截取片段时的样式（style），不读取也不修改全局设置，
+        因此可以在多个线程中同时生成片段。
+
+        参数说明：
+            file：视频源文件，类型为 zxx.File。如果未指定，则按 path 打开（从读取器池借用）；代理模式下打开代理文件。
+            size：画面尺寸 (宽, 高)。未指定 file 时，如果源文件的尺寸与之不同，则由 ffmpeg 在解码时直接缩放到这个尺寸。
+            profiler：性能分析器，类型为 zxx.Profiler。指定时分别记录解码、特效、字幕和比分牌各层的耗时。
+        """
+        from .FrameCache import shared_frame_cache
+        from .options import GetStyle
+        from .probe import display_size
+        from .Stabilizer import stabilize as stabilize_clip
+        from .tools import add_effects, add_caption, add_scoreboard
+
+        style = self.style if self.style != None else GetStyle()
+        if file == None:
+            file = self.open(size)
+        shared_frame_cache().add_range(file.path(), self.begin, self.end)    # 与其他片段重叠的画面会被缓存
+
+        def layer(clip, stage):
+            return clip if profiler == None else profiler.wrap(clip, stage)
+
+        clip = layer(file.contents().subclipped(self.begin, self.end), "decode")
+        # 代理文件画面较小，以像素为单位的字幕位置需要按比例缩小
+        scale = 1 if self.proxy_height == None else clip.size[0] / display_size(self.path)[0]
+        effects = dict(self.effects)
+        stabilize = effects.pop("stabilize", False)
+        if stabilize:    # 增稳按源文件中的时刻查找运动数据，必须在变速之前
+            clip = layer(stabilize_clip(clip, self.path, self.begin, self.end, stabilize), "effects")
+        if len(effects) > 0:
+            clip = layer(add_effects(clip, **effects), "effects")
+        if self.caption != None:
+            clip = layer(add_caption(clip, self.caption, scale, style), "caption")
+        if self.score != None:
+            home_score, away_score = self.score
+            clip = layer(add_scoreboard(clip, home_score, away_score, style), "scoreboard")
+        return clip
+
+
+def parse_take_info(info: list, duration: float) -> tuple:
+    """
+    解析 zxx.Highlight.take() 的 *args 中的一项，返回 (开始时刻, 结束时刻, 字幕, 特效)，时刻的单位是秒。
+    zxx.Highlight.take() 和 EDL（参见 zxx.edl）共用这一解析规则。
+
+    参数说明：
+        info：片段信息，是包含 1 至 4 个元素的列表，写法参见 zxx.Highlight.take()。
+        duration：视频源文件的时长（秒），结束时刻为空字符串时使用。
+    """
+    from .tools import str2sec
+
+    if len(info) == 0 or len(info) >= 5:
+        raise Exception("*args 中某一项包含元素过多或过少，必须是 1 至 4 个！")
+    if len(info) == 1:    # 处理只传入 1 个元素的情况
+        info = ["", "", info[0]]
+    elif len(info) == 2:    # 处理传入 2 个元素为字幕和特效的情况
+        if isinstance(info[1], dict):
+            info = ["", "", info[0], info[1]]
+    begin = info[0]
+    end = info[1]
+    if begin == "":
+        begin = "0"
+    if end == "":
+        end = str(duration)
+    caption, effects = None, None
+    if len(info) == 4:    # 添加特效和字幕，顺序是先加特效，再加字幕和比分牌
+        effects = info[3]
+        caption = info[2]
+    elif len(info) == 3:    # 只添加特效或字幕
+        if isinstance(info[2], dict):
+            effects = info[2]
+        else:
+            caption = info[2]
+    try:
+        begin, end = str2sec(begin), str2sec(end)
+    except (ValueError, AttributeError):
+        begin, end = None, None
+    if begin == None or end == None:
+        raise Exception("时间格式错误：%r，应写成 \"01:35\" 或 \"1:35:36.3\" 这样的形式" % (info[:2],))
+    if begin < 0:
+        raise Exception("时间轴错误：开始时刻 %s 不能早于视频开头" % begin)
+    if end > duration + 1e-6:
+        raise Exception("时间轴错误：结束时刻 %s 超出了视频时长 %s" % (end, duration))
+    return begin, end, caption, effects
@@ -0,0 +1,249 @@
+"""
+zxx.Timeline
+时间线类
+    以扁平的片段列表保存集锦内容，只在导出时一次性拼接。
+"""
+
+
+from moviepy import VideoClip
+
+
+class Timeline:
+    def __init__(self) -> None:
+        """
+        zxx.Timeline 时间线类，按顺序保存集锦中的各个视频片段及其在集锦中的起始时刻。
+
+        追加片段时不会嵌套调用 concatenate_videoclips()，而是只记录片段和累计的起始时刻；
+        取某一时刻的画面时，通过二分查找定位所在片段。因此无论集锦包含多少片段，取帧的开销都基本不变。
+        """
+        self.__clips = []           # 各视频片段，类型是 moviepy 的 VideoClip 类
+        self.__takes = []           # 各片段的描述，类型为 zxx.Take；没有描述的片段为 None
+        self.__starts = []          # 各片段在集锦中的起始时刻（秒），单调递增
+        self.__muted = []           # 各片段的原声是否已被消音
+        self.__audio_layers = []    # 叠加在原声之上的音轨，每项为 (起始时刻, AudioClip, 闪避设置或 None)
+        self.__duration = 0
+        self.__built = None         # 缓存 build() 的结果，时间线改动后失效
+
+    def __len__(self) -> int:
+        return len(self.__clips)
+
+    def clips(self) -> list:
+        """
+        返回所有视频片段组成的列表（副本）。
+        """
+        return list(self.__clips)
+
+    def takes(self) -> list:
+        """
+        返回所有片段的描述（zxx.Take）组成的列表（副本），没有描述的片段对应 None。
+        """
+        return list(self.__takes)
+
+    def starts(self) -> list:
+        """
+        返回所有视频片段在集锦中的起始时刻组成的列表（副本）。
+        """
+        return list(self.__starts)
+
+    def duration(self) -> float:
+        """
+        返回时间线的总时长（秒）。
+        """
+        return self.__duration
+
+    def size(self) -> tuple | None:
+        """
+        返回时间线的画面尺寸，即第一个片段的尺寸。时间线为空时返回 None。
+        """
+        if len(self.__clips) == 0:
+            return None
+        return tuple(self.__clips[0].size)
+
+    def append(self, clip: VideoClip, take: "Take" = None) -> "Timeline":
+        """
+        在时间线末尾追加一个视频片段。
+        返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
+
+        参数说明：
+            clip：视频片段，类型是 moviepy 的 VideoClip 类。
+            take：该片段的描述，类型为 zxx.Take。如果片段不是由 zxx.Highlight.take() 生成的，可以不指定。
+        """
+        self.__clips.append(clip)
+        self.__takes.append(take)
+        self.__starts.append(self.__duration)
+        self.__muted.append(False)
+        self.__duration += clip.duration
+        self.__built = None
+        return self
+
+    def locate(self, t: float) -> tuple:
+        """
+        二分查找集锦中 t 时刻所在的片段。
+        返回值是 (片段序号, 片段内的时刻)。
+        """
+        return _locate(self.__starts, t)
+
+    def get_frame(self, t: float):
+        """
+        返回集锦中 t 时刻的画面。
+        """
+        i, local_t = self.locate(t)
+        return self.__clips[i].get_frame(local_t)
+
+    def mute(self) -> "Timeline":
+        """
+        将时间线上已有内容的声音（包括原声和已添加的音轨）全部消音。之后追加的片段不受影响。
+        返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
+        """
+        self.__muted = [True] * len(self.__clips)
+        self.__audio_layers = []
+        self.__built = None
+        return self
+
+    def set_audio(self, audio_clip) -> "Timeline":
+        """
+        用一条音轨替换时间线上已有内容的全部声音（从 0 时刻开始播放）。之后追加的片段不受影响。
+        返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
+
+        参数说明：
+            audio_clip：新的音轨，类型是 moviepy 的 AudioClip 类。
+        """
+        self.mute()
+        self.__audio_layers = [(0, audio_clip, None)]
+        return self
+
+    def add_audio(self, audio_clip, start: float = 0, duck: tuple | None = None) -> "Timeline":
+        """
+        在原声之上叠加一条音轨（例如多段背景音乐中的一段），原声和已有的音轨保持不变。
+        返回值是 self，即调用该函数的实例本身，因此可用于链式写法。
+
+        参数说明：
+            audio_clip：要叠加的音轨，类型是 moviepy 的 AudioClip 类。
+            start：音轨在集锦中的起始时刻（秒），默认为 0。
+            duck：闪避（ducking）设置 (降低的分贝数, 门限分贝数)，默认为 None 即不闪避。
+                闪避时，未消音的原声响度超过门限的地方，这条音轨的音量自动降低，让解说和现场声音更清楚。
+        """
+        self.__audio_layers.append((start, audio_clip, duck))
+        self.__built = None
+        return self
+
+    def map(self, function) -> "Timeline":
+        """
+        返回一条新的时间线：每个片段及其描述替换为 function(片段, 片段描述) 的返回值，消音状态和音轨保持不变。
+        新片段的时长必须与原片段相同，例如用原始素材重新生成代理模式下的片段。
+
+        参数说明：
+            function：接受 (VideoClip, Take 或 None) 两个参数、返回 (新 VideoClip, 新 Take 或 None) 的函数。
+        """
+        timeline = Timeline()
+        for clip, take in zip(self.__clips, self.__takes):
+            timeline.append(*function(clip, take))
+        timeline.__muted = list(self.__muted)
+        timeline.__audio_layers = list(self.__audio_layers)
+        return timeline
+
+    def build(self) -> VideoClip:
+        """
+        将时间线上的所有片段一次性拼接成一个 moviepy 的 VideoClip 类的实例。
+        结果会被缓存，直到时间线再次改动。
+        """
+        if self.__built is None:
+            self.__built = _build(
+                list(self.__clips), list(self.__starts), list(self.__muted),
+                list(self.__audio_layers), self.__duration,
+            )
+        return self.__built
+
+
+def _locate(starts: list, t: float) -> tuple:
+    """
+    在起始时刻列表 starts 中二分查找 t 所在的片段，返回 (片段序号, 片段内的时刻)。
+    """
+    from bisect import bisect_right
+
+    i = bisect_right(starts, t) - 1
+    i = min(max(i, 0), len(starts) - 1)
+    return i, t - starts[i]
+
+
+def _build(clips: list, starts: list, muted: list, audio_layers: list, duration: float) -> VideoClip:
+    """
+    根据时间线的快照生成扁平拼接的 VideoClip，画面和声音都只经过一层查找。
+    """
+    from moviepy import AudioClip
+    import numpy as np
+
+    def frame_function(t):
+        i, local_t = _locate(starts, t)
+        return clips[i].get_frame(local_t)
+
+    result = VideoClip(frame_function=frame_function, duration=duration)
+    fpss = [clip.fps for clip in clips if getattr(clip, "fps", None) is not None]
+    result.fps = max(fpss) if fpss else None
+
+    # 声音：未被消音的片段原声，加上叠加的音轨
+    sources = [(start, None if mute else clip.audio, start + clip.duration)
+               for clip, start, mute in zip(clips, starts, muted)]
+    layers = [(start, audio, start + audio.duration) for start, audio, _ in audio_layers]
+    ducks = [duck for _, _, duck in audio_layers]
+    audios = [clip.audio for clip in clips if clip.audio is not None] + [a for _, a, _ in layers]
+    if len(audios) == 0:
+        return result
+    nchannels = max(audio.nchannels for audio in audios)
+    fps = max(audio.fps for audio in audios)
+
+    def mix(sound, t, start, audio, end, gain=None):
+        part = (t >= start) & (t < end)
+        if audio is not None and part.any():
+            frame = audio.get_frame(t[part] - start)
+            if frame.ndim == 1:
+                frame = frame[:, None]
+            sound[part] += frame if gain is None else frame * gain[part][:, None]
+
+    def audio_frame_function(t):
+        if not isinstance(t, np.ndarray):
+            return audio_frame_function(np.array([t]))[0]
+        sound = np.zeros((len(t), nchannels))
+        if len(t) == 0:
+            return sound
+        # 原声片段首尾相接，只需处理与这段时间相交的片段
+        first = _locate(starts, t.min())[0]
+        last = _locate(starts, t.max())[0]
+        for source in sources[first:last + 1]:
+            mix(sound, t, *source)
+        # 闪避按原声（混入音轨之前）的响度计算，与音轨在同一次混音中完成
+        level = _level(sound, fps) if any(duck is not None for duck in ducks) else None
+        for layer, duck in zip(layers, ducks):
+            mix(sound, t, *layer, gain=None if duck is None else _duck_gain(level, fps, *duck))
+        return sound
+
+    result.audio = AudioClip(audio_frame_function, duration=duration, fps=fps)
+    return result
+
+
+def _level(sound, fps: float, window: float = 0.05):
+    """
+    计算声音每个采样点附近 window 秒内的响度（dBFS），返回与采样点数相同的一维数组。
+    """
+    import numpy as np
+
+    n = len(sound)
+    size = max(int(fps * window), 1)
+    count = -(-n // size)
+    padded = np.zeros((count * size, sound.shape[1]))
+    padded[:n] = sound
+    energy = np.mean(np.square(padded).reshape(count, -1), axis=1)
+    level = 10 * np.log10(np.maximum(energy, 1e-10))
+    return np.repeat(level, size)[:n]
+
+
+def _duck_gain(level, fps: float, reduction: float, threshold: float):
+    """
+    根据原声的响度计算音轨的闪避增益（倍数）：响度超过门限处降低 reduction 分贝，并在约 50 毫秒内平滑过渡，避免爆音。
+    """
+    import numpy as np
+
+    gain = np.where(level > threshold, 10 ** (-reduction / 20), 1.0)
+    size = max(int(fps * 0.05), 1)
+    padded = np.concatenate([np.full(size, gain[0]), gain, np.full(size, gain[-1])])
+    return np.convolve(padded, np.ones(size) / size, mode="same")[size:size + len(gain)]
@@ -0,0 +1,77 @@
+"""
+zxx 命令行工具
+    python -m zxx cache info [--path 缓存文件夹]：查看分段缓存的位置、分段数量和总大小。
+    python -m zxx cache purge [--path 缓存文件夹]：清空分段缓存。
+    python -m zxx plan EDL文件 [--mode 导出模式]：预演，只读取元数据检查 EDL，查看渲染计划和导出的开销，不解码画面。
+    python -m zxx render EDL文件 [--mode 导出模式] [--output 文件名] [--no-optimize] [--pipeline]：由 EDL 制作并导出集锦。
+    python -m zxx moments 视频文件 [--count 10] [--before 8] [--after 4]：只分析声音，列出可能的精彩时刻（欢呼和哨声）。
+"""
+
+
+def main(argv: list | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m zxx", description="zxx 命令行工具")
+    commands = parser.add_subparsers(dest="command", required=True)
+    cache_parser = commands.add_parser("cache", help="查看或清空分段缓存")
+    cache_parser.add_argument("action", choices=["info", "purge"], help="info：查看缓存；purge：清空缓存")
+    cache_parser.add_argument("--path", default=None, help="缓存文件夹，默认为 zxx.options.GetRenderCache(\"path\")")
+    plan_parser = commands.add_parser("plan", help="预演：检查 EDL，查看渲染计划和导出的开销")
+    plan_parser.add_argument("edl", help="EDL 文件（.json 或 .toml）")
+    plan_parser.add_argument("--mode", default=None, help="导出模式，默认使用 EDL 中的导出设置")
+    render_parser = commands.add_parser("render", help="由 EDL 制作并导出集锦")
+    render_parser.add_argument("edl", help="EDL 文件（.json 或 .toml）")
+    render_parser.add_argument("--mode", default=None, help="导出模式，默认使用 EDL 中的导出设置")
+    render_parser.add_argument("--output", default=None, help="导出的视频文件名，默认使用 EDL 中的导出设置")
+    render_parser.add_argument("--no-optimize", action="store_true", help="不编译渲染计划，按 EDL 原样制作")
+    render_parser.add_argument("--pipeline", action="store_true", help="流水线导出：解码、合成和编码在各自的线程中进行")
+    moments_parser = commands.add_parser("moments", help="只分析声音，列出可能的精彩时刻")
+    moments_parser.add_argument("video", help="比赛录像文件")
+    moments_parser.add_argument("--count", type=int, default=10, help="最多列出几个时刻，默认为 10")
+    moments_parser.add_argument("--before", type=float, default=8, help="片段从时刻之前几秒开始，默认为 8")
+    moments_parser.add_argument("--after", type=float, default=4, help="片段到时刻之后几秒结束，默认为 4")
+    args = parser.parse_args(argv)
+
+    if args.command == "plan":
+        from .edl import compile_edl
+
+        plan = compile_edl(args.edl, strict=False)
+        info = plan.print_report(args.mode)
+        for i, segment in enumerate(plan.segments()):
+            print("%3d. %s  %.2f 秒%s%s" % (i + 1, segment["take"], segment["duration"],
+                                          "（合并 %d 个片段）" % segment["takes"] if segment["takes"] > 1 else "",
+                                          "（可直接复制码流）" if segment["copy"] else ""))
+        return 1 if len(info["errors"]) > 0 else 0
+    if args.command == "render":
+        from .edl import render_edl
+
+        kwargs = {}
+        if args.mode != None:
+            kwargs["mode"] = args.mode
+        if args.output != None:
+            kwargs["filename"] = args.output
+        if args.pipeline:
+            kwargs["pipeline"] = True
+        render_edl(args.edl, optimize=not args.no_optimize, **kwargs)
+        return 0
+    if args.command == "moments":
+        from .moments import find_moments, print_moments
+
+        print_moments(find_moments(args.video, args.count, args.before, args.after))
+        return 0
+
+    from .RenderCache import RenderCache
+
+    cache = RenderCache(args.path)
+    if args.action == "info":
+        info = cache.info()
+        print("缓存位置：%s" % info["path"])
+        print("分段数量：%d" % info["entries"])
+        print("总大小：%.1f MB / %.1f MB" % (info["size"] / 1024 ** 2, info["max_size"] / 1024 ** 2))
+    else:
+        print("已删除 %d 个分段" % cache.purge())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
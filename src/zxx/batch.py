@@ -0,0 +1,192 @@
+"""
+zxx.batch
+批量导出
+    把多个集锦的导出任务分配给进程池同时运行，例如一整届比赛的所有集锦。
+"""
+
+
+def run_batch(jobs: list, workers: int = 2, memory_budget: int | None = None,
+              state_file: str | None = None, retry_failed: bool = True) -> dict:
+    """
+    批量导出多个集锦，返回每个任务的结果 {任务名: {"status": "done" / "failed" / "skipped", ...}}。
+
+    每个任务是一个 dict，可以包含以下键：
+        name：任务名，必须唯一。如果未指定，则使用 filename。
+        build：生成集锦的函数，不接受参数，返回 zxx.Highlight。必须是模块顶层定义的函数（不能是 lambda），
+            因为它要被发送到子进程中调用。
+        filename：导出的视频文件名，会传给 Highlight.export()。
+        export：传给 Highlight.export() 的其他参数组成的 dict，例如 {"mode": "hd", "folder": "D:\\\\集锦"}。
+        duration：集锦时长的估计值（秒），用于安排顺序。如果未指定，则先在主进程中调用一次 build() 得到时长。
+        memory：任务占用内存的估计值（字节）。如果未指定，则按集锦的画面尺寸估算。
+
+    调度规则：
+        1. 时长最长的任务最先开始，避免最后只剩一个长任务在运行；
+        2. 同时运行的任务不超过 workers 个，且估计的内存占用之和不超过 memory_budget（只有一个任务时不受限制）；
+        3. 某个任务失败（包括子进程崩溃）不会影响其他任务，失败信息记录在结果中；
+        4. 指定 state_file 时，每完成一个任务就把结果写入该 JSON 文件。再次运行同一批任务时，已经成功的任务会被跳过，
+            因此中断后可以接着运行。
+
+    参数说明：
+        jobs：任务列表。
+        workers：同时运行的任务数量上限，默认为 2。
+        memory_budget：同时运行的任务估计内存占用之和的上限（字节）。None 表示不限制。
+        state_file：记录任务状态的 JSON 文件路径。None 表示不记录，也不跳过任何任务。
+        retry_failed：接着运行时，是否重新运行上次失败的任务，默认为 True。
+    """
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+    from concurrent.futures.process import BrokenProcessPool
+    from time import time
+    from .ReaderPool import reset_shared_pool
+
+    if workers < 1:
+        raise Exception("同时运行的任务数量至少为 1！")
+    jobs = [dict(job, name=job.get("name") or job["filename"]) for job in jobs]
+    names = [job["name"] for job in jobs]
+    if len(set(names)) != len(names):
+        raise Exception("批量导出失败：任务名有重复")
+    state = _load_state(state_file)
+    results = {}
+    pending = []
+    for job in jobs:
+        previous = state.get(job["name"], {})
+        if previous.get("status") == "done" or (previous.get("status") == "failed" and not retry_failed):
+            results[job["name"]] = dict(previous, status="skipped", previous=previous.get("status"))
+            continue
+        pending.append(job)
+    for job in list(pending):
+        try:
+            _estimate(job)
+        except Exception as error:    # 生成集锦就失败了，不必再交给子进程
+            pending.remove(job)
+            _finish(results, state, state_file, job, "failed", 0, repr(error))
+    pending.sort(key=lambda job: job["duration"], reverse=True)
+    print("批量导出：共 %d 个任务，待运行 %d 个" % (len(jobs), len(pending)))
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=reset_shared_pool)
+    running = {}    # future -> (任务, 开始时刻)
+    try:
+        while len(pending) > 0 or len(running) > 0:
+            # 按时长从长到短，启动能放进内存预算的任务
+            used = sum(job["memory"] for job, _ in running.values())
+            for job in list(pending):
+                if len(running) >= workers:
+                    break
+                fits = memory_budget == None or used + job["memory"] <= memory_budget
+                if not fits and len(running) > 0:
+                    continue
+                pending.remove(job)
+                try:
+                    future = executor.submit(_run_job, job["build"], job["filename"], job.get("export", {}))
+                except Exception as error:    # 例如 build 无法发送到子进程
+                    _finish(results, state, state_file, job, "failed", 0, repr(error))
+                    continue
+                running[future] = (job, time())
+                used += job["memory"]
+            if len(running) == 0:
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                job, start = running.pop(future)
+                try:
+                    output = future.result()
+                except BrokenProcessPool as error:
+                    broken = True
+                    _finish(results, state, state_file, job, "failed", time() - start, "子进程异常退出：%r" % error)
+                except Exception as error:
+                    _finish(results, state, state_file, job, "failed", time() - start, repr(error))
+                else:
+                    _finish(results, state, state_file, job, "done", time() - start, None, output)
+            if broken:
+                # 进程池已损坏：其余正在运行的任务也随之失败，换一个新的进程池继续
+                for future, (job, start) in running.items():
+                    _finish(results, state, state_file, job, "failed", time() - start, "进程池损坏，任务中断")
+                running = {}
+                executor.shutdown(cancel_futures=True)
+                executor = ProcessPoolExecutor(max_workers=workers, initializer=reset_shared_pool)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    n_done = len([r for r in results.values() if r["status"] == "done"])
+    n_failed = len([r for r in results.values() if r["status"] == "failed"])
+    print("批量导出完成：成功 %d 个，失败 %d 个，跳过 %d 个" % (n_done, n_failed, len(jobs) - n_done - n_failed))
+    return {name: results[name] for name in names}
+
+
+def _estimate(job: dict) -> None:
+    """
+    补全任务的时长和内存估计值。未指定时长时，在主进程中生成一次集锦来读取时长，之后关闭打开的读取器。
+    内存按同时存在的画面数估算：除了 Python 和 moviepy 本身约 300 MB，每个读取器、每层处理和编码器的缓冲区
+    各持有若干帧 RGB 画面，这里按 64 帧计算。
+    """
+    from .ReaderPool import shared_pool
+
+    if "duration" in job and "memory" in job:
+        return
+    highlight = job["build"]()
+    contents = highlight.contents()
+    job.setdefault("duration", contents.duration if contents != None else 0)
+    if contents != None:
+        width, height = contents.size
+        job.setdefault("memory", 300 * 1024 ** 2 + width * height * 3 * 64)
+    else:
+        job.setdefault("memory", 300 * 1024 ** 2)
+    shared_pool().close()
+
+
+def _run_job(build, filename: str, export: dict) -> str:
+    """
+    在子进程中运行一个任务：生成集锦并导出，返回导出的视频文件路径。
+    """
+    from os.path import join
+
+    highlight = build()
+    highlight.export(filename, **export)
+    return join(export.get("folder") or highlight.style().path(), filename)
+
+
+def _finish(results: dict, state: dict, state_file: str | None, job: dict, status: str, seconds: float,
+            error: str | None, output: str | None = None) -> None:
+    """
+    记录一个任务的结果，并写入状态文件。
+    """
+    result = {"status": status, "seconds": round(seconds, 1)}
+    if error != None:
+        result["error"] = error
+    if output != None:
+        result["output"] = output
+    results[job["name"]] = result
+    state[job["name"]] = result
+    if status == "done":
+        print("任务 %s 已完成，用时 %.1f 秒" % (job["name"], seconds))
+    else:
+        print("任务 %s 失败：%s" % (job["name"], error))
+    _save_state(state_file, state)
+
+
+def _load_state(state_file: str | None) -> dict:
+    """
+    读取状态文件。文件不存在时返回空 dict。
+    """
+    import json
+    from os.path import isfile
+
+    if state_file == None or not isfile(state_file):
+        return {}
+    with open(state_file, "r", encoding="utf8") as f:
+        return json.load(f)
+
+
+def _save_state(state_file: str | None, state: dict) -> None:
+    """
+    写入状态文件。先写入临时文件再改名，中途中断也不会留下不完整的状态文件。
+    """
+    import json
+    from os import replace
+
+    if state_file == None:
+        return
+    temp_path = state_file + ".part"
+    with open(temp_path, "w", encoding="utf8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    replace(temp_path, state_file)
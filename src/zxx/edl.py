@@ -0,0 +1,238 @@
+"""
+zxx.edl
+剪辑决策表（EDL）
+    用 JSON 或 TOML 文件描述一个集锦：使用哪些视频、截取哪些片段、加什么字幕和特效、比分如何变化、配什么背景音乐、
+    按什么模式导出。EDL 可以由 zxx.Highlight.to_edl() 导出，也可以手写，再用 zxx.Highlight.from_edl() 制作集锦。
+
+EDL 的格式（以 JSON 为例，TOML 的结构相同）：
+    {
+        "version": 1,
+        "events": [
+            {"style": {"path": "D:\\集锦", "match_info": {"home": "政信社", "away": "光华"}}},
+            {"use": {"filename": "上半场.mp4"}},
+            {"show_score": true},
+            {"take": [["02:15", "02:30", "开场进攻"], ["05:01", "05:12", "射门！", {"speed": 0.5}]]},
+            {"set_score": [1, 0]},
+            {"change_match_info": {"away": "元培"}},
+            {"proxy": {"enable": true, "height": 360}},
+            {"silence": true},
+            {"add_bgm": {"filename": "bgm.mp3", "repeat": "loop"}},
+            {"mix_bgm": {"filename": "进球音效.mp3", "span": ["00:10", "00:25"], "duck": 12}}
+        ],
+        "export": {"filename": "集锦.mp4", "mode": "hd"}
+    }
+
+    events 是按顺序执行的操作列表，每一项只有一个键，即操作名，值是该操作的参数：
+        style：修改集锦的样式，值可以只包含要修改的项，参见 zxx.Style.replace()；
+        use、take、show_score、set_score、proxy、silence、add_bgm、mix_bgm、change_match_info：
+            与 zxx.Highlight 的同名方法相同。take 的值是片段信息的列表，写法与 zxx.Highlight.take() 的 *args 相同；
+            set_score 的值是 [主队得分, 客队得分]；show_score 的值是 true 或 false；
+            use、proxy、add_bgm、mix_bgm、change_match_info 的值是关键字参数组成的表。
+            add_bgm 和 mix_bgm 的 repeat 写成 "loop" 表示循环播放（即 repeat=None）。
+    export 是导出设置，即 zxx.Highlight.export() 的关键字参数，可以省略。
+    TOML 中没有空值（null），省略某个参数即表示使用默认值。
+"""
+
+
+EDL_VERSION = 1
+
+# EDL 中可以使用的操作
+EVENTS = ("style", "use", "take", "show_score", "set_score", "proxy", "silence", "add_bgm", "mix_bgm",
+          "change_match_info")
+
+
+def style_to_dict(style: "Style") -> dict:
+    """
+    把样式（zxx.Style）转换成可以写入 EDL 的 dict。
+    """
+    return {
+        "path": style.path(),
+        "match_info": style.match_info(),
+        "caption_style": style.caption_style(),
+        "scoreboard_style": style.scoreboard_style(),
+    }
+
+
+def check_edl(edl: dict) -> dict:
+    """
+    检查 EDL 的格式，格式正确时原样返回，否则抛出异常。
+
+    参数说明：
+        edl：EDL，类型为 dict。
+    """
+    if not isinstance(edl, dict) or not isinstance(edl.get("events"), list):
+        raise Exception("EDL 格式错误：缺少操作列表 events")
+    if edl.get("version", EDL_VERSION) > EDL_VERSION:
+        raise Exception("EDL 格式错误：不支持版本 %s，当前最高支持版本 %d" % (edl.get("version"), EDL_VERSION))
+    for i, event in enumerate(edl["events"]):
+        if not isinstance(event, dict) or len(event) != 1:
+            raise Exception("EDL 格式错误：第 %d 项操作必须只有一个键（操作名）" % (i + 1))
+        name = next(iter(event))
+        if name not in EVENTS:
+            raise Exception("EDL 格式错误：第 %d 项操作 %s 无法识别，可以使用的操作有 %s" % (i + 1, name, "、".join(EVENTS)))
+    if not isinstance(edl.get("export", {}), dict):
+        raise Exception("EDL 格式错误：导出设置 export 必须是表（dict）")
+    return edl
+
+
+def load_edl(path: str) -> dict:
+    """
+    读取 EDL 文件，返回值是 dict。根据后缀名识别格式：.json 或 .toml。
+    读取 TOML 需要 Python 3.11 及以上版本，或者安装 tomli 库。
+
+    参数说明：
+        path：EDL 文件路径。
+    """
+    import json
+    from os.path import splitext
+
+    ext = splitext(path)[1].lower()
+    if ext == ".json":
+        with open(path, "r", encoding="utf8") as f:
+            return check_edl(json.load(f))
+    if ext == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise Exception("读取 TOML 格式的 EDL 需要 Python 3.11 及以上版本，或者先安装 tomli 库：pip install tomli")
+        with open(path, "rb") as f:
+            return check_edl(tomllib.load(f))
+    raise Exception("无法识别 EDL 文件的格式：%s，后缀名必须是 .json 或 .toml" % path)
+
+
+def save_edl(edl: dict, path: str) -> None:
+    """
+    把 EDL 保存成文件。根据后缀名选择格式：.json 或 .toml。写入 TOML 需要先安装 tomli_w 库。
+    先写入临时文件再改名，中途中断也不会留下不完整的文件。
+
+    参数说明：
+        edl：EDL，类型为 dict。
+        path：EDL 文件路径。
+    """
+    import json
+    from os import remove, replace
+    from os.path import splitext
+
+    check_edl(edl)
+    ext = splitext(path)[1].lower()
+    if ext == ".json":
+        try:
+            text = json.dumps(edl, ensure_ascii=False, indent=2)
+        except TypeError as error:
+            raise Exception("保存 EDL 失败：其中有无法写入文件的参数（例如函数）：%s" % error)
+        data = text.encode("utf8")
+    elif ext == ".toml":
+        try:
+            import tomli_w
+        except ImportError:
+            raise Exception("保存 TOML 格式的 EDL 需要先安装 tomli_w 库：pip install tomli_w，或者改用 .json 格式")
+        try:
+            data = tomli_w.dumps(_strip_none(edl)).encode("utf8")
+        except TypeError as error:
+            raise Exception("保存 EDL 失败：其中有无法写入文件的参数（例如函数）：%s" % error)
+    else:
+        raise Exception("无法识别 EDL 文件的格式：%s，后缀名必须是 .json 或 .toml" % path)
+    temp_path = path + ".part"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        replace(temp_path, path)
+    except BaseException:
+        remove(temp_path)
+        raise
+
+
+def replay_edl(edl: dict, highlight: "Highlight" = None) -> "Highlight":
+    """
+    按顺序执行 EDL 中的操作，返回制作好的集锦。不做任何优化，集锦与当初调用各个方法制作的完全相同。
+
+    参数说明：
+        edl：EDL，类型为 dict。
+        highlight：在哪个集锦上执行操作。如果未指定，则新建一个集锦。
+    """
+    from .Highlight import Highlight
+
+    check_edl(edl)
+    if highlight == None:
+        highlight = Highlight()
+    for event in edl["events"]:
+        name, value = next(iter(event.items()))
+        if name == "style":
+            highlight.set_style(**value)
+        elif name == "take":
+            highlight.take(*value)
+        elif name == "show_score":
+            highlight.show_score(value)
+        elif name == "set_score":
+            highlight.set_score(*value)
+        elif name == "silence":
+            if value:
+                highlight.silence()
+        elif name in ("add_bgm", "mix_bgm"):
+            value = dict(value)
+            if value.get("repeat") == "loop":
+                value["repeat"] = None
+            getattr(highlight, name)(**value)
+        else:    # use、proxy、change_match_info 的值就是关键字参数
+            getattr(highlight, name)(**value)
+    return highlight
+
+
+def compile_edl(edl: "dict | str", strict: bool = True) -> "RenderPlan":
+    """
+    把 EDL 编译成优化后的渲染计划，类型为 zxx.RenderPlan。编译时只读取视频文件的元数据，不解码画面。
+
+    参数说明：
+        edl：EDL，可以是 dict，也可以是 .json 或 .toml 文件的路径。
+        strict：遇到错误时是否立即抛出异常，默认为 True。为 False 时记录所有错误，参见 zxx.RenderPlan.errors()。
+    """
+    from .RenderPlan import RenderPlan
+
+    if isinstance(edl, str):
+        edl = load_edl(edl)
+    return RenderPlan(check_edl(edl), strict)
+
+
+def dry_run(edl: "dict | str", mode: str | None = None) -> dict:
+    """
+    预演：只读取媒体文件的元数据，检查 EDL 中的每个片段和背景音乐，估计导出的开销并打印报告，不解码任何画面。
+    返回值是预演报告，参见 zxx.RenderPlan.report()。
+
+    参数说明：
+        edl：EDL，可以是 dict，也可以是 .json 或 .toml 文件的路径。
+        mode：导出模式。如果未指定，则使用 EDL 中的导出设置。
+    """
+    return compile_edl(edl, strict=False).print_report(mode)
+
+
+def render_edl(edl: "dict | str", optimize: bool = True, **kwargs) -> "Highlight":
+    """
+    由 EDL 制作集锦，并按 EDL 中的导出设置导出，返回制作好的集锦。
+
+    参数说明：
+        edl：EDL，可以是 dict，也可以是 .json 或 .toml 文件的路径。
+        optimize：是否先编译成优化后的渲染计划再制作，默认为 True。
+        **kwargs：覆盖 EDL 中的导出设置，会传入 zxx.Highlight.export()，例如 mode="preview"。
+    """
+    if isinstance(edl, str):
+        edl = load_edl(edl)
+    if optimize:
+        return compile_edl(edl).export(**kwargs)
+    settings = dict(check_edl(edl).get("export", {}), **kwargs)
+    if "filename" not in settings:
+        raise Exception("导出失败：EDL 中没有指定导出的文件名（export.filename）")
+    return replay_edl(edl).export(**settings)
+
+
+def _strip_none(value):
+    """
+    递归地删除 dict 中值为 None 的项（TOML 中没有空值，省略即表示使用默认值）。
+    """
+    if isinstance(value, dict):
+        return {key: _strip_none(item) for key, item in value.items() if item != None}
+    if isinstance(value, (list, tuple)):
+        return [_strip_none(item) for item in value]
+    return value
@@ -0,0 +1,251 @@
+"""
+zxx.moments
+精彩时刻
+    只解码比赛录像的声音（不解码画面），按短时能量、起音强度（频谱通量）和哨声特征，找出可能的精彩时刻，
+    例如进球后的欢呼和裁判的哨声，并给出可以直接传入 zxx.Highlight.take() 的时间范围。
+"""
+
+
+import numpy as np
+from functools import lru_cache
+
+
+FEATURES_VERSION = 1
+RATE = 16000    # 分析用的采样率，足以覆盖裁判哨声的频率（约 2.5 ~ 4.5 kHz）
+HOP = 800    # 每帧 50 毫秒
+FFT_SIZE = 1024
+WHISTLE_BAND = (2500, 4500)
+KINDS = {"crowd": "欢呼", "whistle": "哨声"}
+
+
+def audio_features(path: str, folder: str | None = None) -> dict:
+    """
+    返回媒体文件声音的逐帧特征（每帧 50 毫秒），值都是 numpy 数组：
+        times：每帧的中心时刻（秒）；
+        energy：短时能量（dBFS）；
+        flux：频谱通量，即相邻两帧频谱（对数幅度）增加的总量，声音突然变响或出现新的声音时较大；
+        whistle：哨声特征，即 2.5 ~ 4.5 kHz 频段的能量占比乘以该频段的尖锐程度（窄带音调时接近占比，噪声时很小）。
+    声音由 ffmpeg 解码成 16 kHz 单声道后按块流式读取，每块一次性向量化计算，内存占用与时长无关，90 分钟的比赛只需几秒。
+    结果按（路径、修改时间、文件大小）缓存在内存中，同时保存在磁盘上的缓存中。
+
+    参数说明：
+        path：媒体文件路径。
+        folder：特征缓存文件夹。如果未指定，则使用用户目录下的 .cache/zxx/moments 文件夹。
+    """
+    from os import stat
+    from os.path import abspath
+
+    path = abspath(path)
+    info = stat(path)
+    return dict(_audio_features(path, info.st_mtime, info.st_size, folder))
+
+
+def find_moments(path: str, count: int = 10, before: float = 8, after: float = 4,
+                 kinds: tuple = ("crowd", "whistle"), folder: str | None = None) -> list:
+    """
+    找出媒体文件中最可能的精彩时刻，按得分从高到低排列，返回 dict 组成的列表：
+        time：时刻（秒），即欢呼最响或哨声所在的位置；
+        kind：类型，"crowd"（欢呼等突然变响的声音）或 "whistle"（哨声）；
+        score：得分，即特征比全场典型水平高出多少个（稳健的）标准差，不同类型之间可以比较；
+        take：[开始时间点, 结束时间点]，可以直接传入 zxx.Highlight.take()。
+    任意两个时刻的片段都不重叠。特征只计算一次并缓存（参见 audio_features()），改变其余参数时不需要重新分析。
+
+    参数说明：
+        path：媒体文件路径。
+        count：最多返回几个时刻，默认为 10。
+        before：片段从时刻之前几秒开始，默认为 8。欢呼和哨声一般在精彩瞬间之后，因此向前多留一些。
+        after：片段到时刻之后几秒结束，默认为 4。
+        kinds：要查找的类型，默认为 ("crowd", "whistle")。
+        folder：特征缓存文件夹，参见 audio_features()。
+    """
+    from .tools import sec2str
+
+    unknown = set(kinds) - set(KINDS)
+    if len(unknown) > 0:
+        raise Exception("无法识别的精彩时刻类型：%s，可以使用的类型有 %s" % ("、".join(sorted(unknown)), "、".join(KINDS)))
+    features = audio_features(path, folder)
+    times = features["times"]
+    if len(times) == 0:
+        return []
+    duration = times[-1] + HOP / RATE / 2
+    frames_per_second = RATE / HOP
+
+    scores = []
+    if "crowd" in kinds:
+        # 欢呼：2 秒内的平均能量比前后 1 分钟的平均能量高出的分贝数，加上起音强度
+        power = 10 ** (features["energy"] / 10)
+        short = _moving_mean(power, int(2 * frames_per_second))
+        baseline = _moving_mean(power, int(60 * frames_per_second))
+        excess = 10 * np.log10(short / np.maximum(baseline, 1e-10))
+        onset = _moving_mean(features["flux"], int(1 * frames_per_second))
+        scores.append(("crowd", (_robust_z(excess) + _robust_z(onset)) / 2))
+    if "whistle" in kinds:
+        scores.append(("whistle", _robust_z(_moving_mean(features["whistle"], int(0.3 * frames_per_second)))))
+
+    # 先在各类型中找出局部最大值，再按得分从高到低挑选互不重叠的时刻
+    candidates = []
+    radius = max(int((before + after) * frames_per_second / 2), 1)
+    for kind, score in scores:
+        peaks = np.flatnonzero(score == _moving_max(score, radius))
+        peaks = peaks[score[peaks] > 0]
+        candidates += [(float(score[i]), float(times[i]), kind) for i in peaks]
+    candidates.sort(reverse=True)
+    moments = []
+    for score, t, kind in candidates:
+        if len(moments) >= count:
+            break
+        if any(abs(t - moment["time"]) < before + after for moment in moments):
+            continue
+        begin, end = max(t - before, 0), min(t + after, duration)
+        moments.append({"time": t, "kind": kind, "score": score, "take": [sec2str(begin), sec2str(end)]})
+    return moments
+
+
+def print_moments(moments: list) -> None:
+    """
+    打印 find_moments() 的结果。
+    """
+    from .tools import sec2str
+
+    if len(moments) == 0:
+        print("没有找到精彩时刻")
+        return
+    print("%4s  %-10s  %-4s  %6s  %s" % ("排名", "时刻", "类型", "得分", "片段"))
+    for i, moment in enumerate(moments):
+        print("%4d  %-10s  %-4s  %6.1f  [\"%s\", \"%s\"]" % (
+            i + 1, sec2str(moment["time"]), KINDS[moment["kind"]], moment["score"], *moment["take"]))
+
+
+@lru_cache(maxsize=32)
+def _audio_features(path: str, mtime: float, size: int, folder: str | None) -> tuple:
+    """
+    audio_features() 的缓存实现。mtime 和 size 只用于在文件被修改后使缓存失效。
+    """
+    from hashlib import sha1
+    from os.path import expanduser, isfile, join
+
+    if folder == None:
+        folder = join(expanduser("~"), ".cache", "zxx", "moments")
+    digest = sha1(("%s|%s|%s" % (path, mtime, size)).encode("utf8")).hexdigest()[:16]
+    cache_path = join(folder, "%s.npz" % digest)
+    features = _load(cache_path) if isfile(cache_path) else None
+    if features == None:
+        features = _analyse(path)
+        _save(cache_path, features)
+    for value in features.values():
+        value.setflags(write=False)
+    return tuple(features.items())
+
+
+def _analyse(path: str) -> dict:
+    """
+    用 ffmpeg 把声音解码成 16 kHz 单声道，每次读取 30 秒，逐块计算特征。
+    """
+    import subprocess as sp
+    from moviepy.config import FFMPEG_BINARY
+
+    proc = sp.Popen([FFMPEG_BINARY, "-hide_banner", "-nostdin", "-v", "error", "-i", path, "-vn", "-ac", "1",
+                     "-ar", str(RATE), "-f", "s16le", "-"], stdout=sp.PIPE, stderr=sp.PIPE)
+    window = np.hanning(HOP).astype(np.float32)
+    freqs = np.fft.rfftfreq(FFT_SIZE, 1 / RATE)
+    band = (freqs >= WHISTLE_BAND[0]) & (freqs <= WHISTLE_BAND[1])
+    energy, flux, whistle = [], [], []
+    previous = None    # 上一块最后一帧的对数频谱，用于计算块边界处的频谱通量
+    rest = np.zeros(0, dtype=np.float32)
+    try:
+        while True:
+            data = proc.stdout.read(RATE * 30 * 2)
+            if len(data) < 2:
+                break
+            sound = np.concatenate([rest, np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16) / np.float32(32768)])
+            n = len(sound) // HOP
+            rest = sound[n * HOP:]
+            if n == 0:
+                continue
+            frames = sound[:n * HOP].reshape(n, HOP)
+            energy.append(10 * np.log10(np.mean(np.square(frames), axis=1) + 1e-10))
+            spectrum = np.abs(np.fft.rfft(frames * window, n=FFT_SIZE, axis=1))
+            log_spectrum = np.log1p(spectrum * 100)
+            if previous is None:
+                previous = log_spectrum[:1]
+            diff = np.diff(np.concatenate([previous, log_spectrum]), axis=0)
+            flux.append(np.maximum(diff, 0).sum(axis=1))
+            previous = log_spectrum[-1:]
+            power = np.square(spectrum)
+            ratio = power[:, band].sum(axis=1) / (power.sum(axis=1) + 1e-12)
+            peakiness = spectrum[:, band].max(axis=1) / (spectrum[:, band].mean(axis=1) + 1e-12)
+            whistle.append(ratio * np.clip(peakiness / 8, 0, 1))
+        stderr = proc.stderr.read().decode("utf8", errors="ignore")
+    finally:
+        proc.stdout.close()
+        proc.stderr.close()
+        proc.wait()
+    if proc.returncode != 0:
+        raise Exception("分析声音失败：%s" % stderr.strip()[-1000:])
+    if len(energy) == 0:
+        raise Exception("分析声音失败：%s 中没有声音" % path)
+    energy = np.concatenate(energy).astype(np.float32)
+    return {
+        "times": ((np.arange(len(energy)) + 0.5) * HOP / RATE).astype(np.float64),
+        "energy": energy,
+        "flux": np.concatenate(flux).astype(np.float32),
+        "whistle": np.concatenate(whistle).astype(np.float32),
+    }
+
+
+def _moving_mean(x, size: int):
+    """
+    长度为 size 的滑动平均（居中，边缘按实际长度平均），用累加和计算，耗时与 size 无关。
+    """
+    size = max(size, 1)
+    n = len(x)
+    cumsum = np.concatenate([[0], np.cumsum(x, dtype=np.float64)])
+    left = np.clip(np.arange(n) - size // 2, 0, n)
+    right = np.clip(np.arange(n) + (size - size // 2), 0, n)
+    return (cumsum[right] - cumsum[left]) / (right - left)
+
+
+def _moving_max(x, radius: int):
+    """
+    半径为 radius 的滑动最大值。
+    """
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    padded = np.pad(x, radius, mode="constant", constant_values=-np.inf)
+    return sliding_window_view(padded, 2 * radius + 1).max(axis=1)
+
+
+def _robust_z(x):
+    """
+    稳健的标准分数：(x - 中位数) / (1.4826 × 绝对中位差)，不受少数精彩时刻的极端值影响。
+    """
+    median = np.median(x)
+    mad = np.median(np.abs(x - median)) * 1.4826
+    return (x - median) / max(mad, 1e-9)
+
+
+def _load(cache_path: str) -> dict | None:
+    """
+    读取特征缓存。文件损坏或版本不同时返回 None，之后会重新分析。
+    """
+    try:
+        with np.load(cache_path) as data:
+            if int(data["version"]) != FEATURES_VERSION:
+                return None
+            return {key: data[key] for key in ("times", "energy", "flux", "whistle")}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save(cache_path: str, features: dict) -> None:
+    """
+    保存特征缓存。先写入临时文件再改名，中途中断也不会留下不完整的文件。
+    """
+    from os import makedirs, replace
+    from os.path import dirname
+
+    makedirs(dirname(cache_path), exist_ok=True)
+    temp_path = cache_path + ".part"
+    with open(temp_path, "wb") as f:
+        np.savez_compressed(f, version=FEATURES_VERSION, **features)
+    replace(temp_path, cache_path)
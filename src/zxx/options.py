@@ -21,6 +21,8 @@ CAPTION_STYLE = {
     "color": "white",
     "position": "bottom",
     "relative": False,
+    "stroke_color": None,    # 描边颜色，None 表示不描边
+    "stroke_width": 0,    # 描边宽度（像素）
 }
 
 SCOREBOARD_STYLE = {
@@ -30,6 +32,47 @@ SCOREBOARD_STYLE = {
     "width_factor": 0.25,
 }
 
+# 导出模式，每种模式的参数会直接传入 moviepy 的 VideoClip.write_videofile() 方法
+## 视频质量通过 bitrate 参数调节，B 站推荐 4K 视频码率大于 20000kbps
+EXPORT_MODES = {
+    "preview": {"fps": 24, "preset": "ultrafast", "bitrate": "1000k"},    # 快速导出
+    "hd": {"codec": "libx264", "bitrate": "20000k"},    # 高清画质
+    "DJI Action 4": {"fps": 59.94, "codec": "libx264", "bitrate": "100000k"},    # 匹配大疆 Action 4 画质
+    "lossless": {"codec": "png", "bitrate": "20000k"},    # 无损画质
+}
+
+# 分段缓存设置，用于增量导出（Highlight.export(cache=True)）
+RENDER_CACHE = {
+    "path": None,    # None 表示使用用户目录下的 .cache/zxx
+    "max_size": 20 * 1024 ** 3,    # 缓存总大小上限（字节），超出时删除最久未使用的分段
+}
+
+# 代理文件设置，用于代理模式（Highlight.proxy()）
+PROXY = {
+    "path": None,    # None 表示使用用户目录下的 .cache/zxx/proxy
+    "height": 360,    # 代理文件的画面高度（像素）
+}
+
+# 解码帧缓存设置，用于在重叠的片段（例如进球和慢动作回放）之间共享解码出的画面
+FRAME_CACHE = {
+    "max_size": 1024 ** 3,    # 缓存的画面总大小上限（字节），0 表示不缓存
+    "backing": "ram",    # "ram"：保存在内存中；"memmap"：保存在临时文件中，通过内存映射读写
+    "path": None,    # memmap 模式下临时文件所在的文件夹，None 表示使用系统的临时文件夹
+}
+
+# 关键帧索引设置，用于读取器定位和智能导出（zxx.KeyframeIndex）
+KEYFRAME_INDEX = {
+    "path": None,    # 索引缓存文件夹，None 表示使用用户目录下的 .cache/zxx/index
+    "seek": True,    # 读取器是否根据关键帧索引决定往前读还是重新定位
+}
+
+# 画面增稳设置，用于特效 {"stabilize": True}（zxx.Stabilizer）
+STABILIZE = {
+    "path": None,    # 运动数据缓存文件夹，None 表示使用用户目录下的 .cache/zxx/stabilize
+    "margin": 1.0,    # 在片段前后各多分析几秒，使片段首尾的轨迹也能平滑
+    "height": 360,    # 运动分析时把画面缩小到的高度（像素）
+}
+
 
 # 以下是修改设置的函数
 
@@ -66,6 +109,8 @@ def SetCaptionStyle(**kwargs) -> None:
         color="white",
         position="bottom",
         relative=False,
+        stroke_color=None,
+        stroke_width=0,
 
     参数说明：
         font：需指定字体文件路径，必须是 OpenType 字体格式。
@@ -85,6 +130,7 @@ def SetCaptionStyle(**kwargs) -> None:
                 position=("center","top")    # 水平居中，竖直上对齐
                 position=(0.4,0.7), relative=True    # 相对位置，水平 40%，竖直 70%
                 position=lambda t: ('center', 50+t)    # 水平居中，竖直向上移动
+        stroke_color 和 stroke_width：字幕描边的颜色和宽度（像素），写法与 color 相同。stroke_color 为 None 时不描边。
     """
     global CAPTION_STYLE
     CAPTION_STYLE.update(kwargs)
@@ -115,6 +161,122 @@ def SetScoreBoardStyle(**kwargs) -> None:
     SCOREBOARD_STYLE.update(kwargs)
 
 
+def SetExportMode(mode: str, **kwargs) -> None:
+    """
+    新增或修改导出模式。
+
+    参数说明：
+        mode：导出模式的名称，例如 "hd"。如果是新名称，则新增一种导出模式。
+        其余参数会直接传入 moviepy 的 VideoClip.write_videofile() 方法，例如：
+            SetExportMode("bilibili", codec="libx264", bitrate="8000k", fps=30)
+    """
+    global EXPORT_MODES
+    EXPORT_MODES.setdefault(mode, {}).update(kwargs)
+
+
+def SetRenderCache(**kwargs) -> None:
+    """
+    修改分段缓存设置。可以传入任意的参数，无效的参数会被忽略。
+
+    可以传入的参数及其默认值：
+        path=None,
+        max_size=20 * 1024 ** 3,
+
+    参数说明：
+        path：缓存文件夹的绝对路径。None 表示使用用户目录下的 .cache/zxx 文件夹。
+        max_size：缓存总大小上限（字节）。每次导出结束后，如果超出上限，则删除最久未使用的分段。
+    """
+    global RENDER_CACHE
+    RENDER_CACHE.update(kwargs)
+
+
+def SetProxy(**kwargs) -> None:
+    """
+    修改代理文件设置。可以传入任意的参数，无效的参数会被忽略。
+
+    可以传入的参数及其默认值：
+        path=None,
+        height=360,
+
+    参数说明：
+        path：存放代理文件的文件夹绝对路径。None 表示使用用户目录下的 .cache/zxx/proxy 文件夹。
+        height：代理文件的画面高度（像素），宽度按比例缩放。
+    """
+    global PROXY
+    PROXY.update(kwargs)
+
+
+def SetFrameCache(**kwargs) -> None:
+    """
+    修改解码帧缓存设置。可以传入任意的参数，无效的参数会被忽略。修改后，已缓存的画面会被清空。
+
+    可以传入的参数及其默认值：
+        max_size=1024 ** 3,
+        backing="ram",
+        path=None,
+
+    参数说明：
+        max_size：缓存的画面总大小上限（字节），超出时删除最久未使用的画面。设为 0 表示不缓存。
+        backing：画面保存在哪里。"ram" 表示内存；"memmap" 表示系统临时文件夹中的临时文件（通过内存映射读写，
+            不占用进程的内存，由操作系统决定哪些部分留在内存中），适合缓存上限大于可用内存的情况。
+        path：memmap 模式下临时文件所在的文件夹。None 表示使用系统的临时文件夹。
+    """
+    from .FrameCache import reset_frame_cache
+
+    global FRAME_CACHE
+    FRAME_CACHE.update(kwargs)
+    reset_frame_cache()
+
+
+def SetKeyframeIndex(**kwargs) -> None:
+    """
+    修改关键帧索引设置。可以传入任意的参数，无效的参数会被忽略。
+
+    可以传入的参数及其默认值：
+        path=None,
+        seek=True,
+
+    参数说明：
+        path：存放关键帧索引的文件夹绝对路径。None 表示使用用户目录下的 .cache/zxx/index 文件夹。
+        seek：读取器跳转时是否根据关键帧索引决定往前读还是重新定位。为 False 时与 moviepy 的默认行为相同。
+    """
+    global KEYFRAME_INDEX
+    KEYFRAME_INDEX.update(kwargs)
+
+
+def SetStabilize(**kwargs) -> None:
+    """
+    修改画面增稳设置。可以传入任意的参数，无效的参数会被忽略。
+
+    可以传入的参数及其默认值：
+        path=None,
+        margin=1.0,
+        height=360,
+
+    参数说明：
+        path：存放运动数据的文件夹绝对路径。None 表示使用用户目录下的 .cache/zxx/stabilize 文件夹。
+        margin：在片段前后各多分析的秒数，使片段首尾的运动轨迹也能平滑。
+        height：运动分析时把画面缩小到的高度（像素）。越小分析越快，但估计的运动越粗糙。
+    """
+    global STABILIZE
+    STABILIZE.update(kwargs)
+
+
+def SetOptions(options: dict) -> None:
+    """
+    一次性恢复全部设置，参数是 GetOptions() 的返回值。
+    主要用于在导出用的子进程中，恢复某个片段被截取时的设置。
+    """
+    from copy import deepcopy
+
+    global PATH, MATCH_INFO, CAPTION_STYLE, SCOREBOARD_STYLE
+    options = deepcopy(options)
+    PATH = options["path"]
+    MATCH_INFO = options["match_info"]
+    CAPTION_STYLE = options["caption_style"]
+    SCOREBOARD_STYLE = options["scoreboard_style"]
+
+
 # 以下是读取设置的函数
 
 def GetPath() -> str:
@@ -160,6 +322,75 @@ def GetScoreBoardStyle(para: str = None) -> dict | str:
         return SCOREBOARD_STYLE[para]
 
 
+def GetRenderCache(para: str = None) -> dict | str | int | None:
+    """
+    返回分段缓存设置。
+    如果具体指定需要某个参数，则返回该参数的值；如果未指定，返回所有分段缓存设置。
+    """
+    if para == None:
+        return RENDER_CACHE
+    
+    else:
+        return RENDER_CACHE[para]
+
+
+def GetProxy(para: str = None) -> dict | str | int | None:
+    """
+    返回代理文件设置。
+    如果具体指定需要某个参数，则返回该参数的值；如果未指定，返回所有代理文件设置。
+    """
+    if para == None:
+        return PROXY
+    
+    else:
+        return PROXY[para]
+
+
+def GetFrameCache(para: str = None) -> dict | str | int | None:
+    """
+    返回解码帧缓存设置。
+    如果具体指定需要某个参数，则返回该参数的值；如果未指定，返回所有解码帧缓存设置。
+    """
+    if para == None:
+        return FRAME_CACHE
+
+    else:
+        return FRAME_CACHE[para]
+
+
+def GetExportMode(mode: str) -> dict:
+    """
+    返回某种导出模式的参数（副本）。如果没有这种导出模式，则抛出异常。
+    """
+    if mode not in EXPORT_MODES:
+        raise Exception("导出失败，没有导出模式 \"%s\"，可选的模式有：%s" % (mode, "、".join(EXPORT_MODES)))
+    return dict(EXPORT_MODES[mode])
+
+
+def GetOptions() -> dict:
+    """
+    返回当前全部设置的快照（深拷贝），之后修改设置不会影响这份快照。
+    """
+    from copy import deepcopy
+
+    return deepcopy({
+        "path": PATH,
+        "match_info": MATCH_INFO,
+        "caption_style": CAPTION_STYLE,
+        "scoreboard_style": SCOREBOARD_STYLE,
+    })
+
+
+def GetStyle() -> "Style":
+    """
+    返回由当前设置（工作路径、比赛信息、字幕样式、比分牌样式）组成的默认样式，类型为 zxx.Style。
+    样式不可修改，之后再修改设置不会影响已经返回的样式。
+    """
+    from .Style import Style
+
+    return Style(PATH, MATCH_INFO, CAPTION_STYLE, SCOREBOARD_STYLE)
+
+
 def AllFonts(print_list: bool = True) -> None:
     """
     （已弃用）返回所有可用的字体列表。
@@ -168,3 +399,27 @@ def AllFonts(print_list: bool = True) -> None:
 
     print("AllFonts() 方法已被弃用，因为 zxx 1.2.0 及以后版本依赖的 moviepy 2.x 可直接指定字幕字体路径。")
     return None
+
+
+def GetKeyframeIndex(para: str = None) -> dict | str | bool | None:
+    """
+    返回关键帧索引设置。
+    如果具体指定需要某个参数，则返回该参数的值；如果未指定，返回所有关键帧索引设置。
+    """
+    if para == None:
+        return KEYFRAME_INDEX
+    
+    else:
+        return KEYFRAME_INDEX[para]
+
+
+def GetStabilize(para: str = None) -> dict | str | float | int | None:
+    """
+    返回画面增稳设置。
+    如果具体指定需要某个参数，则返回该参数的值；如果未指定，返回所有画面增稳设置。
+    """
+    if para == None:
+        return STABILIZE
+    
+    else:
+        return STABILIZE[para]
@@ -0,0 +1,191 @@
+"""
+zxx.probe
+媒体信息
+    不解码画面，只通过 ffmpeg 读取媒体文件的元数据、关键帧位置和响度。
+"""
+
+
+from functools import lru_cache
+
+
+def probe(path: str) -> dict:
+    """
+    读取媒体文件的元数据，返回值是 dict，键名与 moviepy 的 ffmpeg_parse_infos() 相同，
+    另外增加了 video_pix_fmt（画面的像素格式，例如 "yuv420p"）。
+    结果按（路径、修改时间、文件大小）缓存。
+
+    参数说明：
+        path：媒体文件路径。
+    """
+    from os import stat
+    from os.path import abspath
+
+    path = abspath(path)
+    info = stat(path)
+    return dict(_probe(path, info.st_mtime, info.st_size))
+
+
+def probe_all(paths: list, workers: int = 8) -> dict:
+    """
+    用多个线程同时读取多个媒体文件的元数据（每个文件启动一个 ffmpeg 进程），结果同样会被缓存。
+    返回值是 dict，{路径: probe() 的返回值}；文件不存在或无法读取时，对应的值是异常对象，而不是抛出异常。
+
+    参数说明：
+        paths：媒体文件路径组成的列表，重复的路径只读取一次。
+        workers：同时运行的 ffmpeg 进程数上限，默认为 8。
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def safe_probe(path):
+        try:
+            return probe(path)
+        except Exception as error:
+            return error
+
+    paths = list(dict.fromkeys(paths))
+    if len(paths) == 0:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as executor:
+        return dict(zip(paths, executor.map(safe_probe, paths)))
+
+
+def keyframes(path: str) -> list:
+    """
+    返回视频文件中所有关键帧的时刻（秒，相对于视频开头）组成的列表，按时间顺序排列。
+    读取自关键帧索引（zxx.KeyframeIndex），不解码画面，结果保存在磁盘上的索引缓存中。
+
+    参数说明：
+        path：视频文件路径。
+    """
+    from .KeyframeIndex import keyframe_index
+
+    return keyframe_index(path).keyframes()
+
+
+def display_size(path: str) -> tuple:
+    """
+    返回视频画面的显示尺寸 (宽, 高)，即 moviepy 解码得到的画面尺寸：画面旋转 90° 或 270° 时宽高互换。
+
+    参数说明：
+        path：视频文件路径。
+    """
+    infos = probe(path)
+    width, height = infos.get("video_size", (1, 1))
+    if abs(infos.get("video_rotation", 0)) in (90, 270):
+        width, height = height, width
+    return (width, height)
+
+
+def loudness(path: str, begin: float = 0, end: float | None = None) -> dict:
+    """
+    测量媒体文件中一段声音的响度，返回值是 dict：
+        loudness：响度（dBFS），即按 400 毫秒分块、去掉静音块（低于 -70 dBFS 及低于平均响度 10 dB 的块）后的平均能量，
+            与 EBU R128 的门限算法相同，但不做 K 加权。整段都是静音时为 None；
+        peak：采样峰值（dBFS），整段都是静音时为 None；
+        duration：实际测量的时长（秒）。
+    声音由 ffmpeg 解码后按块流式读取，只保留每块的能量，内存占用与时长无关，长达数小时的音乐也可以测量。
+    结果按（路径、修改时间、文件大小、时间范围）缓存。
+
+    参数说明：
+        path：媒体文件路径。
+        begin：开始时刻（秒），默认为 0。
+        end：结束时刻（秒），默认为 None 即文件末尾。
+    """
+    from os import stat
+    from os.path import abspath
+
+    if end != None and end <= begin:
+        raise Exception("测量响度失败：开始时刻（%s）不早于结束时刻（%s）" % (begin, end))
+    path = abspath(path)
+    info = stat(path)
+    return dict(_loudness(path, info.st_mtime, info.st_size, float(begin), None if end == None else float(end)))
+
+
+def run_ffmpeg(args: list, error: str = "ffmpeg 运行失败") -> str:
+    """
+    运行 ffmpeg（使用 moviepy 配置的可执行文件），返回其标准错误输出。运行失败时抛出异常。
+
+    参数说明：
+        args：ffmpeg 的命令行参数（不含可执行文件本身）。
+        error：运行失败时异常信息的开头。
+    """
+    import subprocess as sp
+    from moviepy.config import FFMPEG_BINARY
+
+    proc = sp.run([FFMPEG_BINARY, "-hide_banner", "-nostdin"] + list(args),
+                  stdout=sp.DEVNULL, stderr=sp.PIPE)
+    stderr = proc.stderr.decode("utf8", errors="ignore")
+    if proc.returncode != 0:
+        raise Exception("%s：%s" % (error, stderr.strip()[-1000:]))
+    return stderr
+
+
+@lru_cache(maxsize=256)
+def _probe(path: str, mtime: float, size: int) -> tuple:
+    """
+    probe() 的缓存实现。mtime 和 size 只用于在文件被修改后使缓存失效。
+    """
+    import re
+    import subprocess as sp
+    from moviepy.config import FFMPEG_BINARY
+    from moviepy.video.io.ffmpeg_reader import FFmpegInfosParser
+
+    # ffmpeg -i 不指定输出文件时总会以错误退出，这里只需要它输出的文件信息
+    proc = sp.run([FFMPEG_BINARY, "-hide_banner", "-nostdin", "-i", path],
+                  stdout=sp.DEVNULL, stderr=sp.PIPE)
+    stderr = proc.stderr.decode("utf8", errors="ignore")
+    if "No such file or directory" in stderr or "Invalid data found" in stderr:
+        raise Exception("无法读取媒体文件 %s" % path)
+    infos = FFmpegInfosParser(stderr, path).parse()
+    match = re.search(r"Stream #\d+:\d+.*?: Video: [^,]*, (\w+)", stderr)
+    infos["video_pix_fmt"] = match.group(1) if match else None
+    return tuple(infos.items())
+
+
+@lru_cache(maxsize=256)
+def _loudness(path: str, mtime: float, size: int, begin: float, end: float | None) -> tuple:
+    """
+    loudness() 的缓存实现。mtime 和 size 只用于在文件被修改后使缓存失效。
+    """
+    import subprocess as sp
+    import numpy as np
+    from moviepy.config import FFMPEG_BINARY
+
+    rate = 44100
+    block = int(rate * 0.4)    # 每块 400 毫秒
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-nostdin", "-v", "error", "-ss", "%.6f" % begin]
+    if end != None:
+        cmd += ["-t", "%.6f" % (end - begin)]
+    cmd += ["-i", path, "-vn", "-ac", "2", "-ar", str(rate), "-f", "f32le", "-"]
+    proc = sp.Popen(cmd, stdout=sp.PIPE, stderr=sp.PIPE)
+    energies, peak, samples = [], 0.0, 0
+    try:
+        while True:
+            data = proc.stdout.read(block * 2 * 4)
+            if len(data) < 8:
+                break
+            sound = np.frombuffer(data[:len(data) // 8 * 8], dtype=np.float32).reshape(-1, 2)
+            energies.append(float(np.mean(np.square(sound, dtype=np.float64))))
+            peak = max(peak, float(np.abs(sound).max()))
+            samples += len(sound)
+        stderr = proc.stderr.read().decode("utf8", errors="ignore")
+    finally:
+        proc.stdout.close()
+        proc.stderr.close()
+        proc.wait()
+    if proc.returncode != 0:
+        raise Exception("测量响度失败：%s" % stderr.strip()[-1000:])
+    if samples == 0:
+        raise Exception("测量响度失败：%s 在所选时间范围内没有声音" % path)
+
+    energies = np.array(energies)
+    # 两级门限：先去掉绝对静音的块，再去掉比剩余部分的平均响度低 10 dB 以上的块
+    gated = energies[energies > 10 ** (-70 / 10)]
+    if len(gated) > 0:
+        gated = gated[gated > np.mean(gated) * 10 ** (-10 / 10)]
+    level = 10 * np.log10(np.mean(gated)) if len(gated) > 0 else None
+    return (
+        ("loudness", None if level == None else float(level)),
+        ("peak", float(20 * np.log10(peak)) if peak > 0 else None),
+        ("duration", samples / rate),
+    )
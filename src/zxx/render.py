@@ -0,0 +1,964 @@
+"""
+zxx.render
+分段导出和流水线导出
+    集锦分段导出的相关函数：未经处理的片段直接复制码流，其余部分（可以由多个进程同时）重新编码，
+    最后用 ffmpeg 的 concat 分离器无损拼接。
+    以及流水线导出：解码、合成和编码分别在各自的线程中进行，下一个片段的解码在当前片段编码时就已开始。
+"""
+
+
+from .Timeline import Timeline
+
+
+def output_codec(filename: str, params: dict) -> str:
+    """
+    返回导出时实际使用的视频编码器。导出模式未指定编码器时，与 moviepy 一样根据文件后缀名推断。
+
+    参数说明：
+        filename：导出的视频文件名。
+        params：导出模式的参数，即 zxx.options.GetExportMode() 的返回值。
+    """
+    from os.path import splitext
+    from moviepy.tools import extensions_dict
+
+    if params.get("codec") != None:
+        return params["codec"]
+    ext = splitext(filename)[1][1:].lower()
+    try:
+        return extensions_dict[ext]["codec"][0]
+    except KeyError:
+        raise Exception("无法根据后缀名 .%s 推断视频编码器，请在导出模式中指定 codec" % ext)
+
+
+def can_copy(take: "Take", size: tuple, fps: float) -> bool:
+    """
+    判断一个片段能否直接复制源文件的码流，而不必解码再编码。
+    要求片段未经任何后期处理，且源文件是 H.264 / yuv420p 编码，画面尺寸、帧率与导出设置一致，画面没有旋转。
+
+    参数说明：
+        take：片段描述，类型为 zxx.Take。
+        size：导出的画面尺寸 (宽, 高)。
+        fps：导出的帧率。
+    """
+    from .probe import probe
+
+    if take == None or not take.untouched():
+        return False
+    infos = probe(take.path)
+    return (
+        infos.get("video_codec_name") == "h264"
+        and infos.get("video_pix_fmt") == "yuv420p"
+        and list(infos.get("video_size", [])) == list(size)
+        and abs(infos.get("video_fps", 0) - fps) < 0.01
+        and infos.get("video_rotation", 0) == 0
+    )
+
+
+def frame_count(duration: float, fps: float) -> int:
+    """
+    返回导出的总帧数。与 moviepy 的 write_videofile() 相同，按 int(时长 × 帧率) 计算，第 i 帧是时间线上 i / fps 时刻的画面。
+    分段导出的各段都从这个输出帧网格上取帧，因此拼接后的帧数和每一帧的画面都与普通导出相同。
+
+    参数说明：
+        duration：时间线的总时长（秒）。
+        fps：导出的帧率。
+    """
+    return int(duration * fps)
+
+
+def first_frame(t: float, fps: float) -> int:
+    """
+    返回输出帧网格中第一个不早于 t 时刻的帧序号，即满足 i / fps >= t 的最小的 i。
+    比较方式与时间线定位片段（zxx.Timeline.locate()）相同，因此片段边界两侧的帧归属与普通导出一致。
+
+    参数说明：
+        t：时间线上的时刻（秒）。
+        fps：导出的帧率。
+    """
+    from math import ceil
+
+    i = max(ceil(t * fps) - 2, 0)
+    while i / fps < t:
+        i += 1
+    return i
+
+
+def take_frames(timeline: Timeline, fps: float) -> list:
+    """
+    返回时间线上各片段在输出帧网格中占据的帧序号范围 [first, last) 组成的列表，顺序与 timeline.clips() 相同。
+    相邻片段的范围首尾相接，合起来正好是 [0, frame_count())。比一帧还短的片段可能不占任何帧（first == last）。
+
+    参数说明：
+        timeline：集锦的时间线，类型为 zxx.Timeline。
+        fps：导出的帧率。
+    """
+    n = frame_count(timeline.duration(), fps)
+    edges = [min(first_frame(start, fps), n) for start in timeline.starts()] + [n]
+    return [(edges[k], max(edges[k + 1], edges[k])) for k in range(len(edges) - 1)]
+
+
+def plan_parts(timeline: Timeline, fps: float, copy: bool = True) -> list:
+    """
+    把输出帧网格划分成若干个连续的部分，返回值是列表，每一项是以下两种之一：
+        ("render", 开始帧, 结束帧)：需要重新编码的帧序号范围 [开始帧, 结束帧)；
+        ("copy", 源文件路径, 关键帧时刻, 开始帧, 结束帧)：从源文件的这个关键帧起直接复制 结束帧 - 开始帧 帧的码流，
+            复制的最后一帧之后正好是下一个关键帧。
+    可以复制码流的片段，只复制从第一个关键帧到最后一个关键帧之间的完整画面组（GOP），
+    第一个关键帧之前和最后一个关键帧之后的几帧仍需重新编码，这样复制的部分首尾都不会出现残缺的画面组。
+    复制的范围按输出帧和源文件帧一一对应计算，与普通导出时每一帧读取的源文件画面相同。相邻的需要重新编码的部分会被合并。
+
+    参数说明：
+        timeline：集锦的时间线，类型为 zxx.Timeline。
+        fps：导出的帧率。
+        copy：是否允许直接复制码流。为 False 时，整条时间线作为一个需要重新编码的部分。
+    """
+    parts = []
+
+    def add_render(a, b):
+        if b <= a:
+            return
+        if len(parts) > 0 and parts[-1][0] == "render" and parts[-1][2] == a:
+            parts[-1] = ("render", parts[-1][1], b)
+        else:
+            parts.append(("render", a, b))
+
+    size = timeline.size()
+    for (first, last), take, start in zip(take_frames(timeline, fps), timeline.takes(), timeline.starts()):
+        span = None
+        if copy and last > first and can_copy(take, size, fps):
+            span = _copy_span(take, start, first, last, fps)
+        if span == None:    # 片段内没有完整的画面组，只能重新编码
+            add_render(first, last)
+            continue
+        keyframe, a, b = span
+        add_render(first, a)
+        parts.append(("copy", take.path, keyframe, a, b))
+        add_render(b, last)
+    return parts
+
+
+def _copy_span(take: "Take", start: float, first: int, last: int, fps: float) -> tuple | None:
+    """
+    计算一个未经处理的片段中可以直接复制码流的输出帧范围，返回 (关键帧时刻, 开始帧, 结束帧)，没有完整的画面组时返回 None。
+    普通导出时，输出的第 i 帧读取的是源文件中第 int(源帧率 × (take.begin + i / fps - start) + 0.00001) 帧
+    （与 moviepy 的读取器相同），这里按同样的公式把关键帧换算成输出帧，并检查首尾两帧确实一一对应。
+    """
+    from .KeyframeIndex import keyframe_index
+    from .probe import probe
+
+    source_fps = probe(take.path)["video_fps"]
+
+    def source_frame(i):
+        return int(source_fps * (take.begin + (i / fps - start)) + 0.00001)
+
+    s0, s1 = source_frame(first), source_frame(last - 1) + 1    # 片段读取的源文件帧范围 [s0, s1)
+    copy_range = keyframe_index(take.path).copy_range(s0 / source_fps, s1 / source_fps, 0.5 / source_fps)
+    if copy_range == None:
+        return None
+    a, b = round(copy_range[0] * source_fps), round(copy_range[1] * source_fps)
+    if a < s0 or b > s1 or a >= b:
+        return None
+    i0, i1 = first + a - s0, first + b - s0
+    if source_frame(i0) != a or source_frame(i1 - 1) != b - 1:
+        return None
+    return copy_range[0], i0, i1
+
+
+def render_part(frame_function, first: int, last: int, size: tuple, path: str, params: dict, fps: float,
+                codec: str, threads: int | None = None) -> None:
+    """
+    把输出帧网格中的第 first 至 last - 1 帧（不含声音）重新编码为中间文件。
+    第 i 帧是 frame_function(i / fps) 的画面，与普通导出时 moviepy 取帧的时刻完全相同，因此各段拼接后与普通导出逐帧对应。
+
+    参数说明：
+        frame_function：返回时间线上某一时刻画面的函数，例如 timeline.build().get_frame。
+        first：开始帧序号。
+        last：结束帧序号（不包含在内）。
+        size：画面尺寸 (宽, 高)。
+        path：中间文件路径。
+        params：导出模式的参数。
+        fps：导出的帧率。
+        codec：视频编码器。
+        threads：编码时的线程数。
+    """
+    params = dict(params, codec=codec)
+    if codec == "libx264":
+        params["pixel_format"] = "yuv420p"
+        params["ffmpeg_params"] = list(params.get("ffmpeg_params") or []) + ["-video_track_timescale", "90000"]
+    with _video_writer(path, size, fps, params, threads, None) as writer:
+        for i in range(first, last):
+            frame = frame_function(i / fps)
+            if frame.dtype != "uint8":
+                frame = frame.astype("uint8")
+            writer.write_frame(frame)
+
+
+def copy_part(source: str, keyframe: float, n_frames: int, path: str) -> None:
+    """
+    从源文件中直接复制一段 H.264 码流（不含声音）到 MP4 中间文件，不解码、不编码。
+
+    参数说明：
+        source：源文件路径。
+        keyframe：开始时刻，必须是关键帧。
+        n_frames：复制的帧数，应正好是若干个完整的画面组。
+        path：中间文件路径。
+    """
+    from .probe import run_ffmpeg
+
+    run_ffmpeg([
+        # 稍微往后一点定位，保证复制码流时正好从这个关键帧开始；保留原时间戳（-copyts），
+        # 否则定位点之前的关键帧会得到负的时间戳并被标记为丢弃，画面整体提前一帧
+        "-ss", "%.6f" % (keyframe + 0.0005), "-copyts", "-start_at_zero", "-i", source, "-frames:v", str(n_frames),
+        "-map", "0:v:0", "-c", "copy", "-video_track_timescale", "90000", "-y", path,
+    ], error = "复制码流失败")
+
+
+def concat_parts(paths: list, output_path: str, audio_path: str | None = None, list_dir: str | None = None) -> None:
+    """
+    用 ffmpeg 的 concat 分离器把若干中间文件无损拼接成最终的视频文件，并加入声音。
+
+    参数说明：
+        paths：中间文件路径组成的列表，按时间顺序排列。
+        output_path：导出的视频文件路径。
+        audio_path：声音文件路径，None 表示导出的视频没有声音。
+        list_dir：存放拼接列表文件的文件夹。如果未指定，则使用第一个中间文件所在的文件夹。
+    """
+    from os.path import dirname, join
+    from .probe import run_ffmpeg
+
+    list_path = join(list_dir or dirname(paths[0]), "concat.txt")
+    with open(list_path, "w", encoding="utf8") as f:
+        for path in paths:
+            f.write("file '%s'\n" % path.replace("'", "'\\''"))
+    args = ["-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path != None:
+        args += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+    run_ffmpeg(args + ["-c", "copy", "-y", output_path], error = "拼接视频失败")
+
+
+def align_delays(paths: list, folder: str) -> list:
+    """
+    统一各中间文件的解码延迟，返回对齐后的中间文件路径组成的列表（顺序不变，不需要改动的文件原样返回）。
+    含 B 帧的 H.264 码流中，第一个数据包的解码时刻（dts）比显示时刻（pts）早若干帧，这个延迟由编码器决定，
+    直接复制的源文件码流与重新编码的部分往往不同。concat 分离器按显示时刻首尾相接，延迟不同时拼接处的 dts 会倒退。
+    这里把延迟较小的文件的 dts 整体提前（只改时间戳，不改码流），使所有文件的延迟都等于其中最大的延迟。
+
+    参数说明：
+        paths：中间文件（MP4，时间基为 1/90000）路径组成的列表。
+        folder：存放对齐后的文件的文件夹。
+    """
+    from os.path import join
+    from .probe import run_ffmpeg
+
+    delays = [_decode_delay(path) for path in paths]
+    aligned = []
+    for i, (path, delay) in enumerate(zip(paths, delays)):
+        if delay == max(delays):
+            aligned.append(path)
+            continue
+        aligned_path = join(folder, "aligned%05d.mp4" % i)
+        run_ffmpeg([
+            "-i", path, "-map", "0:v:0", "-c", "copy", "-bsf:v", "setts=dts=DTS-%d" % (max(delays) - delay),
+            "-video_track_timescale", "90000", "-y", aligned_path,
+        ], error = "对齐时间戳失败")
+        aligned.append(aligned_path)
+    return aligned
+
+
+def _decode_delay(path: str) -> int:
+    """
+    返回中间文件第一个数据包的显示时刻与解码时刻之差（单位是 1/90000 秒），即解码延迟。
+    """
+    import subprocess as sp
+    from moviepy.config import FFMPEG_BINARY
+
+    proc = sp.run([FFMPEG_BINARY, "-hide_banner", "-nostdin", "-v", "error", "-i", path, "-map", "0:v:0",
+                   "-c", "copy", "-frames:v", "1", "-f", "framecrc", "-"], stdout=sp.PIPE, stderr=sp.PIPE)
+    if proc.returncode != 0:
+        raise Exception("读取时间戳失败：%s" % proc.stderr.decode("utf8", errors="ignore").strip()[-1000:])
+    # 每行是：流序号, dts, pts, 时长, 大小, 校验和, ...，时间戳的单位是时间基（1/90000 秒）
+    for line in proc.stdout.decode("utf8", errors="ignore").splitlines():
+        if not line.startswith("#") and line.strip() != "":
+            fields = [field.strip() for field in line.split(",")]
+            return int(fields[2]) - int(fields[1])
+    raise Exception("读取时间戳失败：%s 中没有视频数据" % path)
+
+
+def split_part(timeline: Timeline, first: int, last: int, fps: float, chunk_size: float,
+               merge: bool = True) -> list:
+    """
+    把输出帧网格中需要重新编码的一段 [first, last) 在片段边界处切分成若干块，以便分给多个进程同时编码。
+    每块的时长尽量不超过 chunk_size；单个片段比 chunk_size 还长时，把它均分成几块。切分点都是输出帧序号，
+    各块首尾相接，合起来正好是 [first, last)，因此拼接后的帧数和每一帧的画面都与普通导出相同。
+    返回值是列表，每一项是 (开始帧, 结束帧, 片段列表)，片段列表的每一项是 (片段描述, 片段在时间线上的起始时刻)，
+    即这一块用到的各个片段。时间线上不是由 zxx.Highlight.take() 生成的片段，片段描述为 None。
+
+    参数说明：
+        timeline：集锦的时间线，类型为 zxx.Timeline。
+        first：开始帧序号。
+        last：结束帧序号（不包含在内）。
+        fps：导出的帧率。
+        chunk_size：每块的目标时长（秒）。
+        merge：是否把相邻的短片段合并成一块。为 False 时每个片段至少单独成一块，且片段内的切分点只取决于片段本身，
+            这样某个片段的切分方式不会受前面片段时长的影响（用于分段缓存）。
+    """
+    from math import ceil
+
+    max_frames = chunk_size * fps
+    chunks = []
+    pieces, chunk_first, chunk_last = [], first, first
+    ranges = take_frames(timeline, fps)
+    for k, ((f0, f1), take, start) in enumerate(zip(ranges, timeline.takes(), timeline.starts())):
+        lo, hi = max(first, f0), min(last, f1)
+        if hi <= lo:
+            continue
+        n = max(ceil((f1 - f0) / max_frames - 1e-6), 1)
+        # 按整个片段均分，再截取与 [first, last) 相交的部分，切分点不受 first 的影响
+        cuts = [f0 + (f1 - f0) * j // n for j in range(1, n)]
+        edges = [lo] + [cut for cut in cuts if lo < cut < hi] + [hi]
+        for a, b in zip(edges, edges[1:]):
+            if len(pieces) > 0 and (not merge or b - chunk_first > max_frames + 0.5):
+                chunks.append((chunk_first, chunk_last, [piece for _, piece in pieces]))
+                pieces = []
+            if len(pieces) == 0:
+                chunk_first = a
+            if len(pieces) == 0 or pieces[-1][0] != k:
+                pieces.append((k, (take, start)))
+            chunk_last = b
+    if len(pieces) > 0:
+        chunks.append((chunk_first, chunk_last, [piece for _, piece in pieces]))
+    return chunks
+
+
+def segmented_render(timeline: Timeline, output_path: str, params: dict, copy: bool = True,
+                     workers: int = 1, chunk_size: float = 20, threads: int | None = None,
+                     temp_dir: str | None = None, cache: "RenderCache" = None) -> None:
+    """
+    分段导出：把时间线分成若干段，分别编码成中间文件，声音整体单独编码，最后用 concat 分离器无损拼接。
+
+    copy 为 True 时（智能导出），未经任何后期处理、且编码参数与导出设置一致的片段，从第一个关键帧起直接复制码流，
+    只有首尾不足一个画面组的几帧和经过处理的片段需要解码再编码。片尾等长段未剪辑的素材因此可以按磁盘速度导出。
+
+    workers 大于 1 时，需要重新编码的部分在片段边界处切成若干块，交给进程池同时解码、处理和编码。
+    每个子进程根据片段描述（zxx.Take）重新打开源文件、生成片段，因此导出速度可以随 CPU 核数近似线性增长。
+    无法交给子进程的块（例如不是由 zxx.Highlight.take() 生成的片段）仍在主进程中编码。
+
+    指定 cache 时（增量导出），每个片段单独编码成一块，并按其内容的哈希值保存在分段缓存中。
+    再次导出时，内容没有改动的片段直接使用缓存，只有改动过的片段需要重新编码。
+
+    参数说明：
+        timeline：集锦的时间线，类型为 zxx.Timeline。
+        output_path：导出的视频文件路径。
+        params：导出模式的参数，即 zxx.options.GetExportMode() 的返回值。
+        copy：是否允许直接复制码流。只对使用 libx264 编码的导出模式有效。
+        workers：同时编码的进程数，默认为 1 即只在主进程中编码。
+        chunk_size：每块的目标时长（秒），默认为 20。
+        threads：每个进程编码时的线程数。
+        temp_dir：存放中间文件的文件夹。如果未指定，则使用系统的临时文件夹。
+        cache：分段缓存，类型为 zxx.RenderCache。None 表示不使用缓存。
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from os.path import join
+    from shutil import rmtree
+    from tempfile import mkdtemp
+    from .ReaderPool import reset_shared_pool
+
+    if workers < 1:
+        raise Exception("进程数至少为 1！")
+    if chunk_size <= 0:
+        raise Exception("每块的时长必须大于 0！")
+    built = timeline.build()
+    fps = params.get("fps") or built.fps
+    size = timeline.size()
+    codec = output_codec(output_path, params)
+    ext = ".mp4" if codec == "libx264" else ".mkv"
+    parts = plan_parts(timeline, fps, copy = copy and codec == "libx264")
+    if workers > 1 or cache != None:
+        # 需要重新编码的部分切成小块，并判断每块能否交给子进程；使用缓存时每个片段单独成块
+        jobs = []
+        for part in parts:
+            if part[0] == "copy":
+                jobs.append(part)
+                continue
+            for a, b, pieces in split_part(timeline, part[1], part[2], fps, chunk_size, merge = cache == None):
+                jobs.append(("chunk", a, b, pieces) if _portable(pieces) else ("render", a, b))
+    else:
+        jobs = parts
+    keys = [None] * len(jobs)
+    cached = [None] * len(jobs)
+    if cache != None:
+        for i, job in enumerate(jobs):
+            if job[0] == "chunk":
+                keys[i] = _chunk_key(cache, job[3], job[1], job[2], size, params, fps, codec)
+                cached[i] = cache.get(keys[i], ext)
+    n_copy = len([job for job in jobs if job[0] == "copy"])
+    n_cached = len([path for path in cached if path != None])
+    print("分段导出：共 %d 段，其中 %d 段直接复制码流，%d 段使用缓存，使用 %d 个进程" % (len(jobs), n_copy, n_cached, workers))
+
+    workdir = mkdtemp(prefix="zxx_", dir=temp_dir)
+    executor = None
+    try:
+        paths = [join(workdir, "part%05d%s" % (i, ext)) for i in range(len(jobs))]
+        futures = []
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=reset_shared_pool)
+            for job, path, hit in zip(jobs, paths, cached):
+                if job[0] == "copy":
+                    futures.append(executor.submit(copy_part, job[1], job[2], job[4] - job[3], path))
+                elif job[0] == "chunk" and hit == None:
+                    futures.append(executor.submit(_render_chunk, job[3], job[1], job[2], size, path, params, fps,
+                                                   codec, threads))
+        # 子进程编码画面的同时，主进程编码声音和剩下的部分
+        audio_path = None
+        if built.audio != None:
+            audio_codec = params.get("audio_codec") or "libmp3lame"
+            audio_path = join(workdir, "audio" + (".mp3" if audio_codec == "libmp3lame" else ".m4a"))
+            built.audio.write_audiofile(
+                audio_path, fps=44100, nbytes=4, codec=audio_codec,
+                bitrate=params.get("audio_bitrate"), logger=None,
+            )
+        for job, path, hit in zip(jobs, paths, cached):
+            if job[0] == "render":
+                render_part(built.get_frame, job[1], job[2], size, path, params, fps, codec, threads)
+            elif executor == None and job[0] == "copy":
+                copy_part(job[1], job[2], job[4] - job[3], path)
+            elif executor == None and job[0] == "chunk" and hit == None:
+                _render_chunk(job[3], job[1], job[2], size, path, params, fps, codec, threads)
+        for future in futures:
+            future.result()
+        for i in range(len(jobs)):
+            if cached[i] != None:
+                paths[i] = cached[i]
+            elif keys[i] != None:
+                paths[i] = cache.put(keys[i], paths[i])
+        if n_copy > 0:    # 只有直接复制的码流与重新编码的部分解码延迟可能不同
+            paths = align_delays(paths, workdir)
+        concat_parts(paths, output_path, audio_path, list_dir=workdir)
+    finally:
+        if executor != None:
+            executor.shutdown(cancel_futures=True)
+        rmtree(workdir, ignore_errors=True)
+    if cache != None:
+        cache.evict()
+
+
+def _chunk_key(cache: "RenderCache", pieces: list, first: int, last: int, size: tuple, params: dict, fps: float,
+               codec: str) -> str:
+    """
+    计算输出帧网格中第 first 至 last - 1 帧这一块的缓存键：包括每个片段的源文件（路径、修改时间、大小）、时间范围、
+    这一块的第一帧在片段内的时刻和帧数（片段在时间线上整体移动若干帧时不变，移动不足一帧时会变）、特效、字幕、比分、
+    截取时的样式，以及画面尺寸、导出模式的参数、帧率和编码器。
+    """
+    from os import stat
+
+    items = []
+    for take, start in pieces:
+        info = stat(take.path)
+        items.append({
+            "source": [take.path, info.st_mtime, info.st_size],
+            "range": [take.begin, take.end],
+            "frames": [round(first / fps - start, 6), last - first],
+            "effects": take.effects,
+            "caption": take.caption,
+            "score": take.score,
+            "style": take.style,
+            "proxy": take.proxy_height,
+        })
+    return cache.key(1, items, list(size), params, fps, codec)
+
+
+def _portable(pieces: list) -> bool:
+    """
+    判断一块时间线能否交给子进程编码：每个片段都要有片段描述，且片段描述可以被 pickle 序列化
+    （例如字幕位置设置成了 lambda 函数时就不行）。
+    """
+    from pickle import dumps, PicklingError
+
+    if any(take == None for take, _ in pieces):
+        return False
+    try:
+        dumps(pieces)
+    except (PicklingError, TypeError, AttributeError):
+        return False
+    return True
+
+
+def _render_chunk(pieces: list, first: int, last: int, size: tuple, path: str, params: dict, fps: float,
+                  codec: str, threads: int | None = None) -> str:
+    """
+    在子进程中编码输出帧网格中的第 first 至 last - 1 帧：根据片段描述重新生成这一块用到的各个片段，统一画面尺寸，
+    再与时间线一样按起始时刻定位每一帧所在的片段，编码为中间文件。返回中间文件路径。
+    """
+    from .Timeline import _locate
+    from .tools import fit_size
+
+    clips = [fit_size(take.clip(size=size), size) for take, _ in pieces]
+    starts = [start for _, start in pieces]
+
+    def frame_function(t):
+        i, local_t = _locate(starts, t)
+        return clips[i].get_frame(local_t)
+
+    render_part(frame_function, first, last, size, path, params, fps, codec, threads)
+    return path
+
+
+def pipelined_render(timeline: Timeline, output_path: str, params: dict, threads: int | None = None,
+                     prefetch: int = 1, queue_size: int = 8, temp_dir: str | None = None) -> dict:
+    """
+    流水线导出：把导出分成解码、合成（特效、字幕、比分牌、拼接）和编码三级，分别在各自的线程中进行，
+    相邻两级之间用容量有限的队列传递画面，因此各级可以同时工作，占用的内存也有上限。
+    每个片段（由 zxx.Highlight.take() 生成）在单独的解码线程中打开源文件、从片段开头按顺序解码；
+    某个片段开始合成时，其后 prefetch 个片段的解码线程就已启动，打开源文件和定位的耗时被当前片段的编码掩盖。
+    导出的视频与 write_videofile() 导出的逐帧相同。返回值是各级的统计信息：
+        frames：导出的帧数；
+        seconds：画面部分的用时（秒），不含事先编码声音的时间；
+        decode / composite / encode：解码、合成、编码三级的利用率（忙碌时间占 seconds 的比例）。
+            解码级是所有解码线程之和，因此可能超过 1；不是由 take() 生成的片段在合成线程中解码，计入合成级。
+
+    参数说明：
+        timeline：集锦的时间线，类型为 zxx.Timeline。
+        output_path：导出的视频文件路径。
+        params：导出模式的参数，即 zxx.options.GetExportMode() 的返回值。
+        threads：编码时的线程数。
+        prefetch：提前启动解码的片段数，默认为 1。
+        queue_size：每个队列最多存放的画面数，默认为 8。
+        temp_dir：存放声音临时文件的文件夹。如果未指定，则使用系统的临时文件夹。
+    """
+    from queue import Queue
+    from shutil import rmtree
+    from tempfile import mkdtemp
+    from threading import Event, Thread
+    from time import perf_counter
+    from .tools import fit_size
+
+    if prefetch < 0:
+        raise Exception("提前解码的片段数不能小于 0！")
+    if queue_size < 1:
+        raise Exception("队列容量至少为 1！")
+    size = timeline.size()
+    fps = params.get("fps") or timeline.build().fps
+    stop = Event()
+    stats = {"decode": 0, "wait": 0}
+    decoders = []
+
+    def prefetched(clip, take):
+        if take == None:
+            return clip, take
+        decoder = _Prefetch(take, size, queue_size, stop, stats)
+        decoders.append(decoder)
+        return fit_size(take.clip(file=decoder), size), take
+
+    built = timeline.map(prefetched).build()
+    for k, decoder in enumerate(decoders):
+        decoder.follow(decoders[k + 1:k + 1 + prefetch])
+    if len(decoders) > 0:
+        decoders[0].start()    # 第一个片段在编码声音时就开始解码
+
+    workdir = mkdtemp(prefix="zxx_", dir=temp_dir)
+    try:
+        # 新的时间线中各片段都没有声音，声音仍从原时间线编码
+        audio_path = _write_audio(timeline.build().audio, output_path, params, workdir)
+
+        frames = Queue(queue_size)
+        failure = []
+        busy = {"composite": 0, "encode": 0}
+
+        def composite():
+            try:
+                iterator = built.iter_frames(fps=fps, dtype="uint8")
+                while True:
+                    tic = perf_counter()
+                    frame = next(iterator, None)
+                    busy["composite"] += perf_counter() - tic
+                    if frame is None or not _put(frames, frame, stop):
+                        break
+            except Exception as error:
+                failure.append(error)
+            finally:
+                _put(frames, None, stop)
+
+        n_frames = 0
+        stats["wait"] = 0    # 只统计合成线程等待解码的时间
+        start = perf_counter()
+        compositor = Thread(target=composite, daemon=True)
+        compositor.start()
+        try:
+            with _video_writer(output_path, built.size, fps, params, threads, audio_path) as writer:
+                while True:
+                    frame = frames.get()
+                    if frame is None:
+                        break
+                    tic = perf_counter()
+                    writer.write_frame(frame)
+                    busy["encode"] += perf_counter() - tic
+                    n_frames += 1
+                if len(failure) > 0:
+                    raise failure[0]
+        finally:
+            stop.set()
+            compositor.join()
+            for decoder in decoders:
+                decoder.join()
+        seconds = perf_counter() - start
+    finally:
+        rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "frames": n_frames,
+        "seconds": seconds,
+        "decode": stats["decode"] / seconds,
+        "composite": max(busy["composite"] - stats["wait"], 0) / seconds,
+        "encode": busy["encode"] / seconds,
+    }
+    print("流水线导出：%d 帧，用时 %.1f 秒（%.1f 帧/秒）；各级利用率：解码 %d%%，合成 %d%%，编码 %d%%" % (
+        n_frames, seconds, n_frames / max(seconds, 1e-6),
+        round(result["decode"] * 100), round(result["composite"] * 100), round(result["encode"] * 100)))
+    return result
+
+
+def multi_render(timeline: Timeline, outputs: list, threads: int | None = None, queue_size: int = 8,
+                 temp_dir: str | None = None) -> dict:
+    """
+    一次导出多个版本：每一帧只解码、合成一次，再同时交给多个编码器（各自的 ffmpeg 进程）编码成不同的视频文件。
+    各版本可以使用不同的导出模式（码率、帧率、编码器）和画面尺寸，总用时接近其中最慢的一个版本单独导出的用时。
+
+    画面按各版本中最高的帧率合成；帧率较低的版本由 ffmpeg 的 fps 滤镜抽帧，画面较小的版本由 scale 滤镜缩小。
+    帧率最高、且不缩放的版本与单独导出的视频逐帧相同。每个编码器有自己的线程和容量有限的队列，
+    编码较快的版本不会被较慢的版本拖住，直到队列写满。声音按各版本的声音参数分别编码，参数相同的版本共用一份。
+    返回值是统计信息：
+        frames：合成的帧数；
+        seconds：画面部分的用时（秒），不含事先编码声音的时间；
+        encode：各版本的编码器利用率（忙碌时间占 seconds 的比例）组成的列表，顺序与 outputs 相同。
+
+    参数说明：
+        timeline：集锦的时间线，类型为 zxx.Timeline。
+        outputs：各版本组成的列表，每个版本是 (导出的视频文件路径, 导出模式的参数, 画面尺寸) 三元组。
+            画面尺寸为 None 时与集锦相同。
+        threads：每个编码器的线程数。
+        queue_size：每个编码器的队列最多存放的画面数，默认为 8。
+        temp_dir：存放声音临时文件的文件夹。如果未指定，则使用系统的临时文件夹。
+    """
+    from os import makedirs
+    from os.path import join
+    from queue import Empty, Queue
+    from shutil import rmtree
+    from tempfile import mkdtemp
+    from threading import Event, Thread
+    from time import perf_counter
+
+    if len(outputs) == 0:
+        raise Exception("至少要导出一个版本！")
+    if queue_size < 1:
+        raise Exception("队列容量至少为 1！")
+    built = timeline.build()
+    size = tuple(built.size)
+    rates = [params.get("fps") or built.fps for _, params, _ in outputs]
+    fps = max(rates)
+    stop = Event()
+    failure = []
+    busy = [0] * len(outputs)
+
+    workdir = mkdtemp(prefix="zxx_", dir=temp_dir)
+    try:
+        # 声音参数相同的版本共用一份声音文件
+        audio_paths = {}
+        for output_path, params, _ in outputs:
+            key = _audio_key(output_path, params)
+            if key not in audio_paths:
+                folder = join(workdir, str(len(audio_paths)))
+                makedirs(folder)
+                audio_paths[key] = _write_audio(built.audio, output_path, params, folder)
+
+        writers = []
+        queues = [Queue(queue_size) for _ in outputs]
+
+        def encode(k):
+            try:
+                while not stop.is_set():
+                    try:
+                        frame = queues[k].get(timeout=0.1)
+                    except Empty:
+                        continue
+                    if frame is None:
+                        break
+                    tic = perf_counter()
+                    writers[k].write_frame(frame)
+                    busy[k] += perf_counter() - tic
+            except Exception as error:
+                failure.append(error)
+                stop.set()
+
+        n_frames = 0
+        encoders = []
+        try:
+            for k, (output_path, params, output_size) in enumerate(outputs):
+                filters = []
+                if rates[k] != fps:
+                    filters.append("fps=%s" % rates[k])
+                if output_size != None and tuple(output_size) != size:
+                    filters.append("scale=%d:%d" % tuple(output_size))
+                if len(filters) > 0:
+                    params = dict(params, ffmpeg_params=_add_filters(params.get("ffmpeg_params"), filters))
+                writers.append(_video_writer(output_path, size, fps, params, threads,
+                                             audio_paths[_audio_key(output_path, params)]))
+            start = perf_counter()
+            encoders = [Thread(target=encode, args=(k,), daemon=True) for k in range(len(outputs))]
+            for encoder in encoders:
+                encoder.start()
+            for frame in built.iter_frames(fps=fps, dtype="uint8"):
+                if not all(_put(queue, frame, stop) for queue in queues):
+                    break
+                n_frames += 1
+            for queue in queues:
+                _put(queue, None, stop)
+            for encoder in encoders:
+                encoder.join()
+            if len(failure) > 0:
+                raise failure[0]
+        finally:
+            stop.set()
+            for encoder in encoders:
+                encoder.join()
+            for writer in writers:
+                writer.close()
+        seconds = perf_counter() - start
+    finally:
+        rmtree(workdir, ignore_errors=True)
+
+    result = {"frames": n_frames, "seconds": seconds, "encode": [b / seconds for b in busy]}
+    print("一次导出 %d 个版本：合成 %d 帧，用时 %.1f 秒（%.1f 帧/秒）；各编码器利用率：%s" % (
+        len(outputs), n_frames, seconds, n_frames / max(seconds, 1e-6),
+        "，".join("%d%%" % round(u * 100) for u in result["encode"])))
+    return result
+
+
+def _audio_key(output_path: str, params: dict) -> tuple:
+    """
+    决定声音编码结果的参数，与 _write_audio() 使用的参数相同。
+    """
+    from os.path import splitext
+
+    ext = splitext(output_path)[1][1:].lower()
+    audio_codec = params.get("audio_codec") or ("libvorbis" if ext in ("ogv", "webm") else "libmp3lame")
+    return (audio_codec, params.get("audio_fps", 44100), params.get("audio_nbytes", 4),
+            params.get("audio_bufsize", 2000), params.get("audio_bitrate"))
+
+
+def _add_filters(ffmpeg_params: list | None, filters: list) -> list:
+    """
+    在 ffmpeg 参数中加入画面滤镜。参数中已有 -vf 时，把滤镜接在其前面。
+    """
+    ffmpeg_params = list(ffmpeg_params or [])
+    if "-vf" in ffmpeg_params:
+        i = ffmpeg_params.index("-vf") + 1
+        ffmpeg_params[i] = ",".join(filters + [ffmpeg_params[i]])
+    else:
+        ffmpeg_params += ["-vf", ",".join(filters)]
+    return ffmpeg_params
+
+
+def profiled_render(timeline: Timeline, output_path: str, params: dict, profiler: "Profiler",
+                    threads: int | None = None, temp_dir: str | None = None) -> None:
+    """
+    带性能分析的导出：按片段描述重新生成时间线上的各个片段，在解码、特效、字幕、比分牌、缩放和拼接各层记录读帧的耗时，
+    再逐帧编码并记录编码的耗时。导出的视频与 write_videofile() 导出的逐帧相同。
+
+    参数说明：
+        timeline：集锦的时间线，类型为 zxx.Timeline。
+        output_path：导出的视频文件路径。
+        params：导出模式的参数，即 zxx.options.GetExportMode() 的返回值。
+        profiler：性能分析器，类型为 zxx.Profiler，已经开始记录。
+        threads：编码时的线程数。
+        temp_dir：存放声音临时文件的文件夹。如果未指定，则使用系统的临时文件夹。
+    """
+    from shutil import rmtree
+    from tempfile import mkdtemp
+    from time import perf_counter
+    from .tools import fit_size
+
+    size = timeline.size()
+    segments = []
+
+    def profiled(clip, take):
+        segment = profiler.add_segment(take, timeline.starts()[len(segments)], clip.duration)
+        segments.append(segment)
+        if take != None:
+            clip = profiler.wrap(fit_size(take.clip(size=size, profiler=profiler), size), "resize", segment)
+        else:
+            clip = profiler.wrap(clip, "decode", segment)
+        return clip, take
+
+    profiled_timeline = timeline.map(profiled)
+    built = profiler.wrap(profiled_timeline.build(), "composite")
+    fps = params.get("fps") or built.fps
+    workdir = mkdtemp(prefix="zxx_", dir=temp_dir)
+    try:
+        tic = perf_counter()
+        audio_path = _write_audio(timeline.build().audio, output_path, params, workdir)
+        profiler.add("audio", perf_counter() - tic)
+        with _video_writer(output_path, built.size, fps, params, threads, audio_path) as writer:
+            for t, frame in built.iter_frames(fps=fps, dtype="uint8", with_times=True):
+                tic = perf_counter()
+                writer.write_frame(frame)
+                profiler.add("encode", perf_counter() - tic, segments[profiled_timeline.locate(t)[0]], frames=1)
+    finally:
+        rmtree(workdir, ignore_errors=True)
+
+
+def _write_audio(audio, output_path: str, params: dict, folder: str) -> str | None:
+    """
+    与 moviepy 的 write_videofile() 一样，先把声音编码成临时文件，返回其路径。没有声音时返回 None。
+
+    参数说明：
+        audio：声音，类型是 moviepy 的 AudioClip 类，可以是 None。
+        output_path：导出的视频文件路径，用于推断声音编码器。
+        params：导出模式的参数。
+        folder：存放临时文件的文件夹。
+    """
+    from os.path import join
+    from moviepy.tools import find_extension
+
+    if audio == None:
+        return None
+    audio_codec, audio_fps, audio_nbytes, audio_bufsize, audio_bitrate = _audio_key(output_path, params)
+    audio_path = join(folder, "audio." + find_extension(audio_codec))
+    audio.write_audiofile(
+        audio_path, audio_fps, audio_nbytes, audio_bufsize, audio_codec, bitrate=audio_bitrate, logger=None,
+    )
+    return audio_path
+
+
+def _video_writer(output_path: str, size: tuple, fps: float, params: dict, threads: int | None,
+                  audio_path: str | None) -> "FFMPEG_VideoWriter":
+    """
+    按导出模式的参数创建 moviepy 的 FFMPEG_VideoWriter，与 write_videofile() 使用的编码参数相同，声音直接复制。
+    """
+    from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+    return FFMPEG_VideoWriter(
+        output_path, size, fps, codec=output_codec(output_path, params), preset=params.get("preset", "medium"),
+        bitrate=params.get("bitrate"), audiofile=audio_path, audio_codec="copy", threads=threads,
+        ffmpeg_params=params.get("ffmpeg_params"), pixel_format=params.get("pixel_format"),
+    )
+
+
+class _Prefetch:
+    """
+    流水线导出中一个片段的解码级。在单独的线程中打开源文件，从片段开头按顺序解码片段用到的每一帧，放入有界队列。
+    作为 zxx.File 的替身传给 zxx.Take.clip()：合成时读取的画面从队列中取出，与直接读取源文件得到的画面完全相同。
+    往回读取画面（例如倒放）时，退回到直接读取源文件。
+    """
+    def __init__(self, take: "Take", size: tuple, queue_size: int, stop, stats: dict) -> None:
+        from queue import Queue
+
+        self.__take = take
+        self.__size = size
+        self.__file = take.open(size)    # 用于读取元数据，以及往回读取时直接解码
+        self.__queue = Queue(queue_size)
+        self.__stop = stop
+        self.__stats = stats
+        self.__following = []
+        self.__thread = None
+        self.__current = None    # 最近取出的 (帧序号, 画面)
+        self.__ended = False
+        self.__error = None
+
+    def path(self) -> str:
+        return self.__file.path()
+
+    def contents(self) -> "VideoClip":
+        """
+        返回与源文件的 VideoFileClip 时长、尺寸和帧率都相同，但从队列中读取画面的 VideoClip（没有声音）。
+        """
+        from moviepy import VideoClip
+
+        source = self.__file.contents()
+        clip = VideoClip(duration=source.duration)
+        clip.frame_function = self.__frame
+        clip.size = source.size
+        clip.fps = source.fps
+        return clip
+
+    def follow(self, decoders: list) -> None:
+        """
+        指定本片段开始合成时，需要一并启动的后续片段的解码线程。
+        """
+        self.__following = list(decoders)
+
+    def start(self) -> None:
+        """
+        启动解码线程（只启动一次）。
+        """
+        from threading import Thread
+
+        if self.__thread == None:
+            self.__thread = Thread(target=self.__decode, daemon=True)
+            self.__thread.start()
+
+    def join(self) -> None:
+        if self.__thread != None:
+            self.__thread.join()
+
+    def __decode(self) -> None:
+        """
+        解码线程：打开自己的读取器，从片段开头定位，按顺序解码到片段结尾，结束后关闭读取器。
+        """
+        from time import perf_counter
+        from .ReaderPool import shared_pool
+
+        source = None
+        try:
+            source = self.__take.open(self.__size).contents()
+            reader = source.reader
+            first = reader.get_frame_number(self.__take.begin)
+            last = max(min(reader.get_frame_number(self.__take.end), reader.n_frames - 1), first)
+            for index in range(first, last + 1):
+                # 第一帧与直接读取时一样定位到片段开头，之后按帧序号顺序读取
+                t = self.__take.begin if index == first else index / reader.fps
+                tic = perf_counter()
+                frame = source.get_frame(t)
+                self.__stats["decode"] += perf_counter() - tic
+                if not _put(self.__queue, (index, frame), self.__stop):
+                    break
+        except Exception as error:
+            self.__error = error
+        finally:
+            _put(self.__queue, None, self.__stop)
+            if source != None:
+                shared_pool().discard(source)
+
+    def __frame(self, t: float):
+        from time import perf_counter
+
+        for decoder in [self] + self.__following:
+            decoder.start()
+        index = self.__file.contents().reader.get_frame_number(t)
+        tic = perf_counter()
+        while not self.__ended and (self.__current == None or self.__current[0] < index):
+            item = self.__queue.get()
+            if item == None:
+                self.__ended = True
+            else:
+                self.__current = item
+        self.__stats["wait"] += perf_counter() - tic
+        if self.__error != None:
+            raise Exception("流水线导出失败：解码 %s 时出错：%s" % (self.path(), self.__error))
+        if self.__current != None and (self.__current[0] == index or (self.__ended and index > self.__current[0])):
+            return self.__current[1]    # 超出文件末尾时与 moviepy 一样返回最后一帧
+        return self.__file.contents().get_frame(t)
+
+
+def _put(queue: "Queue", item, stop: "Event") -> bool:
+    """
+    把 item 放入有界队列，队列已满时等待。stop 被设置（导出结束或出错）时放弃，返回 False。
+    """
+    from queue import Full
+
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            continue
+    return False
@@ -5,6 +5,7 @@ zxx.tools
 """
 
 
+from functools import lru_cache
 from moviepy import VideoClip
 
 
@@ -74,12 +75,12 @@ def sec2str(seconds: float) -> str:
     return string
 
 
-def add_txt_to_img_center(filename: str, text: str, fontpath: str, color: str | tuple):
+def add_txt_to_img_center(filename: str, text: str, fontpath: str, color: str | tuple, folder: str = None):
     """
     在图片正中央添加文字。
 
     参数说明：
-        filename：要加字的图片文件名，工作路径（即 zxx.options.GetPath() 返回值）的相对路径。
+        filename：要加字的图片文件名，是相对于 folder 的相对路径。
         text：要加的文字。
         fontpath：字体文件的路径，注意是绝对路径。
         color：字体颜色，参数值会直接传送给 PIL.ImageDraw.text() 方法的 fill 参数，
@@ -88,15 +89,18 @@ def add_txt_to_img_center(filename: str, text: str, fontpath: str, color: str |
                 color="#800080"
                 color=(255, 10, 10)
                 color=(255, 10, 10, 100)
+        folder：图片所在的文件夹绝对路径。如果未指定，则默认为工作目录（即 zxx.options.GetPath() 的返回值）。
     """
     import cv2
-    from PIL import ImageFont, ImageDraw, Image
+    from PIL import ImageDraw, Image
     import numpy as np
     from os.path import join
     from .options import GetPath
 
     # 导入图片（解决中文路径乱码问题）
-    img_path = join(GetPath(), filename)
+    if folder == None:
+        folder = GetPath()
+    img_path = join(folder, filename)
     img = cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
 
     # 读取图片，并手动将 BGR(A) 调整为 RGB(A)
@@ -112,7 +116,7 @@ def add_txt_to_img_center(filename: str, text: str, fontpath: str, color: str |
     # 确定合适的字号
     width, height = img_pil.size
     fontsize = min(int(0.8 * width / len(text)), int(0.8 * height))
-    font = ImageFont.truetype(fontpath, fontsize)
+    font = load_font(fontpath, fontsize)
 
     # 精确处理文字位置（居中）
     x_0, y_0, x_1, y_1 = font.getbbox(text)    # 获取边界框，处理可能的 offset
@@ -124,10 +128,74 @@ def add_txt_to_img_center(filename: str, text: str, fontpath: str, color: str |
     return img
 
 
+def fit_size(clip: VideoClip, size: tuple) -> VideoClip:
+    """
+    把视频片段的画面尺寸统一为 size。尺寸本来就相同时直接返回原片段。
+
+    参数说明：
+        clip：视频片段。类型是 moviepy 的 VideoClip 类。
+        size：目标画面尺寸 (宽, 高)。
+    """
+    from moviepy.video import fx as vfx
+
+    if tuple(clip.size) == tuple(size):
+        return clip
+    return clip.with_effects([vfx.Resize(tuple(size))])
+
+
+def loop_audio(audio_clip, duration: float, crossfade: float = 0):
+    """
+    把一段音乐循环播放到指定时长，返回新的 moviepy AudioClip。
+    每个输出时刻 t 直接映射到原音乐中 t 对一个循环周期取余的位置，不复制、不嵌套音乐，内存占用与时长无关。
+
+    参数说明：
+        audio_clip：要循环的音乐，类型是 moviepy 的 AudioClip 类。
+        duration：循环后的总时长（秒）。
+        crossfade：循环接缝处交叉淡入淡出的时长（秒），默认为 0 即直接首尾相接。
+            交叉淡化时，上一遍的最后 crossfade 秒与下一遍的开头重叠，因此每个循环周期是 (音乐时长 - crossfade) 秒。
+    """
+    import numpy as np
+    from moviepy import AudioClip
+
+    length = audio_clip.duration
+    if crossfade < 0 or crossfade * 2 > length:
+        raise Exception("交叉淡化时长（%s 秒）必须在 0 到音乐时长（%s 秒）的一半之间" % (crossfade, length))
+    period = length - crossfade
+
+    def read(u):
+        # 按循环接缝把时刻分成若干个单调递增的连续段分别读取，保证读取器只需顺序解码
+        sound = np.zeros((len(u), audio_clip.nchannels))
+        breaks = np.flatnonzero(np.diff(u) < 0) + 1
+        for part in np.split(np.arange(len(u)), breaks):
+            if len(part) > 0:
+                frame = audio_clip.get_frame(u[part])
+                sound[part] = frame[:, None] if frame.ndim == 1 else frame
+        return sound
+
+    def frame_function(t):
+        if not isinstance(t, np.ndarray):
+            return frame_function(np.array([t], dtype=float))[0]
+        k = np.floor(t / period)
+        u = np.clip(t - k * period, 0, length)
+        sound = read(u)
+        if crossfade > 0:
+            # 第二遍起，每一遍开头的 crossfade 秒与上一遍的结尾等功率交叉淡化
+            overlap = (k >= 1) & (u < crossfade)
+            if overlap.any():
+                phase = u[overlap] / crossfade * np.pi / 2
+                tail = read(u[overlap] + period)
+                sound[overlap] = sound[overlap] * np.sin(phase)[:, None] + tail * np.cos(phase)[:, None]
+        return sound
+
+    return AudioClip(frame_function, duration=duration, fps=audio_clip.fps)
+
+
 def add_effects(clip: VideoClip, speed: float = 1, duration: float | None = None, silence: bool = False, lum: float = 0, 
             contrast: float = 0, fadein: float = 0, fadeout: float = 0) -> VideoClip:
     """
     为视频片段添加视频特效。
+    亮度、对比度和淡入淡出合并成一次逐帧变换：亮度和对比度预先算成 0~255 的查找表，淡入淡出只需按当前时刻缩放这张表，
+    每帧只查表一次（一次内存遍历），不再逐个特效各自复制一份浮点数画面。变速只是时间映射，不会处理画面。
 
     参数说明：
         clip：要处理的视频片段。类型是 moviepy 的 VideoClip 类。
@@ -139,24 +207,47 @@ def add_effects(clip: VideoClip, speed: float = 1, duration: float | None = None
         fadein：淡入效果持续的秒数。
         fadeout：淡出效果持续的秒数。
     """
-    from moviepy.video import fx as vfx
+    import numpy as np
     from moviepy.audio import fx as afx
 
-    # 亮度和对比度
-    if lum != 0 or contrast != 0:
-        clip = clip.with_effects([vfx.LumContrast(lum=lum, contrast=contrast)])
-    # 变速
+    # 变速（画面、遮罩和声音的时间映射一次完成）
     if speed != 1 and duration is not None:
         raise Exception("只能同时指定`speed`和`duration`中的一个噢！请重新设置参数。")
-    elif speed != 1:
-        clip = clip.with_effects([vfx.MultiplySpeed(factor=speed)])
     elif duration is not None:
-        clip = clip.with_effects([vfx.MultiplySpeed(final_duration=duration)])
-    # 淡入和淡出（变速之后）
-    if fadein != 0:
-        clip = clip.with_effects([vfx.FadeIn(duration=fadein)])
-    if fadeout != 0:
-        clip = clip.with_effects([vfx.FadeOut(duration=fadeout)])
+        speed = clip.duration / duration
+    if speed != 1:
+        clip = clip.time_transform(lambda t: speed * t, apply_to=["mask", "audio"]).with_duration(clip.duration / speed)
+    # 亮度、对比度和淡入淡出（淡入淡出按变速之后的时间计算），结果与 moviepy 的 LumContrast、FadeIn、FadeOut 依次处理相同
+    if lum != 0 or contrast != 0 or fadein != 0 or fadeout != 0:
+        levels = np.arange(256, dtype=np.float64)
+        levels = np.clip(levels + lum + contrast * (levels - 127.0), 0, 255)
+        if lum != 0 or contrast != 0:
+            levels = levels.astype(np.uint8).astype(np.float64)
+        identity = lum == 0 and contrast == 0
+        lut = levels.astype(np.uint8)
+        total = clip.duration
+
+        def fading(t):
+            factor = 1.0
+            if fadein != 0 and t < fadein:
+                factor *= t / fadein
+            if fadeout != 0 and total - t < fadeout:
+                factor *= (total - t) / fadeout
+            return factor
+
+        def kernel(get_frame, t):
+            frame = get_frame(t)
+            factor = fading(t)
+            if factor == 1.0 and identity:
+                return frame
+            if frame.dtype != np.uint8:    # 画面不是 uint8 时（极少见）按浮点数计算
+                if not identity:
+                    frame = np.clip(frame + lum + contrast * (frame - 127.0), 0, 255).astype(np.uint8)
+                return frame * factor
+            table = lut if factor == 1.0 else (levels * factor).astype(np.uint8)
+            return table[frame]
+
+        clip = clip.transform(kernel)
     # 消音
     if silence:
         clip = clip.with_effects([afx.MultiplyVolume(factor=0)])
@@ -164,75 +255,216 @@ def add_effects(clip: VideoClip, speed: float = 1, duration: float | None = None
     return clip
 
 
-def add_caption(clip: VideoClip, text: str) -> VideoClip:
+def add_caption(clip: VideoClip, text: str, scale: float = 1, style: "Style" = None) -> VideoClip:
         """
         给视频片段加字幕。
-        字幕的字体、字号、颜色、位置等参数，通过 zxx.options.SetCaptionStyle() 统一设置。
+        字幕的字体、字号、颜色、位置等参数，通过 zxx.options.SetCaptionStyle() 统一设置，或由 style 指定。
+        字幕位置固定时，只在字幕覆盖的区域内逐帧混合（zxx.Overlay）；位置随时间变化时，才使用整帧合成的 CompositeVideoClip。
+        字幕图片会被缓存（见 render_caption()），空白字幕直接返回原片段，不做任何合成。
 
         参数说明：
             clip：要加字幕的视频片段。类型是 moviepy.video 的 VideoClip 类。
             text：字幕文案。可以为空字符串。
+            scale：以像素为单位的字幕位置的缩放比例，默认为 1。代理模式下为代理文件与源文件的宽度之比。
+            style：样式，类型为 zxx.Style。如果未指定，则使用默认样式（zxx.options.GetStyle() 的返回值）。
         """
-        from moviepy import TextClip, CompositeVideoClip
-        from os.path import join
-        from .options import GetCaptionStyle, GetPath
-
-        # 如果 text 为空，会报错，因此需要打一个空格
-        if text == "":
-            text = " "
-        # 按照宽度为 1920 像素的视频的字号，调整字号大小
-        video_width = clip.size[0]
-        fontsize = GetCaptionStyle("fontsize") / 1920 * video_width
-        font_path = GetCaptionStyle("font")
-        # 转化相对路径
-        if ":" not in font_path:
-            font_path = join(GetPath(), font_path)
-        text_clip = TextClip(
-            font = GetCaptionStyle("font"),
-            text = text,
-            font_size = fontsize,
-            color = GetCaptionStyle("color"),
-        ).with_position(GetCaptionStyle("position"), relative=GetCaptionStyle("relative"))
+        from moviepy import ImageClip, CompositeVideoClip
+        from .options import GetStyle
+        from .Overlay import Overlay, add_overlays
+
+        # 空白字幕看不见，不需要渲染和合成
+        if text.strip() == "":
+            return clip
+        if style == None:
+            style = GetStyle()
+        caption_style = style.caption_style()
+        position = caption_style["position"]
+        if scale != 1 and not caption_style["relative"] and isinstance(position, (tuple, list)):
+            position = tuple(p * scale if isinstance(p, (int, float)) else p for p in position)
+
+        image = render_caption(text, clip.size[0], style)
         clip_dur = clip.duration
-        clip = CompositeVideoClip([clip, text_clip]).with_duration(clip_dur)
+        if callable(caption_style["position"]):    # 位置随时间变化，只能整帧合成
+            text_clip = ImageClip(image).with_position(position, relative=caption_style["relative"])
+            clip = CompositeVideoClip([clip, text_clip]).with_duration(clip_dur)
+        else:
+            overlay = Overlay(image, clip.size, position, caption_style["relative"])
+            clip = add_overlays(clip, [overlay])
         
         return clip
 
 
-def add_scoreboard(clip: VideoClip, home: int = 0, away: int = 0) -> VideoClip:
+def render_caption(text: str, video_width: int, style: "Style" = None):
     """
-    加比分牌。显示的队名通过 zxx.options.SetMatchInfo() 设置。
+    渲染字幕图片。返回值是 RGBA 格式的 numpy 数组（只读），与 moviepy 的 TextClip（label 模式）渲染的结果相同。
+    字幕的字体、字号、颜色和描边通过 zxx.options.SetCaptionStyle() 设置，或由 style 指定。
+
+    字号按照宽度为 1920 像素的视频换算。渲染结果按（字体文件和修改时间、换算后的字号、颜色、文字、描边）缓存，
+    字体对象也在所有字幕之间共享，相同的字幕不会重复渲染，字体文件也只读取一次。
+
+    参数说明：
+        text：字幕文案，不能为空字符串。
+        video_width：视频画面宽度（像素）。
+        style：样式，类型为 zxx.Style。如果未指定，则使用默认样式（zxx.options.GetStyle() 的返回值）。
+    """
+    from os.path import join, getmtime, isfile
+    from .options import GetStyle
+
+    if style == None:
+        style = GetStyle()
+    caption_style = style.caption_style()
+    font_path = caption_style["font"]
+    # 转化相对路径
+    if ":" not in font_path:
+        font_path = join(style.path(), font_path)
+    if not isfile(font_path):
+        raise Exception("找不到字幕字体文件 %s，请通过 zxx.options.SetCaptionStyle(font=...) 设置！" % font_path)
+    # 按照宽度为 1920 像素的视频，调整字号大小
+    fontsize = caption_style["fontsize"] / 1920 * video_width
+    color = caption_style["color"]
+    stroke_color = caption_style.get("stroke_color")
+    if isinstance(color, list):
+        color = tuple(color)
+    if isinstance(stroke_color, list):
+        stroke_color = tuple(stroke_color)
+    return _render_caption(font_path, getmtime(font_path), fontsize, color, text,
+                           stroke_color, int(caption_style.get("stroke_width", 0)))
+
+
+@lru_cache(maxsize=512)
+def _render_caption(font_path: str, mtime: float, fontsize: float, color: str | tuple, text: str,
+                    stroke_color: str | tuple | None, stroke_width: int):
+    """
+    render_caption() 的缓存实现。mtime 只用于在字体文件被修改后使缓存失效。
+    排版与 moviepy 的 TextClip 相同：以第一行的基线为锚点，画面高度为字体的 ascent + descent 加上描边和行距。
+    """
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    font = _load_font(font_path, mtime, fontsize)
+    spacing = 4
+    measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    left, top, right, bottom = measure.multiline_textbbox(
+        (0, 0), text, font=font, spacing=spacing, stroke_width=stroke_width, anchor="ls")
+    ascent, descent = font.getmetrics()
+    try:
+        line_height = measure._multiline_spacing(font, spacing, stroke_width)
+        height = int(text.count("\n") * line_height + ascent + descent + stroke_width * 2)
+    except AttributeError:
+        height = int(bottom - top)
+    width = int(right - left)
+    img = Image.new("RGBA", (max(width, 1), max(height, 1)), color=(0, 0, 0, 0))
+    ImageDraw.Draw(img).multiline_text(
+        (stroke_width, ascent + stroke_width), text, fill=color, font=font, spacing=spacing,
+        stroke_width=stroke_width, stroke_fill=stroke_color, anchor="ls")
+    img = np.array(img)
+    img.setflags(write=False)
+    return img
+
+
+def load_font(font_path: str, fontsize: float):
+    """
+    读取字体文件，返回 PIL 的 FreeTypeFont 字体对象。字体对象按（字体文件和修改时间、字号）缓存，在所有字幕和比分牌之间共享。
+
+    参数说明：
+        font_path：字体文件的绝对路径。
+        fontsize：字号。
+    """
+    from os.path import getmtime
+
+    return _load_font(font_path, getmtime(font_path), fontsize)
+
+
+@lru_cache(maxsize=64)
+def _load_font(font_path: str, mtime: float, fontsize: float):
+    """
+    load_font() 的缓存实现。mtime 只用于在字体文件被修改后使缓存失效。
+    """
+    from PIL import ImageFont
+
+    return ImageFont.truetype(font_path, fontsize)
+
+
+def render_scoreboard(text: str, width: int, style: "Style" = None):
+    """
+    渲染带文字的比分牌图片，并缩放到最终宽度。返回值是 RGBA 格式的 numpy 数组（只读）。
+    比分牌的图片、字体和颜色通过 zxx.options.SetScoreBoardStyle() 设置，或由 style 指定。
+
+    渲染结果按（图片路径和修改时间、字体文件、文字、颜色、宽度）缓存，比分和队名不变时不会重复渲染。
+
+    参数说明：
+        text：比分牌上的文字。
+        width：比分牌的最终宽度（像素）。
+        style：样式，类型为 zxx.Style。如果未指定，则使用默认样式（zxx.options.GetStyle() 的返回值）。
+    """
+    from os.path import join, getmtime
+    from .options import GetStyle
+
+    if style == None:
+        style = GetStyle()
+    img_path = join(style.path(), style.scoreboard_style("image"))
+    fontpath = join(style.path(), style.scoreboard_style("font_file"))
+    color = style.scoreboard_style("color")
+    if isinstance(color, list):
+        color = tuple(color)
+    return _render_scoreboard(img_path, getmtime(img_path), fontpath, text, color, int(width))
+
+
+@lru_cache(maxsize=64)
+def _render_scoreboard(img_path: str, mtime: float, fontpath: str, text: str, color: str | tuple, width: int):
+    """
+    render_scoreboard() 的缓存实现。mtime 只用于在图片文件被修改后使缓存失效。
+    """
+    import cv2
+    import numpy as np
+    from os.path import basename, dirname
+
+    img = add_txt_to_img_center(
+        filename = basename(img_path),
+        text = text,
+        fontpath = fontpath,
+        color = color,
+        folder = dirname(img_path),
+    )
+    # 统一为 RGBA
+    if img.shape[2] == 3:
+        alpha = np.full(img.shape[:2] + (1,), 255, dtype=np.uint8)
+        img = np.concatenate([img, alpha], axis=2)
+    # 缩放至最终宽度
+    h, w = img.shape[:2]
+    height = max(int(h * width / w), 1)
+    interpolation = cv2.INTER_AREA if width < w else cv2.INTER_CUBIC
+    img = cv2.resize(img, (width, height), interpolation=interpolation)
+    img.setflags(write=False)
+    return img
+
+
+def add_scoreboard(clip: VideoClip, home: int = 0, away: int = 0, style: "Style" = None) -> VideoClip:
+    """
+    加比分牌。显示的队名通过 zxx.options.SetMatchInfo() 设置，或由 style 指定。
+    比分牌图片会被缓存，比分和队名不变时不会重复渲染；合成时只在比分牌覆盖的左上角区域内逐帧混合（zxx.Overlay）。
 
     参数说明：
         clip：要加比分牌的视频片段。类型是 moviepy.video 的 VideoClip 类。
         home：主队当前得分。
         away：客队当前得分。
+        style：样式，类型为 zxx.Style。如果未指定，则使用默认样式（zxx.options.GetStyle() 的返回值）。
     """
-    from moviepy import ImageClip, CompositeVideoClip
-    from moviepy.video import fx as vfx
-    from os.path import join
-    from .options import GetPath, GetMatchInfo, GetScoreBoardStyle
+    from .options import GetStyle
+    from .Overlay import Overlay, add_overlays
 
+    if style == None:
+        style = GetStyle()
     # 生成比分牌文字内容
-    home_name = GetMatchInfo("home")
-    away_name = GetMatchInfo("away")
+    home_name = style.match_info("home")
+    away_name = style.match_info("away")
     text = f"{home_name}　{home}-{away}　{away_name}"
-    fontpath = join(GetPath(), GetScoreBoardStyle("font_file"))
-    # 合成比分牌图片
-    img = add_txt_to_img_center(
-        filename = GetScoreBoardStyle("image"),
-        text = text,
-        fontpath = fontpath,
-        color = GetScoreBoardStyle("color") 
-    )
-    # 合成图片和视频
+    # 合成比分牌图片（已缩放至最终宽度）
     clip_width = clip.size[0]
-    width_factor = GetScoreBoardStyle("width_factor")
-    score_width = width_factor * clip_width
-    score_clip = ImageClip(img).with_effects([vfx.Resize(width=score_width)])
-    # 调整比分牌显示时长
-    clip_dur = clip.duration
-    clip = CompositeVideoClip([clip, score_clip]).with_duration(clip_dur)
+    width_factor = style.scoreboard_style("width_factor")
+    img = render_scoreboard(text, width_factor * clip_width, style)
+    # 合成图片和视频（比分牌位于左上角）
+    clip = add_overlays(clip, [Overlay(img, clip.size)])
 
     return clip
 
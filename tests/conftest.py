@@ -0,0 +1,81 @@
+"""
+zxx 测试的公共设置
+    测试素材由 ffmpeg 的 lavfi 虚拟设备在临时文件夹中生成，不需要下载任何素材。
+    各种缓存（关键帧索引、分段缓存、代理文件、运动数据）都放在每个测试自己的临时文件夹中，不会读写用户目录。
+"""
+
+
+import numpy as np
+import pytest
+
+
+FPS = 25
+SIZE = (192, 108)
+
+
+def make_video(path: str, duration: float = 12, fps: float = FPS, gop: int = 25) -> str:
+    """
+    生成一段带声音的 H.264 测试视频（画面每一帧都不同），返回文件路径。关键帧间隔为 gop 帧，含 B 帧。
+    """
+    from zxx.probe import run_ffmpeg
+
+    run_ffmpeg([
+        "-f", "lavfi", "-i", "testsrc2=size=%dx%d:rate=%s" % (SIZE[0], SIZE[1], fps),
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", str(duration), "-c:v", "libx264", "-preset", "veryfast", "-g", str(gop), "-keyint_min", str(gop),
+        "-pix_fmt", "yuv420p", "-c:a", "aac", "-y", path,
+    ], error = "生成测试视频失败")
+    return path
+
+
+def read_frames(path: str):
+    """
+    解码视频文件的所有画面，返回形状为 (帧数, 高, 宽, 3) 的 int16 数组，便于相减比较。
+    """
+    import subprocess as sp
+    from moviepy.config import FFMPEG_BINARY
+
+    proc = sp.run([FFMPEG_BINARY, "-v", "error", "-i", path, "-f", "rawvideo", "-pix_fmt", "rgb24", "-"],
+                  stdout=sp.PIPE, stderr=sp.PIPE, check=True)
+    return np.frombuffer(proc.stdout, dtype=np.uint8).reshape(-1, SIZE[1], SIZE[0], 3).astype(np.int16)
+
+
+def frame_diff(a: str, b: str):
+    """
+    逐帧比较两个视频文件，返回 (a 的帧数, b 的帧数, 每一帧的平均绝对误差组成的数组)。
+    """
+    frames_a, frames_b = read_frames(a), read_frames(b)
+    n = min(len(frames_a), len(frames_b))
+    return len(frames_a), len(frames_b), np.abs(frames_a[:n] - frames_b[:n]).mean(axis=(1, 2, 3))
+
+
+@pytest.fixture(scope="session")
+def source(tmp_path_factory) -> str:
+    """
+    12 秒、25 帧/秒、每秒一个关键帧的测试视频。
+    """
+    return make_video(str(tmp_path_factory.mktemp("media") / "source.mp4"))
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """
+    把各种缓存的位置指向本测试的临时文件夹，并注册测试用的导出模式 "test"（libx264 无损，编码很快）。
+    测试结束后恢复原来的设置。
+    """
+    from zxx import options
+    from zxx.FrameCache import reset_frame_cache
+    from zxx.ReaderPool import shared_pool
+
+    for name in ("KEYFRAME_INDEX", "RENDER_CACHE", "PROXY", "STABILIZE", "EXPORT_MODES"):
+        monkeypatch.setattr(options, name, {key: dict(value) if isinstance(value, dict) else value
+                                            for key, value in getattr(options, name).items()})
+    monkeypatch.setattr(options, "PATH", str(tmp_path))
+    options.SetKeyframeIndex(path=str(tmp_path / "index"))
+    options.SetRenderCache(path=str(tmp_path / "cache"))
+    options.SetProxy(path=str(tmp_path / "proxy"))
+    options.SetStabilize(path=str(tmp_path / "stabilize"))
+    options.SetExportMode("test", codec="libx264", preset="ultrafast", ffmpeg_params=["-qp", "0"])
+    yield tmp_path
+    shared_pool().clear()
+    reset_frame_cache()
@@ -0,0 +1,90 @@
+"""
+分段导出（zxx.render）的测试：各种导出方式与普通导出的帧数相同、画面逐帧对应。
+"""
+
+
+from conftest import FPS, frame_diff
+from zxx import Highlight
+
+
+# 测试视频的画面每一帧都不同，错开一帧时平均误差远大于这个值；无损编码后的色彩空间转换误差远小于这个值
+SAME_FRAME = 3
+
+
+def highlight(source: str, spans: list) -> Highlight:
+    from zxx.tools import sec2str
+
+    result = Highlight().use(source, "")
+    for begin, end in spans:
+        result.take([sec2str(begin), sec2str(end)])
+    return result
+
+
+def export_pair(source: str, spans: list, folder, **kwargs) -> tuple:
+    """
+    按普通方式和 kwargs 指定的方式分别导出同一个集锦，返回 (普通导出的文件, 另一个文件)。
+    """
+    plain, other = str(folder / "plain.mp4"), str(folder / "other.mp4")
+    highlight(source, spans).export("plain.mp4", str(folder), mode="test")
+    highlight(source, spans).export("other.mp4", str(folder), mode="test", **kwargs)
+    return plain, other
+
+
+def assert_same_frames(plain: str, other: str) -> None:
+    n_plain, n_other, diff = frame_diff(plain, other)
+    assert n_other == n_plain
+    assert diff.max() < SAME_FRAME, "第 %d 帧不同（平均误差 %.1f）" % (diff.argmax(), diff.max())
+
+
+def test_frame_grid():
+    from zxx.render import first_frame, frame_count
+
+    assert frame_count(9.2, 25) == int(9.2 * 25)
+    assert first_frame(0, 25) == 0
+    assert first_frame(0.7, 25) == 18    # 0.7 秒是第 17.5 帧，第一个不早于它的是第 18 帧
+    assert first_frame(0.72, 25) == 18
+    for t in (0.1, 0.3, 1.9, 7.04, 8.7):
+        i = first_frame(t, 25)
+        assert i / 25 >= t and (i - 1) / 25 < t
+
+
+def test_take_frames_tile_timeline(source):
+    from zxx.render import frame_count, take_frames
+
+    timeline = highlight(source, [(0.3, 0.81), (2.3, 3.1), (5, 5.5), (7.01, 7.53)])._Highlight__timeline
+    ranges = take_frames(timeline, FPS)
+    assert ranges[0][0] == 0 and ranges[-1][1] == frame_count(timeline.duration(), FPS)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+def test_smart_export_matches_plain(source, tmp_path):
+    from zxx.render import plan_parts
+
+    # 开始时刻 2.3 秒不在帧边界上（第 57.5 帧），复制的画面组前后都要重新编码几帧
+    spans = [(2.3, 9.5), (0.5, 1.26)]
+    timeline = highlight(source, spans)._Highlight__timeline
+    assert "copy" in [part[0] for part in plan_parts(timeline, FPS)]
+    assert_same_frames(*export_pair(source, spans, tmp_path, smart=True))
+
+
+def test_split_part_tiles_range(source):
+    from zxx.render import frame_count, split_part
+
+    timeline = highlight(source, [(i * 0.5, i * 0.5 + 0.5) for i in range(20)] + [(1.02, 6.3)])._Highlight__timeline
+    n = frame_count(timeline.duration(), FPS)
+    for merge in (True, False):
+        chunks = split_part(timeline, 3, n - 2, FPS, 2, merge=merge)
+        assert chunks[0][0] == 3 and chunks[-1][1] == n - 2
+        assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+        assert all(last - first <= 2 * FPS for first, last, _ in chunks)
+
+
+def test_workers_export_matches_plain(source, tmp_path):
+    # 每个片段 0.5 秒即 12.5 帧，各块分别取整时会少帧
+    spans = [(i * 0.5, i * 0.5 + 0.5) for i in range(20)]
+    assert_same_frames(*export_pair(source, spans, tmp_path, workers=2, chunk_size=2))
+
+
+def test_smart_workers_export_matches_plain(source, tmp_path):
+    spans = [(0.3, 0.82), (2.3, 9.5), (4.1, 4.5)]
+    assert_same_frames(*export_pair(source, spans, tmp_path, smart=True, workers=2, chunk_size=1))